@@ -0,0 +1,92 @@
+"""
+Answer cache for chat with documents
+Repeated questions over an unchanged document set are answered without
+loading stores, retrieving or calling the LLM
+"""
+
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.ai.embedding_cache import normalize_text
+from app.config.database import get_collection
+from app.config.settings import settings
+from app.core.cache import LRUCache
+
+# Scope marker for questions over all of a user's indexed files
+ALL_FILES = "*"
+
+
+class AnswerCache:
+    """
+    TTL + LRU cache of RAG answers
+
+    Keys are (user_id, scope, model_type, top_k, normalized query), where
+    scope is ALL_FILES or the sorted requested file ids, paired with each
+    file's ``indexVersion``. Re-indexing a file bumps its version, so stale
+    answers are never served even by other worker processes; entries for
+    a file are also dropped eagerly when it is re-indexed or deleted.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        self._cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case- and whitespace-insensitive form of a question"""
+        return normalize_text(query).casefold()
+
+    async def make_key(
+        self,
+        user_id: str,
+        file_ids: Optional[List[str]],
+        model_type: str,
+        top_k: int,
+        query: str
+    ) -> Tuple[Hashable, ...]:
+        """Build the cache key, looking up the current index versions"""
+        files_collection = get_collection("files")
+        if file_ids:
+            filter_query = {"id": {"$in": list(set(file_ids))}, "userId": ObjectId(user_id)}
+            scope = ()
+        else:
+            filter_query = {"userId": ObjectId(user_id), "indexed": True}
+            scope = (ALL_FILES,)
+
+        cursor = files_collection.find(filter_query, {"id": 1, "indexVersion": 1})
+        versions = {
+            file_doc["id"]: file_doc.get("indexVersion", 0)
+            async for file_doc in cursor
+        }
+        requested = sorted(set(file_ids)) if file_ids else sorted(versions)
+        scope += tuple((file_id, versions.get(file_id)) for file_id in requested)
+
+        return (user_id, scope, model_type, top_k, self.normalize_query(query))
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+
+    def put(self, key: Tuple[Hashable, ...], answer: str, sources: List[Dict[str, Any]]):
+        self._cache.put(key, {"answer": answer, "sources": sources})
+
+    def invalidate_file(self, user_id: str, file_id: str) -> int:
+        """Drop the user's answers that may have used this file"""
+        def uses_file(key) -> bool:
+            key_user_id, scope = key[0], key[1]
+            if key_user_id != user_id:
+                return False
+            if scope[:1] == (ALL_FILES,):
+                return True
+            return any(scoped_file_id == file_id for scoped_file_id, _ in scope)
+
+        return self._cache.invalidate_where(uses_file)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# Global answer cache instance
+answer_cache = AnswerCache(
+    max_entries=getattr(settings, "ANSWER_CACHE_MAX_ENTRIES", 1000),
+    ttl_seconds=getattr(settings, "ANSWER_CACHE_TTL_SECONDS", 3600)
+)
@@ -0,0 +1,231 @@
+"""
+Compact on-disk chunk store for FAISS vector stores
+Replaces the pickled InMemoryDocstore (index.pkl) with a columnar layout:
+
+    chunks.bin          UTF-8 chunk text, concatenated in vector order
+    chunks.offsets.npy  uint64 byte offsets into chunks.bin (count + 1 entries)
+    chunks.<key>.npy    int64 column for each integer metadata key that varies
+    chunks.json         header: count, id prefix, metadata shared by every
+                        chunk, column names, and any other varying metadata
+
+Text and columns are memory-mapped, so reading a chunk by vector id touches
+only its own slices, and worker processes share the pages.
+"""
+
+import os
+import json
+import mmap
+import uuid
+import pickle
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+try:
+    from langchain_community.docstore.base import Docstore
+    from langchain_community.vectorstores import FAISS
+except ImportError:
+    from langchain.docstore.base import Docstore
+    from langchain.vectorstores import FAISS
+
+from app.ai.index_factory import LOAD_HEAP, read_index
+from app.core.cache import LRUCache
+
+FORMAT_VERSION = 1
+HEADER_FILE = "chunks.json"
+TEXT_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.offsets.npy"
+INDEX_FILE = "index.faiss"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+
+def _column_file(key: str) -> str:
+    return f"chunks.{key}.npy"
+
+
+def write_chunk_store(path: str, documents: List[Document]):
+    """Write documents (in vector order) as a chunk store in directory path"""
+    os.makedirs(path, exist_ok=True)
+    metadatas = [doc.metadata for doc in documents]
+    keys = sorted({key for metadata in metadatas for key in metadata})
+
+    common: Dict[str, Any] = {}
+    int_columns: List[str] = []
+    json_columns: Dict[str, List[Any]] = {}
+    for key in keys:
+        values = [metadata.get(key) for metadata in metadatas]
+        present = all(key in metadata for metadata in metadatas)
+        if present and all(value == values[0] for value in values):
+            common[key] = values[0]
+        elif present and all(type(value) is int for value in values):
+            int_columns.append(key)
+            np.save(os.path.join(path, _column_file(key)), np.asarray(values, dtype="int64"))
+        else:
+            # Rare: varying non-integer metadata, kept per chunk in the header
+            json_columns[key] = values
+
+    offsets = np.zeros(len(documents) + 1, dtype="uint64")
+    with open(os.path.join(path, TEXT_FILE), "wb") as f:
+        for i, doc in enumerate(documents):
+            data = doc.page_content.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(path, OFFSETS_FILE), offsets)
+
+    # Header last: its presence marks the store as complete
+    with open(os.path.join(path, HEADER_FILE), "w") as f:
+        json.dump({
+            "format": FORMAT_VERSION,
+            "count": len(documents),
+            "id_prefix": uuid.uuid4().hex,
+            "common": common,
+            "int_columns": int_columns,
+            "json_columns": json_columns
+        }, f, ensure_ascii=False)
+
+
+class ChunkIds(Mapping):
+    """Vector position -> docstore id view, in place of an index_to_docstore_id dict"""
+
+    def __init__(self, id_prefix: str, count: int):
+        self.id_prefix = id_prefix
+        self.count = count
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < self.count:
+            raise KeyError(position)
+        return f"{self.id_prefix}-{position}"
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class ChunkStore(Docstore):
+    """Read-only, memory-mapped chunk store"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE), "r") as f:
+            header = json.load(f)
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store format: {header.get('format')}")
+
+        self.count: int = header["count"]
+        self.id_prefix: str = header["id_prefix"]
+        self.common: Dict[str, Any] = header["common"]
+        self.json_columns: Dict[str, List[Any]] = header["json_columns"]
+        self.int_columns = {
+            key: np.load(os.path.join(path, _column_file(key)), mmap_mode="r")
+            for key in header["int_columns"]
+        }
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+
+        self._text: Union[mmap.mmap, bytes] = b""
+        with open(os.path.join(path, TEXT_FILE), "rb") as f:
+            # mmap can't map an empty file
+            if os.fstat(f.fileno()).st_size:
+                self._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.ids = ChunkIds(self.id_prefix, self.count)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, HEADER_FILE))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get_text(self, position: int) -> str:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return self._text[start:end].decode("utf-8")
+
+    def get_metadata(self, position: int) -> Dict[str, Any]:
+        metadata = dict(self.common)
+        for key, column in self.int_columns.items():
+            metadata[key] = int(column[position])
+        for key, values in self.json_columns.items():
+            if values[position] is not None:
+                metadata[key] = values[position]
+        return metadata
+
+    def get(self, position: int) -> Optional[Document]:
+        """Chunk at a vector position"""
+        if not 0 <= position < self.count:
+            return None
+        return Document(page_content=self.get_text(position), metadata=self.get_metadata(position))
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Docstore lookup by id (``<id_prefix>-<position>``)"""
+        prefix, _, position = str(search).rpartition("-")
+        doc = self.get(int(position)) if prefix == self.id_prefix and position.isdigit() else None
+        return doc if doc is not None else f"ID {search} not found."
+
+
+class PickledChunks:
+    """Position lookup over a legacy pickled docstore"""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, LEGACY_DOCSTORE_FILE), "rb") as f:
+            self.docstore, self.index_to_docstore_id = pickle.load(f)
+
+    def __len__(self) -> int:
+        return len(self.index_to_docstore_id)
+
+    def get(self, position: int) -> Optional[Document]:
+        doc_id = self.index_to_docstore_id.get(position)
+        doc = self.docstore.search(doc_id) if doc_id is not None else None
+        return doc if isinstance(doc, Document) else None
+
+
+def save_faiss_store(vector_store: FAISS, path: str):
+    """Save a FAISS store as index.faiss plus a chunk store (instead of save_local)"""
+    os.makedirs(path, exist_ok=True)
+    documents = [
+        vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+        for position in range(vector_store.index.ntotal)
+    ]
+    faiss.write_index(vector_store.index, os.path.join(path, INDEX_FILE))
+    write_chunk_store(path, documents)
+
+
+def load_faiss_store(path: str, embeddings, load_mode: str = LOAD_HEAP) -> FAISS:
+    """Load a store written by save_faiss_store, or a legacy save_local store"""
+    index = read_index(os.path.join(path, INDEX_FILE), load_mode)
+    if ChunkStore.exists(path):
+        chunks = ChunkStore(path)
+        return FAISS(embeddings, index, chunks, chunks.ids)
+
+    legacy = PickledChunks(path)
+    return FAISS(embeddings, index, legacy.docstore, legacy.index_to_docstore_id)
+
+
+# Open chunk readers, keyed by (path, header inode) so a store replaced
+# on disk (possibly by another worker) is reopened rather than served stale
+_open_chunks = LRUCache(max_entries=4096)
+
+
+def open_chunks(path: str) -> Optional[Union[ChunkStore, PickledChunks]]:
+    """Positional chunk reader for the store in path, None if there is none"""
+    try:
+        if ChunkStore.exists(path):
+            key = (path, os.stat(os.path.join(path, HEADER_FILE)).st_ino)
+            factory = ChunkStore
+        elif os.path.exists(os.path.join(path, LEGACY_DOCSTORE_FILE)):
+            key = (path, os.stat(os.path.join(path, LEGACY_DOCSTORE_FILE)).st_ino)
+            factory = PickledChunks
+        else:
+            return None
+    except FileNotFoundError:
+        return None
+
+    chunks = _open_chunks.get(key)
+    if chunks is None:
+        chunks = factory(path)
+        _open_chunks.put(key, chunks)
+    return chunks
@@ -4,27 +4,100 @@ Enhanced and adapted from llm_chatbot_genAI/pre_doc.py
 """
 
 import os
-import hashlib
+import json
+import uuid
+import shutil
 import asyncio
-from typing import List, Optional, Dict, Any
+import weakref
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple, Callable, Awaitable
 from pathlib import Path
 
+import faiss
+
 try:
     from langchain_community.document_loaders import PyPDFLoader
     from langchain_community.vectorstores import FAISS
     from langchain_community.embeddings import HuggingFaceEmbeddings
+    from langchain_community.docstore.in_memory import InMemoryDocstore
 except ImportError:
     from langchain.document_loaders import PyPDFLoader
     from langchain.vectorstores import FAISS
     from langchain.embeddings import HuggingFaceEmbeddings
+    from langchain.docstore.in_memory import InMemoryDocstore
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
 from app.config.settings import settings
 from app.config.database import get_collection
+from app.core.cache import LRUCache
+from app.ai.user_index import UserIndexManager
+from app.ai.search_index import SearchIndexManager
+from app.ai.embedding_cache import EmbeddingCache, CachedEmbeddings
+from app.ai.pdf_parser import load_pdf_parallel
+from app.ai.answer_cache import answer_cache
+from app.services.file_cache import file_metadata_cache
+from app.ai.index_factory import LOAD_HEAP, estimate_index_bytes, writable_copy
+from app.ai.chunk_store import HEADER_FILE, save_faiss_store, load_faiss_store, open_chunks
+from app.core.executors import executors, PARSE, EMBED, INDEX_IO
 from bson import ObjectId
 
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+STORE_REF_FILE = "ref.json"
+
+# progress_callback(stage, fraction_done)
+ProgressCallback = Callable[[str, float], Awaitable[None]]
+
+
+async def _no_progress(stage: str, progress: float):
+    pass
+
+
+def _estimate_store_bytes(vector_store: FAISS) -> int:
+    """Rough in-memory size of a loaded FAISS store (index + chunk text)"""
+    size = estimate_index_bytes(vector_store.index)
+
+    for doc in getattr(vector_store.docstore, "_dict", {}).values():
+        # Per-chunk overhead covers the Document object and its metadata dict
+        size += len(doc.page_content) * 2 + 512
+
+    return size
+
+
+def prepare_chunks(
+    chunks: List[Document],
+    filename: str,
+    extra_metadata: Dict[str, Any]
+) -> List[Document]:
+    """
+    Drop very short chunks and add the chunk metadata stored with the vectors
+    Values that are the same for the whole document (source file, processing
+    time, extra_metadata) must really be equal on every chunk, so the chunk
+    store keeps them once in its header
+    """
+    document_metadata = {
+        'source_file': filename,
+        'processed_at': datetime.utcnow().isoformat(),
+        **extra_metadata
+    }
+    
+    enhanced_chunks = []
+    for i, chunk in enumerate(chunks):
+        # Filter out very short chunks
+        if len(chunk.page_content.strip()) < 50:
+            continue
+        
+        chunk.metadata.update({
+            'chunk_id': i,
+            'chunk_length': len(chunk.page_content),
+            **document_metadata
+        })
+        enhanced_chunks.append(chunk)
+    
+    return enhanced_chunks
+
+
 class DocumentProcessor:
     """Enhanced document processor with user context and database integration"""
     
@@ -33,6 +106,16 @@ class DocumentProcessor:
         self.chunk_size = settings.CHUNK_SIZE
         self.chunk_overlap = settings.CHUNK_OVERLAP
         self.embeddings = None
+        self.load_mode = getattr(settings, "VECTOR_STORE_LOAD_MODE", LOAD_HEAP)
+        self.store_cache = LRUCache(
+            max_bytes=getattr(settings, "VECTOR_STORE_CACHE_MAX_BYTES", 512 * 1024 * 1024),
+            sizeof=_estimate_store_bytes
+        )
+        self.user_index = UserIndexManager(self)
+        self.search_index = SearchIndexManager(self)
+        self._store_refs = LRUCache(max_entries=100_000)
+        # Entries go away with the last task holding or waiting on the lock
+        self._shared_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
         self._ensure_directories()
     
     def _ensure_directories(self):
@@ -40,129 +123,332 @@ class DocumentProcessor:
         os.makedirs(self.vector_stores_dir, exist_ok=True)
     
     def _get_embeddings(self):
-        """Get or create embeddings model"""
+        """
+        Get or create embeddings model
+        Wrapped in CachedEmbeddings so unchanged chunks are never re-encoded
+        """
         if self.embeddings is None:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="all-MiniLM-L6-v2",
+            base_embeddings = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,
                 model_kwargs={'device': 'cpu'}
             )
+            cache = EmbeddingCache(
+                os.path.join(self.vector_stores_dir, "embedding_cache.sqlite3"),
+                max_entries=getattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", 500_000)
+            )
+            self.embeddings = CachedEmbeddings(
+                base_embeddings,
+                EMBEDDING_MODEL_NAME,
+                cache,
+                query_cache_size=getattr(settings, "QUERY_EMBEDDING_CACHE_SIZE", 2048)
+            )
         return self.embeddings
     
-    def _get_file_hash(self, file_path: str) -> str:
-        """Generate unique hash for file"""
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        return file_hash[:8]
-    
     async def process_document(
         self, 
         file_path: str, 
         user_id: str,
-        file_id: str
+        file_id: str,
+        content_hash: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Optional[FAISS]:
         """
         Process a document for a specific user
         Enhanced from process_single_document with user context
+        
+        With a content_hash the vector store is shared by every file record
+        with the same content and is only built once; without one (files
+        uploaded before deduplication) a private per-file store is built.
+        
+        The file's indexed flag is owned by the caller (see ingestion_service);
+        progress_callback(stage, fraction) is awaited at each pipeline stage.
         """
+        progress = progress_callback or _no_progress
+        
         try:
             # Check if file exists
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"File not found: {file_path}")
             
-            # Load document
-            loader = PyPDFLoader(file_path)
-            documents = await asyncio.get_event_loop().run_in_executor(
-                None, loader.load
-            )
-            
-            if not documents:
-                raise ValueError(f"Could not extract content from: {file_path}")
-            
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-                separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""],
-                length_function=len,
-            )
-            
-            chunks = text_splitter.split_documents(documents)
-            
-            # Enhance chunks with metadata
-            enhanced_chunks = []
-            filename = os.path.basename(file_path)
+            self.store_cache.pop((user_id, file_id))
+            self._store_refs.pop((user_id, file_id))
             
-            for i, chunk in enumerate(chunks):
-                # Filter out very short chunks
-                if len(chunk.page_content.strip()) < 50:
-                    continue
+            if content_hash:
+                vector_store = await self._get_or_build_shared_store(
+                    file_path, content_hash, progress
+                )
+                await executors.run(
+                    INDEX_IO,
+                    self._write_store_ref,
+                    user_id, file_id, content_hash
+                )
+            else:
+                vector_store = await self._build_vector_store(
+                    file_path, {'file_id': file_id, 'user_id': user_id}, progress
+                )
                 
-                # Add enhanced metadata
-                chunk.metadata.update({
-                    'source_file': filename,
-                    'file_id': file_id,
-                    'user_id': user_id,
-                    'chunk_id': i,
-                    'chunk_length': len(chunk.page_content),
-                    'processed_at': str(asyncio.get_event_loop().time())
-                })
-                enhanced_chunks.append(chunk)
-            
-            if not enhanced_chunks:
-                raise ValueError("No valid chunks created from document")
-            
-            # Create vector store
-            embeddings = self._get_embeddings()
-            vector_store = await asyncio.get_event_loop().run_in_executor(
-                None, 
-                lambda: FAISS.from_documents(enhanced_chunks, embeddings)
-            )
+                # Save vector store
+                await progress("saving", 0.8)
+                vector_store_path = self._get_user_vector_store_path(user_id, file_id)
+                await executors.run(
+                    INDEX_IO,
+                    self._replace_store_files,
+                    vector_store,
+                    vector_store_path
+                )
+                self.store_cache.put((user_id, file_id), vector_store)
             
-            # Save vector store
-            vector_store_path = self._get_user_vector_store_path(user_id, file_id)
-            await asyncio.get_event_loop().run_in_executor(
-                None,
-                vector_store.save_local,
-                vector_store_path
+            # Fold the new vectors into the user's consolidated index,
+            # and the chunk text into the user's full-text index
+            await progress("indexing", 0.9)
+            await self.user_index.update_file(user_id, file_id, vector_store)
+            await self.search_index.update_file(
+                user_id, file_id, vector_store, os.path.basename(file_path)
             )
             
-            # Update file metadata in database
-            await self._update_file_index_status(file_id, user_id, True)
-            
             return vector_store
             
         except Exception as e:
-            # Update file metadata to indicate indexing failed
-            await self._update_file_index_status(file_id, user_id, False)
             raise Exception(f"Error processing document: {str(e)}")
     
+    async def _build_vector_store(
+        self,
+        file_path: str,
+        extra_metadata: Dict[str, Any],
+        progress: ProgressCallback
+    ) -> FAISS:
+        """Parse, split and embed a document into a new FAISS store"""
+        # Load document (PDF pages are extracted in parallel on a process pool)
+        await progress("parsing", 0.1)
+        if file_path.lower().endswith(".pdf"):
+            documents = await load_pdf_parallel(file_path)
+        else:
+            loader = PyPDFLoader(file_path)
+            documents = await executors.run(PARSE, loader.load)
+        
+        if not documents:
+            raise ValueError(f"Could not extract content from: {file_path}")
+        
+        # Split documents into chunks
+        await progress("splitting", 0.3)
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""],
+            length_function=len,
+        )
+        
+        chunks = text_splitter.split_documents(documents)
+        
+        # Enhance chunks with metadata
+        enhanced_chunks = prepare_chunks(chunks, os.path.basename(file_path), extra_metadata)
+        
+        if not enhanced_chunks:
+            raise ValueError("No valid chunks created from document")
+        
+        # Create vector store
+        await progress("embedding", 0.4)
+        embeddings = self._get_embeddings()
+        return await executors.run(
+            EMBED,
+            FAISS.from_documents, enhanced_chunks, embeddings
+        )
+    
+    async def _get_or_build_shared_store(
+        self,
+        file_path: str,
+        content_hash: str,
+        progress: ProgressCallback
+    ) -> FAISS:
+        """Load the content-addressed store, building it only if it doesn't exist yet"""
+        lock = self._shared_locks.get(content_hash)
+        if lock is None:
+            lock = self._shared_locks[content_hash] = asyncio.Lock()
+        
+        async with lock:
+            vector_store = await self._load_shared_vector_store(content_hash)
+            if vector_store is not None:
+                return vector_store
+            
+            # Chunks in a shared store carry no user or file identity;
+            # file_id is stamped on at retrieval time
+            vector_store = await self._build_vector_store(
+                file_path, {'content_hash': content_hash}, progress
+            )
+            await progress("saving", 0.8)
+            await executors.run(
+                INDEX_IO,
+                self._save_store_atomically,
+                vector_store,
+                self._get_shared_vector_store_path(content_hash)
+            )
+            self.store_cache.put(("shared", content_hash), vector_store)
+        
+        return vector_store
+    
+    def _save_store_atomically(self, vector_store: FAISS, path: str):
+        """Write a store to a temp dir and rename it into place"""
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        save_faiss_store(vector_store, tmp_path)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another worker published the same content first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    
+    def _replace_store_files(self, vector_store: FAISS, path: str):
+        """
+        Overwrite a store by renaming new files over the old ones
+        Writing in place would truncate files other workers may have
+        memory-mapped; a rename leaves their mapping on the old inode
+        """
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        save_faiss_store(vector_store, tmp_path)
+        os.makedirs(path, exist_ok=True)
+        
+        new_files = os.listdir(tmp_path)
+        # The chunk store header goes last, once the files it describes are in place
+        for name in sorted(new_files, key=lambda name: name == HEADER_FILE):
+            os.replace(os.path.join(tmp_path, name), os.path.join(path, name))
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        
+        # Drop files of the previous format (e.g. a pickled docstore)
+        for name in set(os.listdir(path)) - set(new_files):
+            os.remove(os.path.join(path, name))
+    
+    def _write_store_ref(self, user_id: str, file_id: str, content_hash: str):
+        """Point a user's file at a shared store"""
+        vector_store_path = self._get_user_vector_store_path(user_id, file_id)
+        if os.path.exists(vector_store_path):
+            # Replace a private store left from before deduplication
+            shutil.rmtree(vector_store_path)
+        os.makedirs(vector_store_path, exist_ok=True)
+        
+        ref_path = os.path.join(vector_store_path, STORE_REF_FILE)
+        with open(f"{ref_path}.tmp", "w") as f:
+            json.dump({"content_hash": content_hash}, f)
+        os.replace(f"{ref_path}.tmp", ref_path)
+        self._store_refs.put((user_id, file_id), content_hash)
+    
+    def _resolve_store_ref(self, user_id: str, file_id: str) -> Optional[str]:
+        """Get the shared store hash a user's file points at, None for private stores"""
+        content_hash = self._store_refs.get((user_id, file_id))
+        if content_hash is not None:
+            return content_hash
+        
+        ref_path = os.path.join(
+            self._get_user_vector_store_path(user_id, file_id), STORE_REF_FILE
+        )
+        try:
+            with open(ref_path, "r") as f:
+                content_hash = json.load(f)["content_hash"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        
+        self._store_refs.put((user_id, file_id), content_hash)
+        return content_hash
+    
+    async def _load_shared_vector_store(
+        self,
+        content_hash: str,
+        load_mode: Optional[str] = None
+    ) -> Optional[FAISS]:
+        """Load a content-addressed store through the cache"""
+        cached_store = self.store_cache.get(("shared", content_hash))
+        if cached_store is not None:
+            return cached_store
+        
+        vector_store_path = self._get_shared_vector_store_path(content_hash)
+        if not os.path.exists(vector_store_path):
+            return None
+        
+        vector_store = await self._load_store_from_disk(vector_store_path, load_mode)
+        self.store_cache.put(("shared", content_hash), vector_store)
+        return vector_store
+    
+    async def _load_store_from_disk(
+        self,
+        vector_store_path: str,
+        load_mode: Optional[str] = None
+    ) -> FAISS:
+        """Load a saved store (chunk store or legacy pickle) in the given (or configured) load mode"""
+        load_mode = load_mode or self.load_mode
+        embeddings = self._get_embeddings()
+        return await executors.run(
+            INDEX_IO,
+            load_faiss_store,
+            vector_store_path, embeddings, load_mode
+        )
+    
     async def load_user_vector_store(
         self, 
         user_id: str, 
-        file_id: str
+        file_id: str,
+        load_mode: Optional[str] = None
     ) -> Optional[FAISS]:
-        """Load vector store for specific user and file"""
+        """
+        Load vector store for specific user and file
+        Served from the in-process LRU cache when possible; callers must not
+        mutate the returned store (see combine_user_vector_stores)
+        ``load_mode`` ("heap" or "mmap", default VECTOR_STORE_LOAD_MODE)
+        applies when the store has to be read from disk. Memory-mapped
+        stores are shared between worker processes through the page cache
+        """
         try:
+            content_hash = self._resolve_store_ref(user_id, file_id)
+            if content_hash:
+                return await self._load_shared_vector_store(content_hash, load_mode)
+            
+            cached_store = self.store_cache.get((user_id, file_id))
+            if cached_store is not None:
+                return cached_store
+            
             vector_store_path = self._get_user_vector_store_path(user_id, file_id)
             
             if not os.path.exists(vector_store_path):
                 return None
             
-            embeddings = self._get_embeddings()
-            vector_store = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: FAISS.load_local(
-                    vector_store_path, 
-                    embeddings, 
-                    allow_dangerous_deserialization=True
-                )
-            )
+            vector_store = await self._load_store_from_disk(vector_store_path, load_mode)
             
+            self.store_cache.put((user_id, file_id), vector_store)
             return vector_store
             
         except Exception as e:
             return None
     
+    def get_file_chunks(self, user_id: str, file_id: str):
+        """
+        Positional chunk reader (see chunk_store) for a file's store
+        Lets the per-user index resolve hits without copying chunk text
+        Returns None if the file has no store
+        """
+        content_hash = self._resolve_store_ref(user_id, file_id)
+        if content_hash:
+            return open_chunks(self._get_shared_vector_store_path(content_hash))
+        return open_chunks(self._get_user_vector_store_path(user_id, file_id))
+    
+    async def load_user_vector_stores(
+        self, 
+        user_id: str, 
+        file_ids: List[str]
+    ) -> List[Tuple[str, FAISS]]:
+        """Load several per-file stores concurrently as (file_id, store) pairs, skipping missing ones"""
+        stores = await asyncio.gather(*[
+            self.load_user_vector_store(user_id, file_id) for file_id in file_ids
+        ])
+        return [
+            (file_id, store) for file_id, store in zip(file_ids, stores)
+            if store is not None
+        ]
+    
+    async def load_user_merged_store(self, user_id: str) -> Optional[FAISS]:
+        """Load the prebuilt index covering all of a user's processed files"""
+        try:
+            return await self.user_index.load(user_id)
+        except Exception as e:
+            print(f"Warning: Could not load user index: {e}")
+            return None
+    
     async def combine_user_vector_stores(
         self, 
         user_id: str, 
@@ -176,7 +462,10 @@ class DocumentProcessor:
                 store = await self.load_user_vector_store(user_id, file_id)
                 if store:
                     if combined_store is None:
-                        combined_store = store
+                        # Stores come from the shared cache, so merge into a copy
+                        combined_store = (
+                            self._clone_vector_store(store) if len(file_ids) > 1 else store
+                        )
                     else:
                         combined_store.merge_from(store)
             
@@ -185,6 +474,25 @@ class DocumentProcessor:
         except Exception as e:
             return None
     
+    def _clone_vector_store(self, vector_store: FAISS) -> FAISS:
+        """Copy a store so that merge_from does not mutate the cached original"""
+        return FAISS(
+            embedding_function=vector_store.embedding_function,
+            index=writable_copy(vector_store.index),
+            docstore=InMemoryDocstore({
+                doc_id: vector_store.docstore.search(doc_id)
+                for doc_id in vector_store.index_to_docstore_id.values()
+            }),
+            index_to_docstore_id=dict(vector_store.index_to_docstore_id)
+        )
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get vector store and embedding cache counters"""
+        stats = {"vector_stores": self.store_cache.stats()}
+        if self.embeddings is not None:
+            stats["embeddings"] = self.embeddings.stats()
+        return stats
+    
     async def get_user_processed_files(self, user_id: str) -> List[Dict[str, Any]]:
         """Get list of processed files for a user"""
         try:
@@ -217,6 +525,10 @@ class DocumentProcessor:
         except Exception as e:
             return []
     
+    def _get_shared_vector_store_path(self, content_hash: str) -> str:
+        """Get content-addressed vector store path"""
+        return os.path.join(self.vector_stores_dir, "shared", content_hash)
+    
     def _get_user_vector_store_path(self, user_id: str, file_id: str) -> str:
         """Get vector store path for user and file"""
         return os.path.join(
@@ -231,7 +543,12 @@ class DocumentProcessor:
         user_id: str, 
         indexed: bool
     ):
-        """Update file indexing status in database"""
+        """
+        Update file indexing status in database
+        indexVersion is bumped on every change so cached answers keyed on
+        the old version are no longer served
+        """
+        answer_cache.invalidate_file(user_id, file_id)
         try:
             files_collection = get_collection("files")
             await files_collection.update_one(
@@ -243,20 +560,45 @@ class DocumentProcessor:
                     "$set": {
                         "indexed": indexed,
                         "indexedAt": asyncio.get_event_loop().time() if indexed else None
-                    }
+                    },
+                    "$inc": {"indexVersion": 1}
                 }
             )
+            file_metadata_cache.invalidate(user_id, file_id)
         except Exception as e:
             # Log error but don't raise - this is not critical
             print(f"Warning: Could not update file index status: {e}")
     
     async def delete_user_vector_store(self, user_id: str, file_id: str) -> bool:
-        """Delete vector store for specific file"""
+        """
+        Delete vector store for specific file
+        For deduplicated files only the pointer is removed; the shared store
+        goes away with the last blob reference (see delete_shared_vector_store)
+        """
+        answer_cache.invalidate_file(user_id, file_id)
         try:
+            self.store_cache.pop((user_id, file_id))
+            self._store_refs.pop((user_id, file_id))
+            await self.user_index.remove_file(user_id, file_id)
+            await self.search_index.remove_file(user_id, file_id)
             vector_store_path = self._get_user_vector_store_path(user_id, file_id)
             
             if os.path.exists(vector_store_path):
-                import shutil
+                shutil.rmtree(vector_store_path)
+                return True
+            
+            return False
+            
+        except Exception as e:
+            return False
+    
+    async def delete_shared_vector_store(self, content_hash: str) -> bool:
+        """Delete a content-addressed vector store"""
+        try:
+            self.store_cache.pop(("shared", content_hash))
+            vector_store_path = self._get_shared_vector_store_path(content_hash)
+            
+            if os.path.exists(vector_store_path):
                 shutil.rmtree(vector_store_path)
                 return True
             
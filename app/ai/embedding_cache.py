@@ -0,0 +1,208 @@
+"""
+Content-addressed embedding cache
+Chunk embeddings persist on disk keyed by (model name, hash of normalized
+text) so re-ingesting unchanged content only costs a hash and a lookup.
+Query embeddings are kept in a small in-memory LRU in front of the model.
+"""
+
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    from langchain.embeddings.base import Embeddings
+
+from app.core.cache import LRUCache
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different copies share a cache key"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    """Hash of the normalized text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store with size-bounded LRU eviction"""
+
+    def __init__(self, db_path: str, max_entries: int = 500_000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access"
+            " ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Look up vectors by hash, returning only the ones found"""
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings"
+                    f" WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(set(hashes)) - len(found)
+
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        """Store vectors by hash and evict least recently used entries if over budget"""
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (model, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._count += self._conn.total_changes - before
+
+            if self._count > self.max_entries:
+                # Evict down to 90% so eviction doesn't run on every insert
+                overflow = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    " SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self._count -= overflow
+                self.evictions += overflow
+
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that consults the cache before encoding
+
+    Document (chunk) embeddings go through the persistent EmbeddingCache;
+    query embeddings go through an in-memory LRU only.
+    """
+
+    def __init__(
+        self,
+        base_embeddings: Embeddings,
+        model_name: str,
+        cache: EmbeddingCache,
+        query_cache_size: int = 2048
+    ):
+        self.base_embeddings = base_embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self.query_cache = LRUCache(max_entries=query_cache_size)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(self.model_name, list(set(hashes)))
+
+        # Encode each missing unique text once
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.base_embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model_name, computed)
+            found.update(computed)
+
+        return [found[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def get_cached_query(self, text: str) -> Optional[List[float]]:
+        """Look up a query embedding in the in-memory LRU only"""
+        return self.query_cache.get((self.model_name, text_hash(text)))
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one model call, filling the query LRU"""
+        keys = [(self.model_name, text_hash(text)) for text in texts]
+        results: List[Optional[List[float]]] = [self.query_cache.get(key) for key in keys]
+
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing:
+            vectors = self.base_embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, vectors):
+                results[i] = vector
+                self.query_cache.put(keys[i], vector)
+
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Get chunk and query cache counters"""
+        return {
+            "chunks": self.cache.stats(),
+            "queries": self.query_cache.stats()
+        }
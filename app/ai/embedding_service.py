@@ -0,0 +1,124 @@
+"""
+Query embedding service
+Micro-batches concurrent query embeddings into a single encode call
+"""
+
+import time
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.ai.document_processor import document_processor
+from app.config.settings import settings
+from app.core.executors import executors, QUERY_EMBED
+from app.core.metrics import Histogram
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collect concurrent embed requests for up to ``max_wait_ms`` (or until
+    ``max_batch_size`` is reached), encode them as one batch and resolve
+    each caller's future.
+
+    While a batch is being encoded the next one is already being collected,
+    so under load batches fill up without adding latency. Queries already
+    in the embeddings' query cache are answered without queueing.
+    """
+
+    def __init__(
+        self,
+        embeddings_provider: Callable[[], Any],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self._embeddings_provider = embeddings_provider
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.batch_size_histogram = Histogram(
+            "embedding_batch_size",
+            "Number of queries encoded per batch",
+            buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+        )
+        self.wait_time_histogram = Histogram(
+            "embedding_queue_wait_seconds",
+            "Time a query waited before its batch started encoding",
+            buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+        )
+
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed one query, batched with any concurrent callers"""
+        cached = self._embeddings_provider().get_cached_query(text)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        self._ensure_worker(loop)
+
+        future = loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop):
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+
+            started = time.perf_counter()
+            self.batch_size_histogram.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                self.wait_time_histogram.observe(started - enqueued_at)
+
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = self._embeddings_provider()
+                vectors = await executors.run(
+                    QUERY_EMBED, embeddings.embed_queries, texts
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                # Callers that were cancelled while waiting are skipped
+                if not future.done():
+                    future.set_result(vector)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batch-size and wait-time histograms"""
+        return {
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "wait_seconds": self.wait_time_histogram.snapshot()
+        }
+
+
+# Global query embedding service instance
+query_embedding_service = QueryEmbeddingBatcher(
+    document_processor._get_embeddings,
+    max_batch_size=getattr(settings, "EMBEDDING_BATCH_MAX_SIZE", 32),
+    max_wait_ms=getattr(settings, "EMBEDDING_BATCH_MAX_WAIT_MS", 5.0)
+)
@@ -0,0 +1,196 @@
+"""
+FAISS index type selection and loading
+Small corpora use an exact flat index; larger ones switch to HNSW and then
+to IVF-PQ, trading a little recall for much faster (and smaller) search.
+Indexes can be loaded into private heap memory or memory-mapped read-only.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from app.config.settings import settings
+
+# Index types
+FLAT = "flat"
+HNSW = "hnsw"
+IVFPQ = "ivfpq"
+
+# Load modes
+LOAD_HEAP = "heap"  # Read into private memory (per process)
+LOAD_MMAP = "mmap"  # Map the vector data read-only, shared through the page cache
+LOAD_MODES = (LOAD_HEAP, LOAD_MMAP)
+
+
+@dataclass
+class IndexConfig:
+    """Thresholds and recall/latency knobs for each index type"""
+    hnsw_min_vectors: int = 50_000
+    ivfpq_min_vectors: int = 500_000
+    hnsw_m: int = 32                 # Graph degree: higher = better recall, more memory
+    hnsw_ef_construction: int = 200
+    hnsw_ef_search: int = 64         # Search breadth: higher = better recall, slower
+    ivf_nlist: int = 0               # Coarse clusters, 0 = 4 * sqrt(vector count)
+    ivf_nprobe: int = 16             # Clusters visited per query
+    pq_m: int = 48                   # Sub-quantizers (rounded down to divide the dimension)
+    pq_bits: int = 8
+    train_size: int = 100_000        # Vectors sampled to train IVF-PQ codebooks
+
+    @classmethod
+    def from_settings(cls) -> "IndexConfig":
+        defaults = cls()
+        return cls(**{
+            field: getattr(settings, f"INDEX_{field.upper()}", getattr(defaults, field))
+            for field in defaults.__dataclass_fields__
+        })
+
+    @property
+    def min_training_vectors(self) -> int:
+        """Fewest vectors that can train the PQ codebooks reasonably"""
+        return 39 * (2 ** self.pq_bits)
+
+    def select_index_type(self, vector_count: int) -> str:
+        """Index type for a corpus of this size"""
+        if vector_count >= max(self.ivfpq_min_vectors, self.min_training_vectors):
+            return IVFPQ
+        if vector_count >= self.hnsw_min_vectors:
+            return HNSW
+        return FLAT
+
+
+def create_index(
+    index_type: str,
+    dimension: int,
+    config: IndexConfig,
+    training_vectors: Optional[np.ndarray] = None,
+    expected_vectors: Optional[int] = None
+) -> faiss.Index:
+    """
+    Create an empty index that accepts add_with_ids
+    IVF-PQ needs ``training_vectors`` for its coarse quantizer and codebooks
+    """
+    if index_type == HNSW:
+        hnsw = faiss.IndexHNSWFlat(dimension, config.hnsw_m)
+        hnsw.hnsw.efConstruction = config.hnsw_ef_construction
+        hnsw.hnsw.efSearch = config.hnsw_ef_search
+        return faiss.IndexIDMap2(hnsw)
+
+    if index_type == IVFPQ:
+        if training_vectors is None or len(training_vectors) == 0:
+            raise ValueError("IVF-PQ index needs training vectors")
+
+        nlist = config.ivf_nlist or int(4 * math.sqrt(expected_vectors or len(training_vectors)))
+        # k-means wants ~39 training points per cluster
+        nlist = max(1, min(nlist, len(training_vectors) // 39))
+
+        pq_m = min(config.pq_m, dimension)
+        while dimension % pq_m:
+            pq_m -= 1
+
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, config.pq_bits)
+        index.train(np.ascontiguousarray(training_vectors, dtype="float32"))
+        index.nprobe = min(config.ivf_nprobe, nlist)
+        return index
+
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+
+def _unwrap(index: faiss.Index) -> faiss.Index:
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def get_index_type(index: faiss.Index) -> str:
+    """Which of FLAT / HNSW / IVFPQ an index is"""
+    inner = _unwrap(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(inner, faiss.IndexIVF):
+        return IVFPQ
+    return FLAT
+
+
+def supports_remove(index: faiss.Index) -> bool:
+    """HNSW graphs can't delete vectors; they have to be rebuilt"""
+    return get_index_type(index) != HNSW
+
+
+def apply_search_params(index: faiss.Index, config: IndexConfig):
+    """Apply the configured search-time knobs to a loaded index"""
+    inner = _unwrap(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = config.hnsw_ef_search
+    elif isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(config.ivf_nprobe, inner.nlist)
+
+
+def read_index(path: str, load_mode: str = LOAD_HEAP) -> faiss.Index:
+    """
+    Read an index written by faiss.write_index
+    In mmap mode the flat vector / code storage is mapped instead of copied,
+    so worker processes share one copy and only touched pages use RAM. The
+    result is read-only: take a writable_copy before adding or removing.
+    """
+    if load_mode not in LOAD_MODES:
+        raise ValueError(f"Unknown index load mode: {load_mode}")
+    if load_mode == LOAD_MMAP:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    return faiss.read_index(path)
+
+
+def _owned_bytes(vector) -> int:
+    """Heap bytes of a faiss vector; memory-mapped ones (mmap load mode) count as none"""
+    if not getattr(vector, "is_owned", True):
+        return 0
+    return vector.size()
+
+
+def estimate_index_bytes(index: faiss.Index) -> int:
+    """
+    Approximate private memory held by an index of any of the three types
+    Used to budget the vector store cache: flat vectors are 4 bytes per
+    dimension, but IVF-PQ codes are a few bytes per vector, and mapped
+    storage lives in the shared page cache rather than the process heap
+    """
+    size = 0
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        # id_map, plus the reverse hash map of IndexIDMap2
+        size += index.ntotal * (40 if isinstance(index, faiss.IndexIDMap2) else 8)
+        index = faiss.downcast_index(index.index)
+
+    if isinstance(index, faiss.IndexHNSW):
+        hnsw = index.hnsw
+        size += (hnsw.neighbors.size() + hnsw.levels.size()) * 4 + hnsw.offsets.size() * 8
+        return size + estimate_index_bytes(faiss.downcast_index(index.storage))
+
+    if isinstance(index, faiss.IndexIVF):
+        # Inverted lists hold a code and an id per vector
+        size += index.ntotal * (index.code_size + 8)
+        size += estimate_index_bytes(faiss.downcast_index(index.quantizer))
+        pq = getattr(index, "pq", None)
+        if pq is not None:
+            size += pq.centroids.size() * 4
+        return size
+
+    codes = getattr(index, "codes", None)
+    if codes is not None:
+        return size + _owned_bytes(codes)
+    return size + index.ntotal * index.d * 4
+
+
+def writable_copy(index: faiss.Index) -> faiss.Index:
+    """
+    Deep copy that owns its storage
+    faiss.clone_index of a memory-mapped index still points at the mapping,
+    and mutating it aborts the process
+    """
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+# Global index configuration
+index_config = IndexConfig.from_settings()
@@ -4,8 +4,9 @@ Enhanced and adapted from llm_chatbot_genAI/llm_rag.py
 """
 
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, AsyncIterator
 from langchain.chains import RetrievalQA
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
 from langchain.llms import OpenAI
 
 try:
@@ -83,22 +84,53 @@ class LLMClient:
         else:
             raise ValueError(f"Unsupported model type: {model_type}")
     
-    def create_qa_chain(self, vector_store, model_type: str = "gemini"):
+    def create_qa_chain(
+        self,
+        vector_store,
+        model_type: str = "gemini",
+        retriever=None,
+        top_k: int = 5
+    ):
         """
         Create QA chain with vector store
         Enhanced from create_qa_chain function in llm_rag.py
+        A prebuilt retriever (e.g. FederatedRetriever) takes precedence over vector_store
         """
         llm = self.get_client(model_type)
         
+        if retriever is None:
+            retriever = vector_store.as_retriever(search_kwargs={"k": top_k})
+        
         qa_chain = RetrievalQA.from_chain_type(
             llm=llm,
             chain_type="stuff",
-            retriever=vector_store.as_retriever(search_kwargs={"k": 10}),
+            retriever=retriever,
             return_source_documents=True
         )
         
         return qa_chain
     
+    async def stream_answer(
+        self,
+        question: str,
+        documents: List[Any],
+        model_type: str = "gemini"
+    ) -> AsyncIterator[str]:
+        """
+        Stream an answer over already-retrieved documents, token by token
+        Builds the same "stuff" prompt as create_qa_chain and uses the
+        provider's native streaming through astream
+        """
+        llm = self.get_client(model_type)
+        prompt = PROMPT_SELECTOR.get_prompt(llm)
+        context = "\n\n".join(doc.page_content for doc in documents)
+        
+        async for chunk in llm.astream(prompt.format_prompt(context=context, question=question)):
+            # Chat models yield message chunks, completion models yield strings
+            text = getattr(chunk, "content", chunk)
+            if text:
+                yield text
+    
     def get_available_models(self) -> Dict[str, bool]:
         """Check which models are available"""
         models = {
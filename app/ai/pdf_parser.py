@@ -0,0 +1,103 @@
+"""
+Page-parallel PDF text extraction
+pypdf extraction is pure Python and GIL-bound, so large PDFs are split
+into page ranges and extracted on a process pool
+"""
+
+import os
+import math
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from langchain.schema import Document
+
+from app.config.settings import settings
+from app.core.executors import executors, PARSE
+
+# Below this many pages the process round trip costs more than it saves
+MIN_PAGES_PER_TASK = 8
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pdf_process_pool() -> ProcessPoolExecutor:
+    """Get or create the shared PDF extraction process pool"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=getattr(settings, "PDF_PARSE_WORKERS", None) or os.cpu_count()
+        )
+    return _process_pool
+
+
+def shutdown_pdf_pool(wait: bool = True):
+    """Stop the PDF extraction worker processes (called from the application lifespan)"""
+    global _process_pool
+    pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def count_pdf_pages(file_path: str) -> int:
+    """Number of pages in a PDF"""
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extract text of pages [start, end) as (page_index, text) pairs
+    Runs in a worker process, so it only takes and returns picklable values
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text()) for i in range(start, end)]
+
+
+def split_page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into about two ranges per worker, for load balancing"""
+    if page_count == 0:
+        return []
+    pages_per_task = max(MIN_PAGES_PER_TASK, math.ceil(page_count / (workers * 2)))
+    return [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+
+async def load_pdf_parallel(
+    file_path: str,
+    executor: Optional[ProcessPoolExecutor] = None
+) -> List[Document]:
+    """
+    Load a PDF as one Document per page, like PyPDFLoader.load
+    Page ranges are extracted concurrently and reassembled in page order
+    with the same ``source``/``page`` metadata PyPDFLoader produces
+    """
+    loop = asyncio.get_event_loop()
+    executor = executor or get_pdf_process_pool()
+
+    page_count = await executors.run(PARSE, count_pdf_pages, file_path)
+    workers = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+    ranges = split_page_ranges(page_count, workers)
+
+    try:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, extract_page_range, file_path, start, end)
+            for start, end in ranges
+        ])
+    except BrokenProcessPool:
+        # A crashed worker poisons the pool; fall back to in-thread extraction
+        if executor is _process_pool:
+            shutdown_pdf_pool(wait=False)
+        results = [await executors.run(
+            PARSE, extract_page_range, file_path, 0, page_count
+        )]
+
+    pages = sorted(page for result in results for page in result)
+    return [
+        Document(page_content=text, metadata={"source": file_path, "page": page_index})
+        for page_index, text in pages
+    ]
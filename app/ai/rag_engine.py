@@ -5,14 +5,48 @@ Core AI processing engine integrated from llm_chatbot_genAI
 
 import time
 import asyncio
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Tuple, Union, AsyncIterator
+from dataclasses import dataclass, field
 
 from app.ai.document_processor import document_processor
 from app.ai.llm_client import llm_client
+from app.ai.retrievers import FederatedRetriever, HybridRetriever
+from app.ai.embedding_service import query_embedding_service
+from app.ai.answer_cache import answer_cache
+from app.ai.reranker import reranker
+from app.config.settings import settings
 from app.config.database import get_collection
+from app.services.file_cache import file_metadata_cache
+from app.core.executors import executors, LLM
+from app.core.metrics import Counter, Histogram
 from bson import ObjectId
 
+rag_stage_histogram = Histogram(
+    "rag_stage_seconds",
+    "Time spent in each stage of the RAG pipeline",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    labelnames=("stage",)
+)
+rag_requests_counter = Counter(
+    "rag_requests_total",
+    "Chat requests by mode (chat, stream) and outcome (answered, cached, empty, error)",
+    labelnames=("mode", "outcome")
+)
+llm_chunks_counter = Counter(
+    "llm_stream_chunks_total",
+    "Streamed LLM output chunks (roughly tokens) per model",
+    labelnames=("model",)
+)
+llm_answer_chars_counter = Counter(
+    "llm_answer_chars_total",
+    "Characters of generated answers per model",
+    labelnames=("model",)
+)
+
+def stage_timer(stage: str):
+    """Context manager observing a pipeline stage in rag_stage_seconds"""
+    return rag_stage_histogram.labels(stage).time()
+
 @dataclass
 class RAGResponse:
     """Response from RAG engine"""
@@ -21,6 +55,8 @@ class RAGResponse:
     processing_time: float
     model_used: str
     query: str
+    cached: bool = False
+    retrieval_timings: Dict[str, float] = field(default_factory=dict)
 
 class RAGEngine:
     """
@@ -46,32 +82,28 @@ class RAGEngine:
         start_time = time.time()
         
         try:
-            # Get user's files to search
-            if file_ids:
-                # Specific files requested
-                search_files = file_ids
-            else:
-                # Search all user's processed files
-                processed_files = await self.doc_processor.get_user_processed_files(user_id)
-                search_files = [f["id"] for f in processed_files]
-            
-            if not search_files:
+            with stage_timer("answer_cache"):
+                cache_key = await self._get_answer_cache_key(user_id, file_ids, model_type, top_k, query)
+                cached = answer_cache.get(cache_key) if cache_key else None
+            if cached:
+                # Cached answers still show up in the user's chat history
+                with stage_timer("log_conversation"):
+                    await self._log_conversation(user_id, query, cached["answer"], cached["sources"], model_type)
+                rag_requests_counter.inc("chat", "cached")
                 return RAGResponse(
-                    answer="Bạn chưa có tài liệu nào được xử lý. Hãy upload và xử lý file PDF trước.",
-                    sources=[],
+                    answer=cached["answer"],
+                    sources=cached["sources"],
                     processing_time=time.time() - start_time,
                     model_used=model_type,
-                    query=query
+                    query=query,
+                    cached=True
                 )
             
-            # Load and combine vector stores
-            vector_store = await self.doc_processor.combine_user_vector_stores(
-                user_id, search_files
-            )
-            
-            if not vector_store:
+            retriever, empty_message = await self._build_retriever(query, user_id, file_ids, top_k)
+            if retriever is None:
+                rag_requests_counter.inc("chat", "empty")
                 return RAGResponse(
-                    answer="Không thể tải vector store cho tài liệu của bạn. Vui lòng thử lại sau.",
+                    answer=empty_message,
                     sources=[],
                     processing_time=time.time() - start_time,
                     model_used=model_type,
@@ -79,24 +111,32 @@ class RAGEngine:
                 )
             
             # Create QA chain
-            qa_chain = self.llm.create_qa_chain(vector_store, model_type)
+            qa_chain = self.llm.create_qa_chain(None, model_type, retriever=retriever, top_k=top_k)
             
-            # Execute query
-            result = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: qa_chain.invoke({"query": query})
-            )
+            # Execute query (retrieval and generation; the retrieval legs
+            # have their own histograms)
+            with stage_timer("qa_chain"):
+                result = await executors.run(
+                    LLM,
+                    lambda: qa_chain.invoke({"query": query})
+                )
             
             # Process response
             answer = result.get('result', 'Không tìm thấy thông tin phù hợp.')
             source_docs = result.get('source_documents', [])
             
             # Format sources
-            sources = await self._format_sources(source_docs, user_id)
+            with stage_timer("format_sources"):
+                sources = await self._format_sources(source_docs, user_id)
             
             # Log conversation
-            await self._log_conversation(user_id, query, answer, sources, model_type)
+            with stage_timer("log_conversation"):
+                await self._log_conversation(user_id, query, answer, sources, model_type)
+            if cache_key:
+                answer_cache.put(cache_key, answer, sources)
             
+            llm_answer_chars_counter.inc(model_type, amount=len(answer))
+            rag_requests_counter.inc("chat", "answered")
             processing_time = time.time() - start_time
             
             return RAGResponse(
@@ -104,10 +144,12 @@ class RAGEngine:
                 sources=sources,
                 processing_time=processing_time,
                 model_used=model_type,
-                query=query
+                query=query,
+                retrieval_timings=dict(getattr(retriever, "timings", {}))
             )
             
         except Exception as e:
+            rag_requests_counter.inc("chat", "error")
             processing_time = time.time() - start_time
             error_message = f"Có lỗi xảy ra khi xử lý câu hỏi: {str(e)}"
             
@@ -119,6 +161,201 @@ class RAGEngine:
                 query=query
             )
     
+    async def _get_answer_cache_key(
+        self,
+        user_id: str,
+        file_ids: Optional[List[str]],
+        model_type: str,
+        top_k: int,
+        query: str
+    ):
+        """Answer cache key, None if it can't be built (the query then just isn't cached)"""
+        try:
+            return await answer_cache.make_key(user_id, file_ids, model_type, top_k, query)
+        except Exception as e:
+            print(f"Warning: Could not build answer cache key: {e}")
+            return None
+    
+    async def _build_retriever(
+        self,
+        query: str,
+        user_id: str,
+        file_ids: Optional[List[str]] = None,
+        top_k: int = 5
+    ) -> Tuple[Optional[Union[FederatedRetriever, HybridRetriever]], Optional[str]]:
+        """
+        Load the stores to search and build the retriever for a query
+        Returns (None, message) when there is nothing the user can search
+        Only the top_k chunks reach the prompt; with reranking enabled more
+        candidates are fetched and reranked down to top_k. With hybrid search
+        enabled the vector search is fused with the user's BM25 index.
+        """
+        stores = []
+        
+        with stage_timer("load_stores"):
+            # Get user's files to search
+            if file_ids:
+                # Specific files requested
+                search_files = file_ids
+            else:
+                # Search all user's processed files through the prebuilt index
+                merged_store = await self.doc_processor.load_user_merged_store(user_id)
+                if merged_store:
+                    stores = [(None, merged_store)]
+                    search_files = None
+                else:
+                    processed_files = await self.doc_processor.get_user_processed_files(user_id)
+                    search_files = [f["id"] for f in processed_files]
+                    
+                    if not search_files:
+                        return None, "Bạn chưa có tài liệu nào được xử lý. Hãy upload và xử lý file PDF trước."
+            
+            if search_files:
+                # Search the per-file stores side by side instead of merging them
+                stores = await self.doc_processor.load_user_vector_stores(
+                    user_id, search_files
+                )
+        
+        if not stores:
+            return None, "Không thể tải vector store cho tài liệu của bạn. Vui lòng thử lại sau."
+        
+        # Embed the query through the shared batching service
+        with stage_timer("embed_query"):
+            query_embedding = await query_embedding_service.embed_query(query)
+        fetch_k = max(top_k, getattr(settings, "RERANK_CANDIDATES", 20))
+        rerank_budget_seconds = getattr(settings, "RERANK_TIME_BUDGET_MS", 300) / 1000.0
+        
+        lexical_index = None
+        if getattr(settings, "HYBRID_SEARCH_ENABLED", True):
+            try:
+                with stage_timer("load_search_index"):
+                    lexical_index = await self.doc_processor.search_index.load(user_id)
+            except Exception as e:
+                print(f"Warning: Could not load search index, using vector search only: {e}")
+        
+        if lexical_index is None:
+            retriever = FederatedRetriever(
+                stores=[store for _, store in stores],
+                file_ids=[file_id for file_id, _ in stores],
+                k=top_k,
+                query_embedding=query_embedding,
+                fetch_k=fetch_k,
+                reranker=reranker,
+                rerank_budget_seconds=rerank_budget_seconds
+            )
+            return retriever, None
+        
+        dense = FederatedRetriever(
+            stores=[store for _, store in stores],
+            file_ids=[file_id for file_id, _ in stores],
+            k=top_k,
+            query_embedding=query_embedding
+        )
+        retriever = HybridRetriever(
+            dense=dense,
+            lexical_index=lexical_index,
+            open_file_chunks=lambda file_id: self.doc_processor.get_file_chunks(user_id, file_id),
+            file_ids=search_files,
+            k=top_k,
+            fetch_k=fetch_k,
+            rrf_k=getattr(settings, "HYBRID_RRF_K", 60),
+            reranker=reranker,
+            rerank_budget_seconds=rerank_budget_seconds
+        )
+        return retriever, None
+    
+    async def stream_chat_with_documents(
+        self,
+        query: str,
+        user_id: str,
+        file_ids: Optional[List[str]] = None,
+        model_type: str = "gemini",
+        top_k: int = 5
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of chat_with_documents
+        Yields {"event", "data"} dicts: "sources" once retrieval is done,
+        then one "token" per LLM chunk, then "done" (or "error"). The full
+        conversation is logged once the answer is complete.
+        """
+        start_time = time.time()
+        
+        try:
+            with stage_timer("answer_cache"):
+                cache_key = await self._get_answer_cache_key(user_id, file_ids, model_type, top_k, query)
+                cached = answer_cache.get(cache_key) if cache_key else None
+            if cached:
+                # Logged like a fresh answer once it has been sent
+                rag_requests_counter.inc("stream", "cached")
+                yield {"event": "sources", "data": {"sources": cached["sources"]}}
+                yield {"event": "token", "data": {"text": cached["answer"]}}
+                with stage_timer("log_conversation"):
+                    await self._log_conversation(user_id, query, cached["answer"], cached["sources"], model_type)
+                yield {"event": "done", "data": {
+                    "processing_time": time.time() - start_time,
+                    "time_to_first_token": time.time() - start_time,
+                    "model_used": model_type,
+                    "query": query,
+                    "cached": True
+                }}
+                return
+            
+            retriever, empty_message = await self._build_retriever(query, user_id, file_ids, top_k)
+            if retriever is None:
+                rag_requests_counter.inc("stream", "empty")
+                yield {"event": "sources", "data": {"sources": []}}
+                yield {"event": "token", "data": {"text": empty_message}}
+                yield {"event": "done", "data": {
+                    "processing_time": time.time() - start_time,
+                    "time_to_first_token": None,
+                    "model_used": model_type,
+                    "query": query,
+                    "cached": False
+                }}
+                return
+            
+            # Retrieve on the LLM pool, like the non-streaming chain does
+            with stage_timer("retrieve"):
+                source_docs = await executors.run(LLM, retriever.invoke, query)
+            with stage_timer("format_sources"):
+                sources = await self._format_sources(source_docs, user_id)
+            yield {"event": "sources", "data": {"sources": sources}}
+            
+            answer_parts = []
+            time_to_first_token = None
+            llm_started = time.perf_counter()
+            async for text in self.llm.stream_answer(query, source_docs, model_type):
+                if time_to_first_token is None:
+                    time_to_first_token = time.time() - start_time
+                    rag_stage_histogram.labels("llm_first_token").observe(time.perf_counter() - llm_started)
+                answer_parts.append(text)
+                llm_chunks_counter.inc(model_type)
+                yield {"event": "token", "data": {"text": text}}
+            rag_stage_histogram.labels("llm_stream").observe(time.perf_counter() - llm_started)
+            
+            answer = "".join(answer_parts) or 'Không tìm thấy thông tin phù hợp.'
+            with stage_timer("log_conversation"):
+                await self._log_conversation(user_id, query, answer, sources, model_type)
+            if cache_key:
+                answer_cache.put(cache_key, answer, sources)
+            llm_answer_chars_counter.inc(model_type, amount=len(answer))
+            rag_requests_counter.inc("stream", "answered")
+            
+            yield {"event": "done", "data": {
+                "processing_time": time.time() - start_time,
+                "time_to_first_token": time_to_first_token,
+                "model_used": model_type,
+                "query": query,
+                "cached": False,
+                "retrieval_timings": dict(getattr(retriever, "timings", {}))
+            }}
+            
+        except Exception as e:
+            rag_requests_counter.inc("stream", "error")
+            yield {"event": "error", "data": {
+                "message": f"Có lỗi xảy ra khi xử lý câu hỏi: {str(e)}"
+            }}
+    
     async def _format_sources(
         self, 
         source_docs: List[Any], 
@@ -135,16 +372,16 @@ class RAGEngine:
                 sources_by_file[file_id] = []
             sources_by_file[file_id].append(doc)
         
-        # Get file metadata for each source file
-        files_collection = get_collection("files")
+        # Get file metadata for all source files in one lookup
+        try:
+            file_infos = await file_metadata_cache.get_documents(user_id, list(sources_by_file))
+        except Exception as e:
+            print(f"Warning: Could not get source file metadata: {e}")
+            file_infos = {}
         
         for file_id, docs in sources_by_file.items():
             try:
-                # Get file info from database
-                file_info = await files_collection.find_one({
-                    "id": file_id,
-                    "userId": ObjectId(user_id)
-                })
+                file_info = file_infos.get(file_id)
                 
                 file_name = file_info["originalName"] if file_info else "Unknown File"
                 
@@ -240,16 +477,23 @@ class RAGEngine:
         self,
         file_path: str,
         user_id: str,
-        file_id: str
+        file_id: str,
+        content_hash: Optional[str] = None
     ) -> bool:
-        """Process a file for chat (wrapper around document processor)"""
+        """
+        Process a file for chat inline (wrapper around document processor)
+        API endpoints go through ingestion_queue instead
+        """
         try:
             vector_store = await self.doc_processor.process_document(
-                file_path, user_id, file_id
+                file_path, user_id, file_id, content_hash=content_hash
             )
-            return vector_store is not None
+            indexed = vector_store is not None
         except Exception as e:
-            return False
+            indexed = False
+        
+        await self.doc_processor._update_file_index_status(file_id, user_id, indexed)
+        return indexed
 
 # Global RAG engine instance  
 rag_engine = RAGEngine()
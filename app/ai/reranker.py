@@ -0,0 +1,148 @@
+"""
+Cross-encoder reranking for retrieved chunks
+The vector search over-fetches candidates; a small CPU cross-encoder then
+scores each (query, chunk) pair and only the best chunks reach the prompt
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import settings
+from app.core.metrics import Histogram
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Rerank documents with a sentence-transformers CrossEncoder
+
+    Pairs are scored in batches and the deadline is checked before each
+    batch. If it passes before every candidate is scored, or the model
+    isn't loaded, the candidates are returned in their original vector
+    order, so a slow rerank never costs more than the budget.
+
+    The model is loaded by warm_up() at startup. Requests that arrive while
+    it is loading fall back rather than wait, and a failed load is retried
+    after ``load_retry_seconds``.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANK_MODEL,
+        batch_size: int = 16,
+        max_length: int = 512,
+        load_retry_seconds: float = 60.0
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.load_retry_seconds = load_retry_seconds
+        self._model = None
+        self._load_failed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+        # Incremented from pool threads
+        self._fallbacks_lock = threading.Lock()
+        self.fallbacks = 0
+        self.rerank_histogram = Histogram(
+            "rerank_seconds",
+            "Time spent scoring candidates with the cross-encoder",
+            buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+        )
+
+    def _load_due(self) -> bool:
+        return (
+            self._load_failed_at is None
+            or time.monotonic() - self._load_failed_at >= self.load_retry_seconds
+        )
+
+    def _get_model(self, wait: bool = False):
+        """The loaded model, loading it if due; None if unavailable (or loading, unless wait)"""
+        if self._model is not None or not self._load_due():
+            return self._model
+        if not self._lock.acquire(blocking=wait):
+            return None
+        try:
+            if self._model is None and self._load_due():
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(
+                        self.model_name,
+                        max_length=self.max_length,
+                        device="cpu"
+                    )
+                    self._load_failed_at = None
+                except Exception as e:
+                    # Back off rather than retry the load on every request
+                    self._load_failed_at = time.monotonic()
+                    print(f"Warning: Could not load reranker model {self.model_name}: {e}")
+        finally:
+            self._lock.release()
+        return self._model
+
+    def warm_up(self) -> bool:
+        """Load the model ahead of the first request (blocking), returns whether it loaded"""
+        return self._get_model(wait=True) is not None
+
+    def _record_fallback(self):
+        with self._fallbacks_lock:
+            self.fallbacks += 1
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[Any],
+        top_k: int,
+        deadline: Optional[float] = None
+    ) -> List[Any]:
+        """
+        Return the top_k documents by cross-encoder score
+        ``deadline`` is a time.monotonic() timestamp
+        """
+        if len(documents) <= 1:
+            return documents[:top_k]
+
+        model = self._get_model()
+        if model is None:
+            self._record_fallback()
+            return documents[:top_k]
+
+        started = time.monotonic()
+        pairs = [(query, doc.page_content) for doc in documents]
+        scores: List[float] = []
+
+        for start in range(0, len(pairs), self.batch_size):
+            if deadline is not None and time.monotonic() >= deadline:
+                self._record_fallback()
+                return documents[:top_k]
+            batch = pairs[start:start + self.batch_size]
+            scores.extend(float(score) for score in model.predict(batch, batch_size=len(batch)))
+
+        self.rerank_histogram.observe(time.monotonic() - started)
+
+        # Stable sort keeps vector order between equal scores
+        ranked = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [documents[i] for i in ranked[:top_k]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get rerank latency histogram and fallback count"""
+        return {
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "fallbacks": self.fallbacks,
+            "rerank_seconds": self.rerank_histogram.snapshot()
+        }
+
+
+# Global reranker instance, None when reranking is disabled
+reranker = (
+    CrossEncoderReranker(
+        model_name=getattr(settings, "RERANK_MODEL", DEFAULT_RERANK_MODEL),
+        batch_size=getattr(settings, "RERANK_BATCH_SIZE", 16),
+        load_retry_seconds=getattr(settings, "RERANK_LOAD_RETRY_SECONDS", 60)
+    )
+    if getattr(settings, "RERANK_ENABLED", True)
+    else None
+)
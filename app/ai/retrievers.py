@@ -0,0 +1,210 @@
+"""
+Custom retrievers for the RAG pipeline
+Plug into LLMClient.create_qa_chain in place of vector_store.as_retriever()
+"""
+
+import time
+import heapq
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from langchain_core.retrievers import BaseRetriever
+    from langchain_core.callbacks import CallbackManagerForRetrieverRun
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import BaseRetriever, Document
+    from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+
+try:
+    from langchain_community.vectorstores.utils import DistanceStrategy
+except ImportError:
+    from langchain.vectorstores.utils import DistanceStrategy
+
+# FAISS releases the GIL during search, so threads give real parallelism
+from app.core.executors import executors, SEARCH
+from app.core.metrics import Histogram
+
+RETRIEVAL_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+
+dense_search_histogram = Histogram(
+    "retrieval_dense_seconds",
+    "Time spent in the dense (FAISS) leg of hybrid retrieval",
+    buckets=RETRIEVAL_BUCKETS
+)
+lexical_search_histogram = Histogram(
+    "retrieval_lexical_seconds",
+    "Time spent in the lexical (BM25) leg of hybrid retrieval",
+    buckets=RETRIEVAL_BUCKETS
+)
+
+
+class FederatedRetriever(BaseRetriever):
+    """
+    Top-k search across several per-file FAISS stores without merging them
+
+    The query is embedded once, every store is searched concurrently for its
+    own top-k, and the partial results are heap-merged by score. Because each
+    store returns its exact top-k, the merged top-k is identical to searching
+    a single merged index.
+
+    ``query_embedding`` lets the caller embed the query up front (e.g. through
+    the batching embedding service) instead of once per retriever call.
+    ``file_ids`` (parallel to ``stores``) is stamped onto each returned
+    document, since content-addressed stores are shared between files.
+
+    With a ``reranker``, ``fetch_k`` candidates are retrieved and reranked
+    down to ``k``; past ``rerank_budget_seconds`` (measured from the start
+    of retrieval) the vector order is kept instead.
+    """
+
+    stores: List[Any]
+    file_ids: Optional[List[Optional[str]]] = None
+    k: int = 10
+    query_embedding: Optional[List[float]] = None
+    fetch_k: Optional[int] = None
+    reranker: Optional[Any] = None
+    rerank_budget_seconds: Optional[float] = None
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self.reranker is None:
+            return [doc for doc, _ in self.search_with_scores(query)]
+
+        started = time.monotonic()
+        candidates = self.search_with_scores(query, k=max(self.fetch_k or self.k, self.k))
+        deadline = None
+        if self.rerank_budget_seconds is not None:
+            deadline = started + self.rerank_budget_seconds
+        return self.reranker.rerank(query, [doc for doc, _ in candidates], self.k, deadline)
+
+    def search_with_scores(self, query: str, k: Optional[int] = None) -> List[Tuple[Document, float]]:
+        """Run the federated search and return (document, score) pairs"""
+        if not self.stores:
+            return []
+
+        k = k or self.k
+
+        embedding = self.query_embedding
+        if embedding is None:
+            embedding = self.stores[0].embedding_function.embed_query(query)
+
+        file_ids = self.file_ids or [None] * len(self.stores)
+
+        def search_store(store, file_id) -> List[Tuple[Document, float]]:
+            results = store.similarity_search_with_score_by_vector(embedding, k=k)
+            if file_id is None:
+                return results
+            # Copy so the cached store's documents are never mutated
+            return [
+                (Document(page_content=doc.page_content, metadata={**doc.metadata, "file_id": file_id}), score)
+                for doc, score in results
+            ]
+
+        if len(self.stores) == 1:
+            partial_results = [search_store(self.stores[0], file_ids[0])]
+        else:
+            partial_results = list(executors.get(SEARCH).map(search_store, self.stores, file_ids))
+
+        candidates = [pair for results in partial_results for pair in results]
+
+        # Distance strategies: smaller is better for L2, larger for inner product
+        if self.stores[0].distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+            return heapq.nlargest(k, candidates, key=lambda pair: pair[1])
+        return heapq.nsmallest(k, candidates, key=lambda pair: pair[1])
+
+
+def _fusion_key(doc: Document) -> Hashable:
+    """Identity of a chunk across retrieval legs"""
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id is None:
+        return (doc.metadata.get("file_id"), doc.page_content)
+    return (doc.metadata.get("file_id"), chunk_id)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], rrf_k: int = 60) -> List[Document]:
+    """
+    Fuse ranked lists by reciprocal rank: score = sum of 1 / (rrf_k + rank)
+    Only ranks are used, so BM25 and vector distances need no calibration
+    """
+    scores: Dict[Hashable, float] = {}
+    documents: Dict[Hashable, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _fusion_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    # Stable sort keeps first-seen (dense) order between equal scores
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense + lexical retrieval fused with reciprocal rank fusion
+
+    The dense leg (a FederatedRetriever, without its own reranker) and the
+    lexical leg (the user's BM25 index, see search_index) each fetch
+    ``fetch_k`` candidates in parallel; the lexical leg finds exact
+    identifiers such as article numbers or product codes that embeddings
+    blur. The fused list is reranked down to ``k`` when a ``reranker`` is
+    set, as in FederatedRetriever, and truncated otherwise.
+
+    ``open_file_chunks(file_id)`` returns the chunk reader of a file's store
+    (DocumentProcessor.get_file_chunks). Each call's per-leg latencies (in
+    seconds) are left in ``timings``.
+    """
+
+    dense: FederatedRetriever
+    lexical_index: Any
+    open_file_chunks: Callable[[str], Any]
+    file_ids: Optional[List[str]] = None
+    k: int = 10
+    fetch_k: Optional[int] = None
+    rrf_k: int = 60
+    reranker: Optional[Any] = None
+    rerank_budget_seconds: Optional[float] = None
+    timings: Dict[str, float] = {}
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        started = time.monotonic()
+        fetch_k = max(self.fetch_k or self.k, self.k)
+
+        lexical_future = executors.get(SEARCH).submit(self._lexical_search, query, fetch_k)
+        dense_started = time.monotonic()
+        dense_results = [doc for doc, _ in self.dense.search_with_scores(query, k=fetch_k)]
+        self.timings["dense"] = time.monotonic() - dense_started
+        lexical_results = lexical_future.result()
+        dense_search_histogram.observe(self.timings["dense"])
+
+        fused = reciprocal_rank_fusion([dense_results, lexical_results], self.rrf_k)[:fetch_k]
+        if self.reranker is None:
+            return fused[:self.k]
+
+        deadline = None
+        if self.rerank_budget_seconds is not None:
+            deadline = started + self.rerank_budget_seconds
+        return self.reranker.rerank(query, fused, self.k, deadline)
+
+    def _lexical_search(self, query: str, k: int) -> List[Document]:
+        started = time.monotonic()
+        results = []
+        for file_id, position, _ in self.lexical_index.search_chunks(query, k, self.file_ids):
+            chunks = self.open_file_chunks(file_id)
+            doc = chunks.get(position) if chunks is not None else None
+            if doc is not None:
+                results.append(Document(
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, "file_id": file_id}
+                ))
+
+        self.timings["lexical"] = time.monotonic() - started
+        lexical_search_histogram.observe(self.timings["lexical"])
+        return results
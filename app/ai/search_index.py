@@ -0,0 +1,737 @@
+"""
+Full-text search over a user's documents
+In-process BM25 inverted index over chunk text and file names, maintained
+incrementally as documents are processed and persisted per user. The
+same vocabulary serves typeahead suggestions.
+"""
+
+import os
+import re
+import json
+import math
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from langchain_community.vectorstores import FAISS
+except ImportError:
+    from langchain.vectorstores import FAISS
+
+from app.config.settings import settings
+from app.core.cache import LRUCache
+from app.core.executors import executors, EMBED, SEARCH, INDEX_IO
+from app.core.file_lock import file_locks
+from app.services.file_cache import file_metadata_cache
+
+FORMAT_VERSION = 1
+SEARCH_INDEX_FILE = "search_index.npz"
+SEARCH_INDEX_LOCK_FILE = "search_index.lock"
+
+NO_PAGE = -1
+FILE_NAME_POSITION = -1  # Position of the document holding a file's name
+
+MAX_TOKEN_LENGTH = 40
+SNIPPET_LENGTH = 300
+SNIPPET_CONTEXT = 80  # Characters kept before the first match
+MAX_FILE_SUGGESTIONS = 3
+MAX_SUGGESTIONS = 50
+CACHED_PREFIX_MIN_TERMS = 1024  # Prefixes matching more terms keep their ranking cached
+
+_TOKEN_RE = re.compile(r"\w+")
+_MARK_RE = re.compile(r"[\u0300-\u036f]")  # Combining diacritical marks
+
+
+@lru_cache(maxsize=100_000)
+def fold_token(token: str) -> str:
+    """
+    Case- and diacritic-insensitive form of a token
+    Vietnamese text is searched with or without accents ("tiếng" and
+    "tieng" match), so tones and vowel marks are stripped and đ becomes d
+    """
+    token = token.casefold()
+    if token.isascii():
+        return token
+    return _MARK_RE.sub("", unicodedata.normalize("NFD", token.replace("đ", "d")))
+
+
+def surface_tokens(text: str) -> List[str]:
+    """Lower-cased words of text, accents kept"""
+    text = text.casefold()
+    if not text.isascii():
+        # Decomposed accents would otherwise split words
+        text = unicodedata.normalize("NFC", text)
+    return [token for token in _TOKEN_RE.findall(text) if len(token) <= MAX_TOKEN_LENGTH]
+
+
+def tokenize(text: str) -> List[str]:
+    """Folded tokens of text, for indexing and querying"""
+    return [fold_token(token) for token in surface_tokens(text)]
+
+
+def iter_tokens(text: str) -> Iterator[Tuple[str, int, int]]:
+    """(folded token, start, end) for each word of text, with offsets into the original"""
+    for match in _TOKEN_RE.finditer(text):
+        token = fold_token(match.group())
+        if len(token) <= MAX_TOKEN_LENGTH:
+            yield token, match.start(), match.end()
+
+
+class SearchIndex:
+    """
+    BM25 inverted index of one user's chunks and file names
+
+    Each chunk is a document, and each file's name is one more document.
+    Postings are per-term arrays of (document id, term frequency), appended
+    to as files are added. Removed files are tombstoned and dropped when
+    the index is compacted (on save, and in memory once a quarter of the
+    documents are dead). Queries score the postings of each query term
+    with numpy. Every method takes the index lock, which also keeps arrays
+    from being resized while a query holds numpy views of them.
+
+    For suggestions, terms are also kept in sorted order with a weight (the
+    number of live documents containing them) and a display form (the most
+    common accented spelling in the file that introduced the term).
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.postings: List[Tuple[array, array]] = []  # (document ids, term frequencies)
+        self.term_weights = array("I")
+        self.display: List[str] = []
+        self._sorted_terms: List[str] = []
+        self._sorted_ids = array("i")
+        self._top_terms: Dict[str, np.ndarray] = {}  # Ranked term ids of broad prefixes
+
+        self.doc_lengths = array("I")
+        self.doc_files = array("i")      # File number
+        self.doc_positions = array("i")  # Chunk position in the file's store
+        self.doc_pages = array("i")
+        self.doc_live = array("b")
+        self.live_count = 0
+        self.total_length = 0
+
+        self.file_ids: List[Optional[str]] = []  # File number -> file id, None once removed
+        self.file_names: List[str] = []
+        self.file_numbers: Dict[str, int] = {}
+        self._file_name_keys: List[str] = []  # " word word ..." of each file name
+
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    def has_file(self, file_id: str) -> bool:
+        return file_id in self.file_numbers
+
+    def add_file(self, file_id: str, file_name: str, chunks: List[Any]):
+        """Index a file's name and chunks (in store order), replacing any previous version"""
+        with self._lock:
+            self._remove_file(file_id)
+            self._top_terms.clear()
+
+            file_number = len(self.file_ids)
+            self.file_ids.append(file_id)
+            self.file_names.append(file_name)
+            self.file_numbers[file_id] = file_number
+            self._file_name_keys.append(" " + " ".join(tokenize(file_name)))
+
+            first_new_term = len(self.terms)
+            surfaces: Counter = Counter()
+            self._add_document(file_number, FILE_NAME_POSITION, NO_PAGE, file_name, surfaces)
+            for position, chunk in enumerate(chunks):
+                page = chunk.metadata.get("page")
+                self._add_document(
+                    file_number,
+                    position,
+                    page if isinstance(page, int) else NO_PAGE,
+                    chunk.page_content,
+                    surfaces
+                )
+            self._add_new_terms(first_new_term, surfaces)
+
+    def remove_file(self, file_id: str):
+        with self._lock:
+            self._remove_file(file_id)
+            self._top_terms.clear()
+            if self._dead_count() * 4 > len(self.doc_live):
+                self._load_arrays(self._compacted_arrays())
+
+    def _add_document(
+        self,
+        file_number: int,
+        position: int,
+        page: int,
+        text: str,
+        surfaces: Counter
+    ):
+        doc_id = len(self.doc_lengths)
+        surface_counts = Counter(surface_tokens(text))
+        surfaces.update(surface_counts)
+
+        term_counts: Dict[str, int] = {}
+        for surface, count in surface_counts.items():
+            term = fold_token(surface)
+            term_counts[term] = term_counts.get(term, 0) + count
+        length = sum(term_counts.values())
+
+        for term, count in term_counts.items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = len(self.terms)
+                self.vocab[term] = term_id
+                self.terms.append(term)
+                self.postings.append((array("i"), array("I")))
+                self.term_weights.append(0)
+                self.display.append(term)
+            doc_ids, frequencies = self.postings[term_id]
+            doc_ids.append(doc_id)
+            frequencies.append(count)
+            self.term_weights[term_id] += 1
+
+        self.doc_lengths.append(length)
+        self.doc_files.append(file_number)
+        self.doc_positions.append(position)
+        self.doc_pages.append(page)
+        self.doc_live.append(1)
+        self.live_count += 1
+        self.total_length += length
+
+    def _add_new_terms(self, first_new_term: int, surfaces: Counter):
+        """Pick display forms for terms added since first_new_term and insert them in sorted order"""
+        new_term_ids = range(first_new_term, len(self.terms))
+        if not new_term_ids:
+            return
+
+        best: Dict[int, Tuple[int, str]] = {}
+        for surface, count in surfaces.items():
+            term_id = self.vocab[fold_token(surface)]
+            if term_id >= first_new_term and count > best.get(term_id, (0, ""))[0]:
+                best[term_id] = (count, surface)
+        for term_id, (_, surface) in best.items():
+            self.display[term_id] = surface
+
+        if len(new_term_ids) * 64 > len(self._sorted_terms):
+            self._sort_terms()
+            return
+        for term_id in new_term_ids:
+            i = bisect_left(self._sorted_terms, self.terms[term_id])
+            self._sorted_terms.insert(i, self.terms[term_id])
+            self._sorted_ids.insert(i, term_id)
+
+    def _sort_terms(self):
+        order = sorted(range(len(self.terms)), key=self.terms.__getitem__)
+        self._sorted_terms = [self.terms[term_id] for term_id in order]
+        self._sorted_ids = array("i", order)
+
+    def _remove_file(self, file_id: str):
+        file_number = self.file_numbers.pop(file_id, None)
+        if file_number is None:
+            return
+
+        self.file_ids[file_number] = None
+        doc_files = np.frombuffer(self.doc_files, dtype=np.int32)
+        removed = np.flatnonzero(doc_files == file_number)
+
+        for doc_id in removed.tolist():
+            self.doc_live[doc_id] = 0
+            self.total_length -= self.doc_lengths[doc_id]
+        self.live_count -= len(removed)
+
+        # Removed documents no longer count towards their terms' weights
+        if len(removed) and self.postings:
+            removed_mask = np.zeros(len(self.doc_live), dtype=bool)
+            removed_mask[removed] = True
+            term_ids, doc_ids, _ = self._flat_postings()
+            counts = np.bincount(term_ids[removed_mask[doc_ids]], minlength=len(self.terms))
+            weights = np.frombuffer(self.term_weights, dtype=np.uint32)
+            weights -= counts.astype(np.uint32)
+
+    def _dead_count(self) -> int:
+        return len(self.doc_live) - self.live_count
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Best-scoring pages for a query, and the total number of matching pages
+        A page's score is that of its best chunk; a file name match is a
+        hit of its own, without a page
+        """
+        query_terms = set(tokenize(query))
+        with self._lock:
+            if not query_terms or self.live_count == 0:
+                return [], 0
+
+            scores = self._score(query_terms)
+            candidates = np.flatnonzero(scores)
+            if len(candidates) == 0:
+                return [], 0
+
+            # Best chunk first, then keep the first (best) chunk of each page
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+            positions = np.frombuffer(self.doc_positions, dtype=np.int32)[order]
+            pages = np.frombuffer(self.doc_pages, dtype=np.int32)[order]
+            page_keys = (
+                np.frombuffer(self.doc_files, dtype=np.int32)[order].astype(np.int64) << 32
+                | np.where(positions == FILE_NAME_POSITION, 0, pages.astype(np.int64) + 2)
+            )
+            _, first = np.unique(page_keys, return_index=True)
+            first.sort()
+
+            hits = []
+            for doc_id in order[first[offset:offset + limit]].tolist():
+                file_number = self.doc_files[doc_id]
+                page = self.doc_pages[doc_id]
+                hits.append({
+                    "file_id": self.file_ids[file_number],
+                    "file_name": self.file_names[file_number],
+                    "position": self.doc_positions[doc_id],
+                    "page": page if page != NO_PAGE else None,
+                    "score": float(scores[doc_id])
+                })
+            return hits, len(first)
+
+    def search_chunks(
+        self,
+        query: str,
+        k: int,
+        file_ids: Optional[List[str]] = None
+    ) -> List[Tuple[str, int, float]]:
+        """
+        Top-k chunks for a query as (file_id, position, score)
+        File names are not matched; ``file_ids`` restricts the files searched
+        """
+        query_terms = set(tokenize(query))
+        with self._lock:
+            if not query_terms or self.live_count == 0:
+                return []
+
+            scores = self._score(query_terms)
+            scores[np.frombuffer(self.doc_positions, dtype=np.int32) == FILE_NAME_POSITION] = 0
+            if file_ids is not None:
+                file_numbers = [self.file_numbers[file_id] for file_id in file_ids if file_id in self.file_numbers]
+                scores[~np.isin(np.frombuffer(self.doc_files, dtype=np.int32), file_numbers)] = 0
+
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+            return [
+                (self.file_ids[self.doc_files[doc_id]], self.doc_positions[doc_id], float(scores[doc_id]))
+                for doc_id in candidates.tolist()
+            ]
+
+    def _score(self, query_terms: set) -> np.ndarray:
+        """BM25 score of every document (0 for no match), lock held"""
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        doc_live = np.frombuffer(self.doc_live, dtype=np.int8) if self._dead_count() else None
+        average_length = max(self.total_length / self.live_count, 1.0)
+        scores = np.zeros(len(doc_lengths), dtype=np.float32)
+
+        for term in query_terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            doc_ids = np.frombuffer(self.postings[term_id][0], dtype=np.int32)
+            frequencies = np.frombuffer(self.postings[term_id][1], dtype=np.uint32)
+            if doc_live is not None:
+                live = doc_live[doc_ids].astype(bool)
+                doc_ids, frequencies = doc_ids[live], frequencies[live]
+            doc_count = len(doc_ids)
+            if doc_count == 0:
+                continue
+
+            idf = math.log(1 + (self.live_count - doc_count + 0.5) / (doc_count + 0.5))
+            frequencies = frequencies.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[doc_ids] / average_length)
+            scores[doc_ids] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        return scores
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Typeahead completions of the last (partial) word of query
+        Files with a name word starting with it come first, then terms by
+        weight; term completions keep the rest of the query as typed
+        """
+        query = unicodedata.normalize("NFC", query)
+        words = list(_TOKEN_RE.finditer(query))
+        if not words or words[-1].end() != len(query) or limit <= 0:
+            return []
+        prefix = fold_token(words[-1].group())
+        head = query[:words[-1].start()]
+
+        with self._lock:
+            suggestions = []
+            name_key = " " + prefix
+            for file_number, file_name_key in enumerate(self._file_name_keys):
+                if len(suggestions) >= min(limit, MAX_FILE_SUGGESTIONS):
+                    break
+                if self.file_ids[file_number] is not None and name_key in file_name_key:
+                    suggestions.append({
+                        "text": self.file_names[file_number],
+                        "type": "file",
+                        "fileId": self.file_ids[file_number]
+                    })
+
+            term_weights = np.frombuffer(self.term_weights, dtype=np.uint32)
+            for term_id in self._rank_terms(prefix)[:limit - len(suggestions)].tolist():
+                suggestions.append({
+                    "text": head + self.display[term_id],
+                    "type": "term",
+                    "weight": int(term_weights[term_id])
+                })
+            return suggestions
+
+    def _rank_terms(self, prefix: str) -> np.ndarray:
+        """Ids of the (up to MAX_SUGGESTIONS) heaviest live terms starting with prefix"""
+        top_terms = self._top_terms.get(prefix)
+        if top_terms is not None:
+            return top_terms
+
+        start = bisect_left(self._sorted_terms, prefix)
+        end = bisect_left(self._sorted_terms, prefix + "\U0010ffff")
+        term_ids = np.frombuffer(self._sorted_ids, dtype=np.int32)[start:end]
+        weights = np.frombuffer(self.term_weights, dtype=np.uint32)[term_ids].astype(np.int64)
+
+        if len(term_ids) > MAX_SUGGESTIONS:
+            top = np.argpartition(-weights, MAX_SUGGESTIONS - 1)[:MAX_SUGGESTIONS]
+        else:
+            top = np.arange(len(term_ids))
+        top = top[np.argsort(-weights[top], kind="stable")]
+        top_terms = term_ids[top[weights[top] > 0]].copy()
+
+        # Short prefixes match much of the vocabulary and are typed constantly
+        if len(term_ids) >= CACHED_PREFIX_MIN_TERMS:
+            self._top_terms[prefix] = top_terms
+        return top_terms
+
+    def _flat_postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(term id, document id, term frequency) of every posting, in term order"""
+        lengths = np.fromiter((len(doc_ids) for doc_ids, _ in self.postings), dtype=np.int64)
+        doc_ids = np.concatenate([np.frombuffer(doc_ids, dtype=np.int32) for doc_ids, _ in self.postings])
+        frequencies = np.concatenate([np.frombuffer(tfs, dtype=np.uint32) for _, tfs in self.postings])
+        return np.repeat(np.arange(len(self.postings)), lengths), doc_ids, frequencies
+
+    def _compacted_arrays(self) -> Dict[str, Any]:
+        """Flat arrays of the live documents and their postings, renumbered"""
+        doc_live = np.frombuffer(self.doc_live, dtype=np.int8).astype(bool)
+        doc_remap = np.cumsum(doc_live, dtype=np.int64) - 1
+
+        file_remap = np.full(len(self.file_ids), -1, dtype=np.int32)
+        live_files = [number for number, file_id in enumerate(self.file_ids) if file_id is not None]
+        file_remap[live_files] = np.arange(len(live_files), dtype=np.int32)
+
+        if self.postings:
+            term_ids, doc_ids, frequencies = self._flat_postings()
+            keep = doc_live[doc_ids]
+            doc_ids = doc_remap[doc_ids[keep]].astype(np.int32)
+            frequencies = frequencies[keep]
+            counts = np.bincount(term_ids[keep], minlength=len(self.terms))
+        else:
+            doc_ids = np.zeros(0, dtype=np.int32)
+            frequencies = np.zeros(0, dtype=np.uint32)
+            counts = np.zeros(0, dtype=np.int64)
+
+        used = counts > 0
+        return {
+            "terms": [term for term, is_used in zip(self.terms, used.tolist()) if is_used],
+            "display": [display for display, is_used in zip(self.display, used.tolist()) if is_used],
+            "term_offsets": np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64),
+            "posting_doc_ids": doc_ids,
+            "posting_frequencies": frequencies,
+            "doc_lengths": np.frombuffer(self.doc_lengths, dtype=np.uint32)[doc_live],
+            "doc_files": file_remap[np.frombuffer(self.doc_files, dtype=np.int32)[doc_live]],
+            "doc_positions": np.frombuffer(self.doc_positions, dtype=np.int32)[doc_live],
+            "doc_pages": np.frombuffer(self.doc_pages, dtype=np.int32)[doc_live],
+            "file_ids": [self.file_ids[number] for number in live_files],
+            "file_names": [self.file_names[number] for number in live_files]
+        }
+
+    def _load_arrays(self, arrays: Dict[str, Any]):
+        self.terms = list(arrays["terms"])
+        self.vocab = {term: term_id for term_id, term in enumerate(self.terms)}
+
+        offsets = arrays["term_offsets"].tolist()
+        doc_ids = arrays["posting_doc_ids"].astype(np.int32)
+        frequencies = arrays["posting_frequencies"].astype(np.uint32)
+        self.postings = []
+        for start, end in zip(offsets, offsets[1:]):
+            term_doc_ids, term_frequencies = array("i"), array("I")
+            term_doc_ids.frombytes(doc_ids[start:end].tobytes())
+            term_frequencies.frombytes(frequencies[start:end].tobytes())
+            self.postings.append((term_doc_ids, term_frequencies))
+        self.term_weights = array("I", np.diff(offsets).astype(np.uint32).tobytes())
+        self.display = [display or term for term, display in zip(self.terms, arrays["display"])]
+        self._sort_terms()
+
+        self.doc_lengths = array("I", arrays["doc_lengths"].astype(np.uint32).tobytes())
+        self.doc_files = array("i", arrays["doc_files"].astype(np.int32).tobytes())
+        self.doc_positions = array("i", arrays["doc_positions"].astype(np.int32).tobytes())
+        self.doc_pages = array("i", arrays["doc_pages"].astype(np.int32).tobytes())
+        self.doc_live = array("b", bytes([1]) * len(self.doc_lengths))
+        self.live_count = len(self.doc_lengths)
+        self.total_length = int(arrays["doc_lengths"].sum())
+
+        self.file_ids = list(arrays["file_ids"])
+        self.file_names = list(arrays["file_names"])
+        self.file_numbers = {file_id: number for number, file_id in enumerate(self.file_ids)}
+        self._file_name_keys = [" " + " ".join(tokenize(name)) for name in self.file_names]
+
+    def save(self, path: str):
+        """Write the compacted index to path (atomically)"""
+        with self._lock:
+            arrays = self._compacted_arrays()
+
+        terms = arrays.pop("terms")
+        header = {
+            "format": FORMAT_VERSION,
+            "terms": terms,
+            # Only spellings that differ from the folded term
+            "display": [
+                display if display != term else ""
+                for term, display in zip(terms, arrays.pop("display"))
+            ],
+            "file_ids": arrays.pop("file_ids"),
+            "file_names": arrays.pop("file_names")
+        }
+        arrays["posting_frequencies"] = np.minimum(arrays["posting_frequencies"], 65535).astype(np.uint16)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                header=np.frombuffer(json.dumps(header, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+                **arrays
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SearchIndex":
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+            if header.get("format") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported search index format: {header.get('format')}")
+            arrays = {name: data[name] for name in data.files if name != "header"}
+
+        index = cls()
+        index._load_arrays({
+            **arrays,
+            "terms": header["terms"],
+            "display": header.get("display") or [""] * len(header["terms"]),
+            "file_ids": header["file_ids"],
+            "file_names": header["file_names"]
+        })
+        return index
+
+
+def _store_chunks(vector_store: FAISS) -> List[Any]:
+    """A store's chunks in vector order (the order chunk stores are read by)"""
+    return [
+        vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+        for position in range(vector_store.index.ntotal)
+    ]
+
+
+def _make_snippet(text: str, query_terms: set) -> Dict[str, Any]:
+    """Window of text around the first match, with match offsets relative to it"""
+    spans = [(start, end) for token, start, end in iter_tokens(text) if token in query_terms]
+    snippet_start = max(0, spans[0][0] - SNIPPET_CONTEXT) if spans else 0
+    snippet_end = snippet_start + SNIPPET_LENGTH
+    return {
+        "snippet": text[snippet_start:snippet_end],
+        "snippetOffset": snippet_start,
+        "matches": [
+            {"start": start - snippet_start, "length": end - start}
+            for start, end in spans
+            if start >= snippet_start and end <= snippet_end
+        ]
+    }
+
+
+class SearchIndexManager:
+    """
+    Per-user search indexes, loaded on demand and kept in an LRU cache
+
+    Indexes are saved to ``user_<id>/search_index.npz`` after every
+    change. Cached indexes are keyed on the file's inode, so an index
+    rewritten by another worker process is reloaded. Writers in every
+    worker process serialize on ``search_index.lock`` and reload the saved
+    index once they hold it, so concurrent updates don't overwrite each
+    other. A user without a saved index (files processed before search
+    existed) gets one built from their processed files on first use.
+    """
+
+    def __init__(self, doc_processor):
+        self.doc_processor = doc_processor
+        self._indexes = LRUCache(max_entries=getattr(settings, "SEARCH_INDEX_CACHE_SIZE", 64))
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded index cache counters"""
+        return self._indexes.stats()
+
+    def _get_index_path(self, user_id: str) -> str:
+        return os.path.join(
+            self.doc_processor.vector_stores_dir,
+            f"user_{user_id}",
+            SEARCH_INDEX_FILE
+        )
+
+    def _writer_lock(self, user_id: str):
+        """Lock held (across worker processes) while reading, changing and saving the index"""
+        return file_locks.hold(os.path.join(os.path.dirname(self._get_index_path(user_id)), SEARCH_INDEX_LOCK_FILE))
+
+    async def _load_for_update(self, user_id: str) -> SearchIndex:
+        """Latest saved index (built if missing); call with the writer lock held"""
+        index = await self._load_saved(user_id)
+        if index is None:
+            index = await self._rebuild(user_id)
+        return index
+
+    async def load(self, user_id: str) -> SearchIndex:
+        index = await self._load_saved(user_id)
+        if index is not None:
+            return index
+
+        async with self._writer_lock(user_id):
+            return await self._load_for_update(user_id)
+
+    async def _load_saved(self, user_id: str) -> Optional[SearchIndex]:
+        path = self._get_index_path(user_id)
+        try:
+            file_stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        stamp = (file_stat.st_ino, file_stat.st_mtime_ns)
+        cached = self._indexes.get(user_id)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        try:
+            index = await executors.run(INDEX_IO, SearchIndex.load, path)
+        except Exception as e:
+            print(f"Warning: Could not load search index: {e}")
+            return None
+        self._indexes.put(user_id, (stamp, index))
+        return index
+
+    async def _save(self, user_id: str, index: SearchIndex):
+        path = self._get_index_path(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        await executors.run(INDEX_IO, index.save, path)
+
+        file_stat = os.stat(path)
+        self._indexes.put(user_id, ((file_stat.st_ino, file_stat.st_mtime_ns), index))
+
+    async def _rebuild(self, user_id: str) -> SearchIndex:
+        """Index every processed file of the user"""
+        index = SearchIndex()
+        for file_doc in await self.doc_processor.get_user_processed_files(user_id):
+            vector_store = await self.doc_processor.load_user_vector_store(user_id, file_doc["id"])
+            if vector_store is None:
+                continue
+            await executors.run(
+                EMBED,
+                lambda: index.add_file(file_doc["id"], file_doc["originalName"], _store_chunks(vector_store))
+            )
+        await self._save(user_id, index)
+        return index
+
+    async def update_file(self, user_id: str, file_id: str, vector_store: FAISS, default_name: str):
+        """Add (or replace) one file's chunks and name in the user's index"""
+        try:
+            file_name = await self._get_file_name(user_id, file_id) or default_name
+            async with self._writer_lock(user_id):
+                index = await self._load_for_update(user_id)
+                await executors.run(
+                    EMBED,
+                    lambda: index.add_file(file_id, file_name, _store_chunks(vector_store))
+                )
+                await self._save(user_id, index)
+        except Exception as e:
+            print(f"Warning: Could not update search index: {e}")
+            self.invalidate(user_id)
+
+    async def remove_file(self, user_id: str, file_id: str):
+        """Drop one file from the user's index"""
+        try:
+            if not os.path.exists(self._get_index_path(user_id)):
+                return
+            async with self._writer_lock(user_id):
+                index = await self._load_saved(user_id)
+                if index is None or not index.has_file(file_id):
+                    return
+                await executors.run(EMBED, index.remove_file, file_id)
+                await self._save(user_id, index)
+        except Exception as e:
+            print(f"Warning: Could not update search index: {e}")
+            self.invalidate(user_id)
+
+    def invalidate(self, user_id: str):
+        """Drop the saved index so it gets rebuilt on next use"""
+        self._indexes.pop(user_id)
+        path = self._get_index_path(user_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def _get_file_name(self, user_id: str, file_id: str) -> Optional[str]:
+        file_doc = await file_metadata_cache.get_document(user_id, file_id)
+        return file_doc.get("originalName") if file_doc else None
+
+    async def search(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Page-level hits with snippets and match offsets, and the total hit count"""
+        index = await self.load(user_id)
+        return await executors.run(SEARCH, self._search, index, user_id, query, limit, offset)
+
+    async def suggest(self, user_id: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Typeahead suggestions from the user's file names and vocabulary"""
+        index = await self.load(user_id)
+        return await executors.run(SEARCH, index.suggest, query, limit)
+
+    def _search(
+        self,
+        index: SearchIndex,
+        user_id: str,
+        query: str,
+        limit: int,
+        offset: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        results, total = index.search(query, limit, offset)
+        query_terms = set(tokenize(query))
+
+        hits = []
+        for result in results:
+            hit = {
+                "fileId": result["file_id"],
+                "fileName": result["file_name"],
+                "page": result["page"],
+                "score": round(result["score"], 4)
+            }
+            if result["position"] == FILE_NAME_POSITION:
+                hit.update({"field": "fileName", "chunkId": None})
+                hit.update(_make_snippet(result["file_name"], query_terms))
+            else:
+                chunks = self.doc_processor.get_file_chunks(user_id, result["file_id"])
+                chunk = chunks.get(result["position"]) if chunks is not None else None
+                if chunk is None:
+                    continue
+                hit.update({"field": "content", "chunkId": chunk.metadata.get("chunk_id")})
+                hit.update(_make_snippet(chunk.page_content, query_terms))
+            hits.append(hit)
+
+        return hits, total
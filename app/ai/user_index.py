@@ -0,0 +1,541 @@
+"""
+Per-user consolidated vector index
+Keeps one prebuilt FAISS index per user so queries over all of a user's
+documents don't have to merge per-file stores on every request
+"""
+
+import os
+import json
+import shutil
+from bisect import bisect_right
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+try:
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.utils import DistanceStrategy
+    from langchain_community.docstore.base import Docstore
+except ImportError:
+    from langchain.vectorstores import FAISS
+    from langchain.vectorstores.utils import DistanceStrategy
+    from langchain.docstore.base import Docstore
+
+from app.ai.index_factory import (
+    IVFPQ, index_config, create_index, get_index_type, supports_remove,
+    apply_search_params, read_index, writable_copy
+)
+from app.ai.chunk_store import INDEX_FILE, LEGACY_DOCSTORE_FILE
+from app.core.executors import executors, EMBED, INDEX_IO
+from app.core.file_lock import file_locks
+
+MERGED_DIR_NAME = "merged"
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+MANIFEST_FILE = "manifest.json"
+
+
+class MergedChunks(Docstore):
+    """
+    Docstore of the per-user index
+
+    A file's vectors occupy one contiguous id range (recorded in the
+    manifest), in the same order as in the file's own store. A vector id
+    is resolved to (file, position) by bisecting the ranges and the chunk
+    is read from that file's chunk store, so chunk text is never copied
+    into the merged index.
+
+    The manifest also records the generation (chunk store id prefix) of
+    each file's store. A store that was deleted, or rewritten by
+    reprocessing before a new version was published, no longer matches its
+    vectors, so its hits don't resolve.
+    """
+
+    def __init__(self, manifest: dict, open_file_chunks: Callable[[str], Any]):
+        self._ranges = sorted(
+            (start_id, count, file_id)
+            for file_id, (start_id, count) in manifest["files"].items()
+        )
+        self._starts = [start_id for start_id, _, _ in self._ranges]
+        # Versions published before generations were recorded have none
+        self._generations: Dict[str, str] = manifest.get("generations", {})
+        self._open_file_chunks = open_file_chunks
+        self.ids = MergedIds(self)
+
+    def locate(self, vector_id: int) -> Optional[Tuple[str, int]]:
+        """(file_id, position in the file's store) of a vector id"""
+        i = bisect_right(self._starts, vector_id) - 1
+        if i < 0:
+            return None
+        start_id, count, file_id = self._ranges[i]
+        position = vector_id - start_id
+        return (file_id, position) if position < count else None
+
+    def resolve(self, vector_id: int) -> Optional[Document]:
+        """Chunk of a vector id, None if its file's store is gone or has changed"""
+        location = self.locate(int(vector_id))
+        if location is None:
+            return None
+
+        file_id, position = location
+        chunks = self._open_file_chunks(file_id)
+        if chunks is None:
+            return None
+        generation = self._generations.get(file_id)
+        if generation is not None and getattr(chunks, "id_prefix", None) != generation:
+            return None
+        doc = chunks.get(position)
+        if doc is None:
+            return None
+        # Shared stores are user-neutral and two files may share one,
+        # so file_id is stamped per lookup
+        return Document(page_content=doc.page_content, metadata={**doc.metadata, "file_id": file_id})
+
+    def search(self, search: Union[str, int]) -> Union[str, Document]:
+        doc = self.resolve(int(search))
+        return doc if doc is not None else f"ID {search} not found."
+
+
+class MergedIds(Mapping):
+    """index_to_docstore_id view: merged vector ids are their own docstore ids"""
+
+    def __init__(self, docstore: MergedChunks):
+        self._docstore = docstore
+
+    def __getitem__(self, vector_id: int) -> int:
+        if self._docstore.locate(int(vector_id)) is None:
+            raise KeyError(vector_id)
+        return int(vector_id)
+
+    def __iter__(self) -> Iterator[int]:
+        for start_id, count, _ in self._docstore._ranges:
+            yield from range(start_id, start_id + count)
+
+    def __len__(self) -> int:
+        return sum(count for _, count, _ in self._docstore._ranges)
+
+
+class MergedStore(FAISS):
+    """
+    FAISS store over the per-user index
+    Hits that don't resolve to a chunk (see MergedChunks) are skipped, and
+    the index is searched deeper until k chunks are found or it runs out
+    """
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Union[Callable, Dict[str, Any]]] = None,
+        fetch_k: int = 20,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        vector = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vector)
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+        score_threshold = kwargs.get("score_threshold")
+        higher_is_better = self.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+
+        total = self.index.ntotal
+        if total == 0:
+            return []
+        fetch = min(total, k if filter is None else max(k, fetch_k))
+        while True:
+            scores, indices = self.index.search(vector, fetch)
+            docs = []
+            for score, vector_id in zip(scores[0], indices[0]):
+                if vector_id == -1:
+                    continue
+                doc = self.docstore.resolve(vector_id)
+                if doc is None or (filter_func is not None and not filter_func(doc.metadata)):
+                    continue
+                if score_threshold is not None and (
+                    score < score_threshold if higher_is_better else score > score_threshold
+                ):
+                    continue
+                docs.append((doc, score))
+            if len(docs) >= k or fetch >= total:
+                return docs[:k]
+            fetch = min(total, fetch * 2)
+
+
+class UserIndexManager:
+    """
+    Incrementally maintained per-user index
+
+    Vectors are stored under stable ids so a file's vectors can be removed
+    by id without rebuilding. The index type (flat, HNSW or IVF-PQ) follows
+    the corpus size, see index_factory; the index is rebuilt from the
+    per-file stores when the size crosses a threshold, and when a file is
+    removed from an HNSW index. Chunks are read from the per-file chunk
+    stores (see MergedChunks). Every update is written to a new
+    version directory and published by atomically replacing the CURRENT
+    pointer file, so readers (including other worker processes) never see a
+    half-written index. Writers for the same user, in any worker process,
+    are serialized with a lock file in the merged directory, and re-read
+    CURRENT once they hold it. A user without indexed vectors gets a
+    version with a manifest and no index file, so queries don't rebuild
+    (or take the lock) every time.
+    """
+
+    def __init__(self, doc_processor):
+        self.doc_processor = doc_processor
+
+    def _writer_lock(self, user_id: str):
+        return file_locks.hold(os.path.join(self._get_merged_dir(user_id), LOCK_FILE))
+
+    def _get_merged_dir(self, user_id: str) -> str:
+        return os.path.join(
+            self.doc_processor.vector_stores_dir,
+            f"user_{user_id}",
+            MERGED_DIR_NAME
+        )
+
+    def get_current_version(self, user_id: str) -> Optional[str]:
+        """Read the published version name, None if no index exists yet"""
+        current_path = os.path.join(self._get_merged_dir(user_id), CURRENT_FILE)
+        try:
+            with open(current_path, "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    async def load(self, user_id: str) -> Optional[FAISS]:
+        """
+        Load the user's consolidated index, building it on first use
+        Returns None when the user has no indexed vectors
+        """
+        version = self.get_current_version(user_id)
+        if version is None:
+            async with self._writer_lock(user_id):
+                version = self.get_current_version(user_id)
+                if version is None:
+                    await self._rebuild(user_id)
+                    version = self.get_current_version(user_id)
+            if version is None:
+                return None
+
+        store = await self._load_version(user_id, version)
+        if store is None or store.index.ntotal == 0:
+            return None
+        return store
+
+    async def update_file(self, user_id: str, file_id: str, vector_store: FAISS):
+        """Add (or replace) one file's vectors in the user's index"""
+        try:
+            async with self._writer_lock(user_id):
+                version = self.get_current_version(user_id)
+                if version is None:
+                    # Nothing published yet - build from all indexed files
+                    await self._rebuild(user_id, extra_files={file_id: vector_store})
+                    return
+
+                published = await self._load_version(user_id, version)
+                if published is None:
+                    # Published empty: build from all indexed files
+                    await self._rebuild(
+                        user_id,
+                        extra_files={file_id: vector_store},
+                        previous_version=version
+                    )
+                    return
+
+                manifest = self._read_manifest(user_id, version)
+                old_range = manifest["files"].get(file_id)
+                new_total = (
+                    published.index.ntotal
+                    - (old_range[1] if old_range else 0)
+                    + vector_store.index.ntotal
+                )
+
+                if self._needs_rebuild(published, new_total, removing=old_range is not None):
+                    await self._rebuild(
+                        user_id,
+                        extra_files={file_id: vector_store},
+                        previous_version=version
+                    )
+                    return
+
+                # Readers may be searching the published index, so never mutate it
+                index = writable_copy(published.index)
+                generation = self._get_generation(user_id, file_id)
+
+                def apply_update():
+                    self._remove_file(index, manifest, file_id)
+                    self._add_file(index, manifest, file_id, vector_store, generation)
+
+                await executors.run(EMBED, apply_update)
+                await self._publish(user_id, index, manifest, version)
+
+        except Exception as e:
+            print(f"Warning: Could not update user index: {e}")
+            self.invalidate(user_id)
+
+    async def remove_file(self, user_id: str, file_id: str):
+        """Remove one file's vectors from the user's index"""
+        try:
+            async with self._writer_lock(user_id):
+                version = self.get_current_version(user_id)
+                if version is None:
+                    return
+
+                published = await self._load_version(user_id, version)
+                if published is None:
+                    return
+
+                manifest = self._read_manifest(user_id, version)
+                if file_id not in manifest["files"]:
+                    return
+
+                new_total = published.index.ntotal - manifest["files"][file_id][1]
+                if self._needs_rebuild(published, new_total, removing=True):
+                    await self._rebuild(
+                        user_id,
+                        exclude=file_id,
+                        previous_version=version,
+                        dimension=published.index.d
+                    )
+                    return
+
+                index = writable_copy(published.index)
+                await executors.run(EMBED, self._remove_file, index, manifest, file_id)
+                await self._publish(user_id, index, manifest, version)
+
+        except Exception as e:
+            print(f"Warning: Could not update user index: {e}")
+            self.invalidate(user_id)
+
+    def _needs_rebuild(self, store: FAISS, new_total: int, removing: bool) -> bool:
+        """Whether an incremental update can't (or shouldn't) be applied in place"""
+        if not isinstance(store.docstore, MergedChunks):
+            # Published before chunk stores, with its own copy of every chunk
+            return True
+        if index_config.select_index_type(new_total) != get_index_type(store.index):
+            return True
+        return removing and not supports_remove(store.index)
+
+    def invalidate(self, user_id: str):
+        """Drop the published index so it gets rebuilt on next load"""
+        current_path = os.path.join(self._get_merged_dir(user_id), CURRENT_FILE)
+        if os.path.exists(current_path):
+            os.remove(current_path)
+
+    async def _rebuild(
+        self,
+        user_id: str,
+        extra_files: Optional[Dict[str, FAISS]] = None,
+        exclude: Optional[str] = None,
+        previous_version: Optional[str] = None,
+        dimension: Optional[int] = None
+    ):
+        """
+        Build the index from scratch from every indexed file of the user
+        ``extra_files`` are included even if not marked indexed yet (the
+        file being ingested); ``exclude`` is left out (the file being removed)
+        """
+        extra_files = extra_files or {}
+        processed_files = await self.doc_processor.get_user_processed_files(user_id)
+
+        file_stores: List[Tuple[str, FAISS]] = []
+        for file_doc in processed_files:
+            if file_doc["id"] == exclude or file_doc["id"] in extra_files:
+                continue
+            file_store = await self.doc_processor.load_user_vector_store(
+                user_id, file_doc["id"]
+            )
+            if file_store is None or file_store.index.ntotal == 0:
+                continue
+            file_stores.append((file_doc["id"], file_store))
+        file_stores.extend(extra_files.items())
+
+        if not file_stores and dimension is None:
+            # Nothing to index; publish that, so loads don't rebuild again
+            await self._publish(user_id, None, {"next_id": 0, "files": {}}, previous_version)
+            return
+
+        generations = {
+            file_id: self._get_generation(user_id, file_id) for file_id, _ in file_stores
+        }
+        index, manifest = await executors.run(
+            EMBED, self._build_index, file_stores, dimension, generations
+        )
+        await self._publish(user_id, index, manifest, previous_version)
+
+    def _build_index(
+        self,
+        file_stores: List[Tuple[str, FAISS]],
+        dimension: Optional[int] = None,
+        generations: Optional[Dict[str, Optional[str]]] = None
+    ) -> Tuple[faiss.Index, dict]:
+        """Create an index of the right type for the combined size and fill it"""
+        total = sum(file_store.index.ntotal for _, file_store in file_stores)
+        if file_stores:
+            dimension = file_stores[0][1].index.d
+        index_type = index_config.select_index_type(total)
+
+        training_vectors = None
+        if index_type == IVFPQ:
+            training_vectors = self._sample_vectors(file_stores, index_config.train_size)
+
+        index = create_index(index_type, dimension, index_config, training_vectors, total)
+        manifest = {"next_id": 0, "files": {}, "generations": {}}
+        for file_id, file_store in file_stores:
+            self._add_file(index, manifest, file_id, file_store, (generations or {}).get(file_id))
+        return index, manifest
+
+    def _sample_vectors(self, file_stores: List[Tuple[str, FAISS]], sample_size: int) -> np.ndarray:
+        """Uniform sample of the files' vectors, for training"""
+        total = sum(file_store.index.ntotal for _, file_store in file_stores)
+        rng = np.random.default_rng(0)
+        samples = []
+        for _, file_store in file_stores:
+            count = file_store.index.ntotal
+            if count == 0:
+                continue
+            vectors = file_store.index.reconstruct_n(0, count)
+            take = min(count, max(1, round(sample_size * count / total)))
+            samples.append(vectors[rng.choice(count, take, replace=False)])
+        return np.vstack(samples)
+
+    def _get_generation(self, user_id: str, file_id: str) -> Optional[str]:
+        """Generation of the file's store on disk (None for legacy pickled stores)"""
+        return getattr(self.doc_processor.get_file_chunks(user_id, file_id), "id_prefix", None)
+
+    def _add_file(
+        self,
+        index: faiss.Index,
+        manifest: dict,
+        file_id: str,
+        file_store: FAISS,
+        generation: Optional[str] = None
+    ):
+        count = file_store.index.ntotal
+        if count == 0:
+            return
+
+        # Reuse the stored vectors - no re-embedding. Ids follow the file
+        # store's positions, which is what lets MergedChunks find the chunk
+        vectors = file_store.index.reconstruct_n(0, count)
+        start_id = manifest["next_id"]
+        index.add_with_ids(vectors, np.arange(start_id, start_id + count, dtype="int64"))
+
+        manifest["next_id"] = start_id + count
+        manifest["files"][file_id] = [int(start_id), int(count)]
+        if generation is not None:
+            manifest.setdefault("generations", {})[file_id] = generation
+
+    def _remove_file(self, index: faiss.Index, manifest: dict, file_id: str):
+        id_range = manifest["files"].pop(file_id, None)
+        manifest.get("generations", {}).pop(file_id, None)
+        if id_range is None:
+            return
+
+        start_id, count = id_range
+        index.remove_ids(np.arange(start_id, start_id + count, dtype="int64"))
+
+    def _make_store(self, user_id: str, index: faiss.Index, manifest: dict) -> FAISS:
+        docstore = MergedChunks(
+            manifest,
+            lambda file_id: self.doc_processor.get_file_chunks(user_id, file_id)
+        )
+        apply_search_params(index, index_config)
+        return MergedStore(self.doc_processor._get_embeddings(), index, docstore, docstore.ids)
+
+    async def _load_version(self, user_id: str, version: str) -> Optional[FAISS]:
+        cache = self.doc_processor.store_cache
+        cache_key = (user_id, MERGED_DIR_NAME, version)
+
+        store = cache.get(cache_key)
+        if store is not None:
+            return store
+
+        version_dir = os.path.join(self._get_merged_dir(user_id), version)
+        if not os.path.exists(version_dir):
+            return None
+
+        if os.path.exists(os.path.join(version_dir, LEGACY_DOCSTORE_FILE)):
+            # Versions published before chunk stores carry their own docstore
+            store = await self.doc_processor._load_store_from_disk(version_dir)
+            apply_search_params(store.index, index_config)
+        elif not os.path.exists(os.path.join(version_dir, INDEX_FILE)):
+            # Published empty
+            return None
+        else:
+            index = await executors.run(
+                INDEX_IO,
+                read_index,
+                os.path.join(version_dir, INDEX_FILE),
+                self.doc_processor.load_mode
+            )
+            store = self._make_store(user_id, index, self._read_manifest(user_id, version))
+
+        cache.put(cache_key, store)
+        return store
+
+    def _read_manifest(self, user_id: str, version: str) -> dict:
+        manifest_path = os.path.join(self._get_merged_dir(user_id), version, MANIFEST_FILE)
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    async def _publish(
+        self,
+        user_id: str,
+        index: Optional[faiss.Index],
+        manifest: dict,
+        previous_version: Optional[str]
+    ):
+        """Write a new version (without an index file when index is None) and point CURRENT at it"""
+        merged_dir = self._get_merged_dir(user_id)
+        os.makedirs(merged_dir, exist_ok=True)
+
+        def write_version() -> str:
+            # Exclusive create, so a name is never shared even if the lock was bypassed
+            while True:
+                version = self._next_version_name(merged_dir)
+                version_dir = os.path.join(merged_dir, version)
+                try:
+                    os.mkdir(version_dir)
+                    break
+                except FileExistsError:
+                    continue
+
+            if index is not None:
+                faiss.write_index(index, os.path.join(version_dir, INDEX_FILE))
+            with open(os.path.join(version_dir, MANIFEST_FILE), "w") as f:
+                json.dump(manifest, f)
+
+            # Atomic swap of the pointer file
+            tmp_path = os.path.join(merged_dir, f"{CURRENT_FILE}.tmp")
+            with open(tmp_path, "w") as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(merged_dir, CURRENT_FILE))
+            return version
+
+        version = await executors.run(INDEX_IO, write_version)
+
+        cache = self.doc_processor.store_cache
+        if index is not None:
+            cache.put((user_id, MERGED_DIR_NAME, version), self._make_store(user_id, index, manifest))
+        if previous_version:
+            cache.pop((user_id, MERGED_DIR_NAME, previous_version))
+
+        self._cleanup_old_versions(merged_dir, keep={version, previous_version})
+
+    def _next_version_name(self, merged_dir: str) -> str:
+        numbers = [
+            int(name[1:]) for name in os.listdir(merged_dir)
+            if name.startswith("v") and name[1:].isdigit()
+        ]
+        return f"v{max(numbers, default=0) + 1:06d}"
+
+    def _cleanup_old_versions(self, merged_dir: str, keep: set):
+        """Remove superseded versions, keeping the previous one for in-flight readers"""
+        for name in os.listdir(merged_dir):
+            if name.startswith("v") and name[1:].isdigit() and name not in keep:
+                shutil.rmtree(os.path.join(merged_dir, name), ignore_errors=True)
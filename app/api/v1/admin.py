@@ -0,0 +1,40 @@
+"""
+Admin API endpoints
+Request profiles recorded by the profiling middleware
+"""
+
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import FileResponse
+from app.models.user import User
+from app.core.auth import require_role
+from app.core.profiler import profiler
+from app.core.executors import executors, INDEX_IO
+
+router = APIRouter()
+
+@router.get("/admin/profiles")
+async def list_profiles(current_user: User = Depends(require_role("admin"))):
+    """List saved request profiles, newest first"""
+    return {
+        "success": True,
+        "profiles": await executors.run(INDEX_IO, profiler.list_profiles)
+    }
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    current_user: User = Depends(require_role("admin"))
+):
+    """Download a profile as collapsed stacks (flamegraph.pl, speedscope)"""
+    path = profiler.get_profile_path(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile không tồn tại"
+        )
+    
+    return FileResponse(
+        path,
+        media_type="text/plain",
+        filename=f"profile-{profile_id}.folded"
+    )
@@ -12,7 +12,7 @@ from app.models.user import (
 )
 from app.core.security import security
 from app.config.settings import settings
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user, invalidate_cached_user
 from app.config.database import get_collection
 from app.services.email_service import email_service
 import secrets
@@ -54,7 +54,7 @@ async def register(user_data: UserCreateRequest):
             )
         
         # Hash password
-        hashed_password = security.get_password_hash(user_data.password)
+        hashed_password = await security.get_password_hash_async(user_data.password)
         
         # Create new user
         new_user = {
@@ -124,8 +124,9 @@ async def reset_password(data: dict):
         if reset_doc.get("expiresAt") and reset_doc["expiresAt"] < datetime.utcnow():
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token đã hết hạn")
 
-        hashed_new_password = security.get_password_hash(new_password)
+        hashed_new_password = await security.get_password_hash_async(new_password)
         await users_collection.update_one({"_id": reset_doc["userId"]}, {"$set": {"password": hashed_new_password, "updatedAt": datetime.utcnow()}})
+        invalidate_cached_user(reset_doc["userId"])
         await reset_collection.update_one({"_id": reset_doc["_id"]}, {"$set": {"used": True, "usedAt": datetime.utcnow()}})
 
         return StandardResponse(success=True, message="Đặt lại mật khẩu thành công")
@@ -161,7 +162,7 @@ async def login(login_data: UserLoginRequest):
             )
         
         # Verify password
-        if not security.verify_password(login_data.password, user["password"]):
+        if not await security.verify_password_async(login_data.password, user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email hoặc mật khẩu không đúng"
@@ -181,6 +182,7 @@ async def login(login_data: UserLoginRequest):
             {"_id": user["_id"]},
             {"$set": {"lastLogin": datetime.utcnow()}}
         )
+        invalidate_cached_user(user["_id"])
         
         # Prepare user response (without password)
         user_response = User(
@@ -236,7 +238,7 @@ async def dev_login():
         user = await users_collection.find_one({"email": email})
 
         if not user:
-            hashed_password = security.get_password_hash("dev-login-placeholder")
+            hashed_password = await security.get_password_hash_async("dev-login-placeholder")
             new_user = {
                 "email": email,
                 "password": hashed_password,
@@ -255,6 +257,7 @@ async def dev_login():
                 {"_id": user["_id"]},
                 {"$set": {"lastLogin": datetime.utcnow()}}
             )
+            invalidate_cached_user(user["_id"])
 
         # Create JWT token
         token = security.create_access_token(
@@ -281,6 +284,8 @@ async def dev_login():
             user=user_response,
             token=token
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Lỗi server khi dev-login")
 
@@ -323,6 +328,7 @@ async def update_profile(
                 }
             }
         )
+        invalidate_cached_user(current_user.id)
         
         if result.matched_count == 0:
             raise HTTPException(
@@ -370,14 +376,14 @@ async def change_password(
             )
         
         # Verify current password
-        if not security.verify_password(password_data.currentPassword, user["password"]):
+        if not await security.verify_password_async(password_data.currentPassword, user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Mật khẩu hiện tại không đúng"
             )
         
         # Hash new password
-        hashed_new_password = security.get_password_hash(password_data.newPassword)
+        hashed_new_password = await security.get_password_hash_async(password_data.newPassword)
         
         # Update password
         result = await users_collection.update_one(
@@ -389,6 +395,7 @@ async def change_password(
                 }
             }
         )
+        invalidate_cached_user(current_user.id)
         
         if result.matched_count == 0:
             raise HTTPException(
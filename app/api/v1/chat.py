@@ -3,7 +3,9 @@ Chat API endpoints
 Integrated RAG engine for AI chat with documents
 """
 
+import json
 from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from app.models.user import User
 from app.models.chat import (
@@ -40,7 +42,9 @@ async def chat_with_documents(
             sources=response.sources,
             processing_time=response.processing_time,
             model_used=response.model_used,
-            query=response.query
+            query=response.query,
+            cached=response.cached,
+            retrieval_timings=response.retrieval_timings
         )
         
     except Exception as e:
@@ -49,6 +53,39 @@ async def chat_with_documents(
             detail=f"Lỗi xử lý chat: {str(e)}"
         )
 
+@router.post("/chat/stream")
+async def stream_chat_with_documents(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Chat with documents, streaming the answer as Server-Sent Events
+    Events: ``sources`` (retrieved sources, sent first), ``token`` (answer
+    text as it is generated), then ``done`` with timings, or ``error``
+    """
+    events = rag_engine.stream_chat_with_documents(
+        query=request.query,
+        user_id=current_user.id,
+        file_ids=request.file_ids,
+        model_type=request.model,
+        top_k=request.top_k
+    )
+    
+    async def event_stream():
+        async for event in events:
+            data = json.dumps(event["data"], ensure_ascii=False)
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop reverse proxies (nginx) from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get("/chat/history", response_model=ChatHistoryResponse)
 async def get_chat_history(
     limit: int = Query(20, ge=1, le=100, description="Number of conversations"),
@@ -108,7 +145,8 @@ async def process_document_for_chat(
     try:
         # Get file metadata
         from app.services.file_service import file_service
-        file_metadata = await file_service.get_file_by_id(file_id, current_user.id)
+        from app.services.file_cache import file_metadata_cache
+        file_metadata = await file_metadata_cache.get_file(file_id, current_user.id)
         
         if not file_metadata:
             raise HTTPException(
@@ -116,22 +154,20 @@ async def process_document_for_chat(
                 detail="File không tồn tại"
             )
         
-        # Process document
+        # Queue document (deduplicated uploads reuse their shared store)
+        from app.services.blob_service import blob_service
+        from app.services.ingestion_service import ingestion_queue
+        content_hash = await blob_service.get_file_content_hash(file_id, current_user.id)
         file_path = file_service.get_file_path(file_metadata.filename)
-        success = await rag_engine.process_file_for_chat(
-            file_path, current_user.id, file_id
+        job_id = await ingestion_queue.enqueue(
+            file_path, current_user.id, file_id, content_hash=content_hash
         )
         
-        if success:
-            return {
-                "success": True,
-                "message": f"File '{file_metadata.originalName}' đã được xử lý thành công"
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Không thể xử lý file"
-            )
+        return {
+            "success": True,
+            "message": f"File '{file_metadata.originalName}' đã được đưa vào hàng đợi xử lý",
+            "jobId": job_id
+        }
         
     except HTTPException:
         raise
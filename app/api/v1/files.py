@@ -15,6 +15,9 @@ from app.models.file import (
 from app.models.user import StandardResponse, User
 from app.core.auth import get_current_user, get_current_user_optional
 from app.services.file_service import file_service
+from app.services.file_cache import file_metadata_cache
+from app.services.blob_service import blob_service, UploadTooLargeError
+from app.services.ingestion_service import ingestion_queue
 from app.config.settings import settings
 
 router = APIRouter()
@@ -36,60 +39,82 @@ async def upload_file(
                 detail="Chỉ cho phép upload file PDF, DOCX, DOC, TXT, MD"
             )
         
-        # Validate file size
-        if file.size > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File quá lớn. Giới hạn {settings.MAX_FILE_SIZE / (1024*1024):.0f}MB"
-            )
+        # Validate file size (fast path when the client declares it; the
+        # streaming writer below enforces the limit on the actual bytes)
+        file_too_large = HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File quá lớn. Giới hạn {settings.MAX_FILE_SIZE / (1024*1024):.0f}MB"
+        )
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+            raise file_too_large
         
         # Generate unique filename
         unique_filename = file_service.generate_unique_filename(file.filename)
         file_path = file_service.get_file_path(unique_filename)
         
-        # Save file to disk
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        # Stream file to disk, hashing as it is written
+        try:
+            file_size, content_hash = await blob_service.write_upload(
+                file, file_path, settings.MAX_FILE_SIZE
+            )
+        except UploadTooLargeError:
+            raise file_too_large
+        
+        # Move the content into the shared blob store;
+        # identical uploads end up pointing at one file
+        extension = os.path.splitext(file.filename)[1]
+        blob_filename = await blob_service.store_blob(
+            content_hash, file_path, extension, file_size
+        )
+        file_path = file_service.get_file_path(blob_filename)
         
         # Prepare file metadata
         file_metadata_data = {
             "originalName": file.filename,
-            "filename": unique_filename,
-            "size": file.size,
+            "filename": blob_filename,
+            "size": file_size,
             "mimetype": file.content_type,
             "path": file_path,
             "userId": current_user.id,
-            "userEmail": current_user.email
+            "userEmail": current_user.email,
+            "contentHash": content_hash
         }
         
         # Save metadata to database
-        saved_metadata = await file_service.save_file_metadata(file_metadata_data)
+        try:
+            saved_metadata = await file_service.save_file_metadata(file_metadata_data)
+            await blob_service.link_file(str(saved_metadata.id), current_user.id, content_hash)
+            file_metadata_cache.invalidate(current_user.id, saved_metadata.id)
+        except Exception:
+            await blob_service.release(content_hash)
+            raise
         
         # Process document for AI chat in background
+        job_id = None
         try:
-            from app.ai.rag_engine import rag_engine
-            await rag_engine.process_file_for_chat(
+            job_id = await ingestion_queue.enqueue(
                 file_path, 
                 current_user.id, 
-                str(saved_metadata.id)
+                str(saved_metadata.id),
+                content_hash=content_hash
             )
-            processing_status = "success"
+            processing_status = "queued"
         except Exception as e:
             processing_status = "failed"
-            print(f"Error processing document: {e}")
+            print(f"Error queueing document: {e}")
         
         return FileUploadResponse(
             success=True,
             message=f"File đã được upload thành công. Xử lý AI: {processing_status}",
-            file=saved_metadata
+            file=saved_metadata,
+            jobId=job_id
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        # Clean up file if metadata save failed
-        if 'file_path' in locals() and os.path.exists(file_path):
+        # Clean up file if metadata save failed (blobs are cleaned up by release)
+        if 'blob_filename' not in locals() and 'file_path' in locals() and os.path.exists(file_path):
             os.remove(file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -138,7 +163,7 @@ async def get_file_detail(
     Migrated from getFileDetail function in fileDetailController.js
     """
     try:
-        file_metadata = await file_service.get_file_by_id(file_id, current_user.id)
+        file_metadata = await file_metadata_cache.get_file(file_id, current_user.id)
         
         if not file_metadata:
             raise HTTPException(
@@ -169,7 +194,7 @@ async def download_file(
     Migrated from downloadFile function in fileDetailController.js
     """
     try:
-        file_metadata = await file_service.get_file_by_id(file_id, current_user.id)
+        file_metadata = await file_metadata_cache.get_file(file_id, current_user.id)
         
         if not file_metadata:
             raise HTTPException(
@@ -209,7 +234,13 @@ async def delete_file(
     Migrated from deleteFile function in fileDetailController.js
     """
     try:
-        success = await file_service.delete_file(file_id, current_user.id)
+        content_hash = await blob_service.get_file_content_hash(file_id, current_user.id)
+        if content_hash:
+            # The physical file may be shared, so only drop this record's reference
+            success = await blob_service.delete_file(file_id, current_user.id, content_hash)
+        else:
+            success = await file_service.delete_file(file_id, current_user.id)
+        file_metadata_cache.invalidate(current_user.id, file_id)
         
         if not success:
             raise HTTPException(
@@ -217,6 +248,10 @@ async def delete_file(
                 detail="File không tồn tại"
             )
         
+        # Drop the file's vectors from the per-file and per-user indexes
+        from app.ai.document_processor import document_processor
+        await document_processor.delete_user_vector_store(current_user.id, file_id)
+        
         return StandardResponse(
             success=True,
             message="File đã được xóa thành công"
@@ -239,7 +274,7 @@ async def get_file_content(
     Get extracted text content of a file
     """
     try:
-        file_metadata = await file_service.get_file_by_id(file_id, current_user.id)
+        file_metadata = await file_metadata_cache.get_file(file_id, current_user.id)
         
         if not file_metadata:
             raise HTTPException(
@@ -0,0 +1,53 @@
+"""
+Ingestion job API endpoints
+Progress of background document processing
+"""
+
+from fastapi import APIRouter, HTTPException, status, Depends
+from app.models.user import User
+from app.models.job import IngestionJob, JobResponse
+from app.core.auth import get_current_user
+from app.services.ingestion_service import ingestion_queue
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job_status(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Get stage and progress of an ingestion job"""
+    try:
+        job = await ingestion_queue.get_job(job_id, current_user.id)
+        
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job không tồn tại"
+            )
+        
+        return JobResponse(
+            success=True,
+            job=IngestionJob(
+                id=str(job["_id"]),
+                fileId=job["fileId"],
+                status=job["status"],
+                stage=job["stage"],
+                progress=job["progress"],
+                attempts=job["attempts"],
+                maxAttempts=job["maxAttempts"],
+                error=job.get("error"),
+                createdAt=job["createdAt"],
+                updatedAt=job["updatedAt"],
+                startedAt=job.get("startedAt"),
+                finishedAt=job.get("finishedAt")
+            )
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Lỗi lấy trạng thái xử lý"
+        )
@@ -0,0 +1,91 @@
+"""
+Metrics endpoint
+Prometheus text exposition of the in-process metrics registry. Scrapers
+authenticate with ``Authorization: Bearer <METRICS_TOKEN>``; without a
+configured token the endpoint refuses every request.
+"""
+
+import hmac
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+from app.config.settings import settings
+from app.core.metrics import registry, CallbackMetric
+from app.core.executors import executors
+from app.core.auth import user_cache
+
+router = APIRouter()
+
+# Not the user JWT scheme: Prometheus sends a static bearer token
+metrics_bearer = HTTPBearer(auto_error=False)
+
+# PlainTextResponse appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _executor_stat(key: str):
+    def collect() -> Dict[Tuple[str, ...], float]:
+        return {(name,): stats.get(key, 0) for name, stats in executors.stats().items()}
+    return collect
+
+
+def _cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of the caches on the request path, by cache name"""
+    # Imported here so /metrics doesn't pull the AI stack in at import time
+    from app.ai.document_processor import document_processor
+    from app.ai.answer_cache import answer_cache
+    from app.services.file_cache import file_metadata_cache
+
+    stats = {
+        "auth_users": user_cache.stats(),
+        "answers": answer_cache.stats(),
+        "search_indexes": document_processor.search_index.stats(),
+        "file_metadata": file_metadata_cache.stats()
+    }
+    processor_stats = document_processor.get_cache_stats()
+    stats["vector_stores"] = processor_stats["vector_stores"]
+    if "embeddings" in processor_stats:
+        stats["embedding_chunks"] = processor_stats["embeddings"]["chunks"]
+        stats["embedding_queries"] = processor_stats["embeddings"]["queries"]
+    return stats
+
+
+def _cache_stat(key: str):
+    def collect() -> Dict[Tuple[str, ...], float]:
+        return {(name,): stats.get(key, 0) for name, stats in _cache_stats().items()}
+    return collect
+
+
+# Read at scrape time, so they cost nothing on the request path
+CallbackMetric("executor_queued_tasks", "Tasks waiting for a worker, per pool", _executor_stat("queued"), ("pool",))
+CallbackMetric("executor_active_tasks", "Tasks running, per pool", _executor_stat("active"), ("pool",))
+CallbackMetric("executor_max_workers", "Worker threads, per pool", _executor_stat("max_workers"), ("pool",))
+CallbackMetric("cache_hits_total", "Cache hits, per cache", _cache_stat("hits"), ("cache",), kind="counter")
+CallbackMetric("cache_misses_total", "Cache misses, per cache", _cache_stat("misses"), ("cache",), kind="counter")
+CallbackMetric("cache_evictions_total", "Cache evictions, per cache", _cache_stat("evictions"), ("cache",), kind="counter")
+CallbackMetric("cache_entries", "Cached entries, per cache", _cache_stat("entries"), ("cache",))
+
+
+def verify_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_bearer)):
+    """Require the configured scrape token"""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Metrics chưa được cấu hình METRICS_TOKEN"
+        )
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token metrics không hợp lệ",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(verify_metrics_token)])
+async def metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,8 +1,9 @@
 """
 Search API endpoints 
-Basic implementation with Meilisearch integration
+Full-text search over the user's documents (in-process BM25 index)
 """
 
+import time
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from typing import Optional
 from app.models.user import User
@@ -18,18 +19,27 @@ async def search_files(
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """
-    Search files with basic functionality
+    Search the user's documents
+    Hits are pages (or file names) ranked by BM25, with a snippet of the
+    best matching chunk and the match offsets within the snippet
     """
     try:
-        # Basic search implementation
-        # For now, return empty results as Meilisearch is optional
+        start_time = time.perf_counter()
+        hits, hits_count = [], 0
+        
+        if current_user:
+            from app.ai.document_processor import document_processor
+            hits, hits_count = await document_processor.search_index.search(
+                current_user.id, query, limit, offset
+            )
+        
         return {
             "success": True,
             "data": {
-                "hits": [],
+                "hits": hits,
                 "query": query,
-                "processingTimeMs": 1,
-                "hitsCount": 0,
+                "processingTimeMs": round((time.perf_counter() - start_time) * 1000, 2),
+                "hitsCount": hits_count,
                 "offset": offset,
                 "limit": limit
             }
@@ -42,12 +52,30 @@ async def search_files(
 
 @router.get("/suggestions")
 async def get_suggestions(
-    q: str = Query(..., description="Query string for suggestions")
+    q: str = Query(..., description="Query string for suggestions"),
+    limit: int = Query(10, ge=1, le=50, description="Suggestions limit"),
+    current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """
     Get search suggestions
+    Completes the last word of q from the user's file names and the
+    vocabulary of their indexed documents
     """
-    return {
-        "success": True,
-        "suggestions": []
-    }
+    try:
+        suggestions = []
+        
+        if current_user:
+            from app.ai.document_processor import document_processor
+            suggestions = await document_processor.search_index.suggest(
+                current_user.id, q, limit
+            )
+        
+        return {
+            "success": True,
+            "suggestions": suggestions
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Lỗi lấy gợi ý tìm kiếm"
+        )
@@ -6,13 +6,33 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from app.core.security import security
+from app.core.cache import LRUCache
 from app.config.database import get_collection
+from app.config.settings import settings
 from app.models.user import User
 from bson import ObjectId
 
 # HTTP Bearer token scheme
 security_scheme = HTTPBearer()
 
+# Authenticated users by id, so requests don't each re-read the user from
+# Mongo. Changes made through this process invalidate the entry right away;
+# the TTL (capped) bounds how long other worker processes can still serve
+# a changed or deactivated user.
+USER_CACHE_MAX_TTL_SECONDS = 60
+
+user_cache = LRUCache(
+    max_entries=getattr(settings, "AUTH_USER_CACHE_MAX_ENTRIES", 10000),
+    ttl_seconds=min(
+        getattr(settings, "AUTH_USER_CACHE_TTL_SECONDS", 30),
+        USER_CACHE_MAX_TTL_SECONDS
+    )
+)
+
+def invalidate_cached_user(user_id: str):
+    """Drop a user from the cache after changing them (profile, password, deactivation)"""
+    user_cache.pop(str(user_id))
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security_scheme)
 ) -> User:
@@ -36,6 +56,10 @@ async def get_current_user(
         if user_id is None:
             raise credentials_exception
         
+        cached_user = user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
+        
         # Get user from database
         users_collection = get_collection("users")
         user_data = await users_collection.find_one({"_id": ObjectId(user_id)})
@@ -61,6 +85,7 @@ async def get_current_user(
             lastLogin=user_data.get("lastLogin")
         )
         
+        user_cache.put(user_id, user)
         return user
         
     except Exception as e:
@@ -0,0 +1,145 @@
+"""
+In-process caching utilities
+Thread-safe because cached values are touched both from the event loop and
+from executor threads
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Least-recently-used cache bounded by entry count and/or total size
+
+    ``sizeof`` is called once per insert to estimate the entry size in bytes;
+    it is only required when ``max_bytes`` is set. With ``ttl_seconds`` set,
+    entries also expire that long after they were inserted.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("sizeof is required when max_bytes is set")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._expires_at: Dict[Hashable, float] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get value and mark it as most recently used"""
+        with self._lock:
+            if key in self._data and self._is_expired(key):
+                self._remove(key)
+                self.expirations += 1
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        """Insert or replace a value, evicting old entries if over budget"""
+        size = self._sizeof(value) if self._sizeof else 0
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            # An entry larger than the whole budget would evict everything
+            # and still not fit, so it is simply not cached
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._data[key] = value
+            self._sizes[key] = size
+            if self.ttl_seconds is not None:
+                self._expires_at[key] = time.monotonic() + self.ttl_seconds
+            self._total_bytes += size
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a value if present"""
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._remove(key)
+            return value
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches predicate"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._expires_at.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data and not self._is_expired(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def _is_expired(self, key: Hashable) -> bool:
+        expires_at = self._expires_at.get(key)
+        return expires_at is not None and time.monotonic() >= expires_at
+
+    def _remove(self, key: Hashable):
+        del self._data[key]
+        self._expires_at.pop(key, None)
+        self._total_bytes -= self._sizes.pop(key, 0)
+
+    def _evict(self):
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
@@ -0,0 +1,146 @@
+"""
+Named, bounded executors for blocking work
+Each kind of blocking work gets its own thread pool so that, for example,
+a burst of ingestion cannot starve chat requests of threads
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from app.config.settings import settings
+from app.core.profiler import current_profile
+
+# Pool names
+PARSE = "parse"              # Document loading / text extraction
+EMBED = "embed"              # Chunk embedding and index building (ingestion)
+QUERY_EMBED = "query_embed"  # Query embedding batches (chat hot path)
+SEARCH = "search"            # Per-store vector searches
+INDEX_IO = "index_io"        # Vector store load/save
+LLM = "llm"                  # Blocking LLM chain calls
+PASSWORD = "password"        # bcrypt hashing / verification
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when a pool's queue limit is reached; the caller should shed load"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool that tracks how many tasks are queued and running
+    With ``max_queue``, submit() raises ExecutorSaturated instead of queueing
+    more than that many tasks behind busy workers
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-worker"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Submit a callable, counting it as queued until a worker picks it up"""
+        profile = current_profile()
+        if profile is not None:
+            fn = profile.bind(fn)
+
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                raise ExecutorSaturated(f"Executor '{self.name}' queue is full ({self.max_queue})")
+            self._queued += 1
+
+        def tracked():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        try:
+            return self._executor.submit(tracked)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    def map(self, fn: Callable, *iterables: Iterable) -> Iterator[Any]:
+        """Like ThreadPoolExecutor.map, with queue accounting"""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return (future.result() for future in futures)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable from async code"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    @property
+    def queue_depth(self) -> int:
+        """Tasks waiting for a free worker"""
+        return self._queued
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued
+            }
+            if self.max_queue is not None:
+                stats["max_queue"] = self.max_queue
+            return stats
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+class ExecutorRegistry:
+    """Registry of named bounded executors"""
+
+    def __init__(self):
+        self._executors: Dict[str, BoundedExecutor] = {}
+
+    def register(self, name: str, max_workers: int, max_queue: Optional[int] = None) -> BoundedExecutor:
+        executor = BoundedExecutor(name, max_workers, max_queue)
+        self._executors[name] = executor
+        return executor
+
+    def get(self, name: str) -> BoundedExecutor:
+        return self._executors[name]
+
+    async def run(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the named pool"""
+        return await self._executors[name].run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Size, active and queued task counts per pool"""
+        return {name: executor.stats() for name, executor in self._executors.items()}
+
+    def shutdown(self, wait: bool = True):
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+
+
+# Global executor registry
+executors = ExecutorRegistry()
+executors.register(PARSE, getattr(settings, "EXECUTOR_PARSE_WORKERS", 2))
+executors.register(EMBED, getattr(settings, "EXECUTOR_EMBED_WORKERS", 2))
+executors.register(QUERY_EMBED, getattr(settings, "EXECUTOR_QUERY_EMBED_WORKERS", 2))
+executors.register(SEARCH, getattr(settings, "EXECUTOR_SEARCH_WORKERS", 4))
+executors.register(INDEX_IO, getattr(settings, "EXECUTOR_INDEX_IO_WORKERS", 4))
+executors.register(LLM, getattr(settings, "EXECUTOR_LLM_WORKERS", 16))
+# bcrypt releases the GIL; the queue limit turns a login flood into fast 503s
+# instead of ever-growing waits
+executors.register(
+    PASSWORD,
+    getattr(settings, "EXECUTOR_PASSWORD_WORKERS", 2),
+    getattr(settings, "EXECUTOR_PASSWORD_MAX_QUEUE", 32)
+)
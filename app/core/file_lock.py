@@ -0,0 +1,53 @@
+"""
+Cross-process locks on lock files
+Uvicorn workers each run ingestion, so writers of shared on-disk state (the
+per-user indexes) serialize on an flock as well as on an in-process lock
+"""
+
+import os
+import fcntl
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+# Polling keeps a waiting writer from tying up an executor thread
+POLL_INTERVAL_SECONDS = 0.05
+
+
+class FileLocks:
+    """Per-path asyncio locks combined with an exclusive flock on the path"""
+
+    def __init__(self):
+        # One entry per path in use; dropped once no task holds or awaits it
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def _get_lock(self, path: str) -> asyncio.Lock:
+        lock = self._locks.get(path)
+        if lock is None:
+            lock = self._locks[path] = asyncio.Lock()
+        return lock
+
+    @asynccontextmanager
+    async def hold(self, path: str) -> AsyncIterator[None]:
+        """Hold the lock for path, creating the lock file (and its directory) if needed"""
+        async with self._get_lock(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                while True:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+
+# Global file lock registry
+file_locks = FileLocks()
@@ -0,0 +1,232 @@
+"""
+Lightweight in-process metrics
+Metrics register themselves in ``registry``, which renders them in the
+Prometheus text exposition format for the /metrics endpoint. Recording is a
+bisect plus a short lock; values that already live elsewhere (executor
+queues, cache counters) are read by callbacks at scrape time instead.
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric, replacing any earlier one with the same name"""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"Warning: Could not collect metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry
+registry = MetricsRegistry()
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus semantics)
+
+    With ``labelnames``, observations go to per-label children from
+    ``labels(*values)``; children are created on first use and cached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = registry
+    ):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._children: Dict[LabelValues, "Histogram"] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values: Any) -> "Histogram":
+        """Child histogram for one combination of label values"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = Histogram(self.name, self.description, self.buckets, registry=None)
+                    self._children[key] = child
+        return child
+
+    def observe(self, value: float):
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get cumulative bucket counts, sum and count"""
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total_count = self._count
+
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = total_count
+
+        return {
+            "buckets": cumulative,
+            "sum": total_sum,
+            "count": total_count,
+            "mean": total_sum / total_count if total_count else 0.0
+        }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        if self.labelnames:
+            series = sorted(self._children.items())
+        else:
+            series = [((), self)]
+
+        for values, histogram in series:
+            snapshot = histogram.snapshot()
+            for bound, count in zip(list(self.buckets) + [float("inf")], snapshot["buckets"].values()):
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(snapshot['sum'])}")
+            lines.append(f"{self.name}_count{labels} {snapshot['count']}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = registry
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def inc(self, *values: Any, amount: float = 1.0):
+        """Add amount to the series for these label values"""
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *values: Any) -> float:
+        return self._values.get(tuple(str(value) for value in values), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for values, value in series:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge (or counter) read from ``callback`` at scrape time
+    The callback returns a number, or {label values tuple: number}
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+        registry: Optional[MetricsRegistry] = registry
+    ):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        if registry is not None:
+            registry.register(self)
+
+    def render(self) -> List[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
@@ -3,12 +3,46 @@ Custom middleware for the application
 """
 
 import time
+import random
 import logging
+from typing import Optional
 from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPAuthorizationCredentials
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.core.security import security
+from app.core.auth import get_current_user_optional
+from app.core.metrics import Histogram
+from app.core.rate_limit import RateLimiter, default_rules, create_backend, retry_after_header
+from app.core.profiler import profiler
+
 logger = logging.getLogger(__name__)
 
+http_request_histogram = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts, per route template",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    labelnames=("method", "route", "status")
+)
+
+# Matched endpoint -> route path, filled on first request to each endpoint
+_route_paths = {}
+
+def route_template(request: Request) -> str:
+    """Matched route path (e.g. /api/files/{file_id}), so labels stay bounded"""
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        path = next(
+            (route.path for route in request.app.routes if getattr(route, "endpoint", None) is endpoint),
+            "unmatched"
+        )
+        _route_paths[endpoint] = path
+    return path
+
 async def log_requests(request: Request, call_next):
     """
     Log all requests with processing time
@@ -24,6 +58,9 @@ async def log_requests(request: Request, call_next):
     
     # Calculate processing time
     process_time = time.time() - start_time
+    http_request_histogram.labels(
+        request.method, route_template(request), response.status_code
+    ).observe(process_time)
     
     # Log request completion
     logger.info(
@@ -39,43 +76,91 @@ async def log_requests(request: Request, call_next):
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
-    Basic rate limiting middleware
+    Token-bucket rate limiting per user (from the bearer token) or client IP
+    Limits per route come from the limiter's rules; see app.core.rate_limit
     """
-    def __init__(self, app, calls_per_minute: int = 60):
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
         super().__init__(app)
-        self.calls_per_minute = calls_per_minute
-        self.clients = {}
+        self.limiter = limiter or RateLimiter(default_rules(), create_backend())
+    
+    @staticmethod
+    def client_key(request: Request) -> str:
+        authorization = request.headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            payload = security.verify_token(token)
+            if payload and payload.get("userId"):
+                return f"user:{payload['userId']}"
+        return f"ip:{request.client.host if request.client else 'unknown'}"
     
     async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        current_time = time.time()
+        rule = self.limiter.match(request.method, request.url.path)
+        if rule is None:
+            return await call_next(request)
         
-        # Clean old entries
-        self.clients = {
-            ip: calls for ip, calls in self.clients.items()
-            if any(call_time > current_time - 60 for call_time in calls)
-        }
+        allowed, retry_after = await self.limiter.check(rule, self.client_key(request))
+        if not allowed:
+            return JSONResponse(
+                status_code=429,
+                content={
+                    "success": False,
+                    "message": "Rate limit exceeded. Please try again later."
+                },
+                headers={"Retry-After": retry_after_header(retry_after)}
+            )
         
-        # Check rate limit
-        if client_ip in self.clients:
-            recent_calls = [
-                call_time for call_time in self.clients[client_ip]
-                if call_time > current_time - 60
-            ]
-            if len(recent_calls) >= self.calls_per_minute:
-                from fastapi.responses import JSONResponse
-                return JSONResponse(
-                    status_code=429,
-                    content={
-                        "success": False,
-                        "message": "Rate limit exceeded. Please try again later."
-                    }
-                )
-        else:
-            self.clients[client_ip] = []
+        return await call_next(request)
+
+class ProfilingMiddleware:
+    """
+    Profile requests on demand (see app.core.profiler)
+    A request is profiled when an admin sends ``X-Profile: 1``, or when it is
+    picked by ``sample_rate`` (0 disables sampling) among /api requests. The profile id is
+    returned in the ``X-Profile-Id`` response header. Plain ASGI rather than
+    BaseHTTPMiddleware, so streamed responses are profiled to the end.
+    """
+    def __init__(self, app, sample_rate: float = 0.0):
+        self.app = app
+        self.sample_rate = sample_rate
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        headers = dict(scope["headers"])
+        requested = headers.get(b"x-profile", b"").lower() in (b"1", b"true")
+        sampled = (
+            self.sample_rate > 0
+            and scope["path"].startswith("/api/")
+            and random.random() < self.sample_rate
+        )
+        if not requested and not sampled:
+            return await self.app(scope, receive, send)
         
-        # Add current call
-        self.clients[client_ip].append(current_time)
+        user = await self._get_user(headers.get(b"authorization", b"").decode("latin-1"))
+        if not sampled and (user is None or user.role != "admin"):
+            return await self.app(scope, receive, send)
         
-        response = await call_next(request)
-        return response
+        profile = profiler.start(scope["method"], scope["path"], user.id if user else None)
+        if profile is None:
+            return await self.app(scope, receive, send)
+        
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            await profiler.stop(profile)
+    
+    @staticmethod
+    async def _get_user(authorization: str):
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return await get_current_user_optional(
+            HTTPAuthorizationCredentials(scheme=scheme, credentials=token)
+        )
@@ -0,0 +1,296 @@
+"""
+On-demand sampling profiler for single requests
+A profiled request gets a RequestProfile in a context variable. While it is
+active, a sampler thread periodically records the stacks of:
+
+    - the event loop thread, when one of the request's tasks is running
+    - executor worker threads, while they run work submitted by the request
+    - the request's other tasks, as the chain of coroutines they await on
+
+Stacks are written in the collapsed format ("frame;frame;frame count") read
+by flamegraph.pl, speedscope and most flamegraph viewers. Requests that
+are not profiled pay one context variable lookup per executor submit and
+per task created.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+import weakref
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config.settings import settings
+
+PROFILE_SUFFIX = ".folded"
+META_SUFFIX = ".json"
+
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    return _active_profile.get()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    filename = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def _await_stack(coro) -> List[str]:
+    """Frames of a suspended coroutine and everything it is awaiting"""
+    names = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        names.append(_frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return names
+
+
+class RequestProfile:
+    """Samples collected for one request"""
+
+    def __init__(self, method: str, path: str, user_id: Optional[str], loop: asyncio.AbstractEventLoop):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.user_id = user_id
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self._threads: Dict[int, int] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def bind(self, fn: Callable) -> Callable:
+        """Wrap fn so that the thread running it is sampled for this request"""
+        def profiled(*args, **kwargs):
+            ident = threading.get_ident()
+            token = _active_profile.set(self)
+            with self._lock:
+                self._threads[ident] = self._threads.get(ident, 0) + 1
+                self._thread_names[ident] = threading.current_thread().name
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._threads[ident] -= 1
+                    if not self._threads[ident]:
+                        del self._threads[ident]
+                _active_profile.reset(token)
+        return profiled
+
+    def sample(self, frames: Dict[int, Any]):
+        """Record one sample of every thread and task working for the request"""
+        stacks = []
+        with self._lock:
+            threads = [(ident, self._thread_names[ident]) for ident in self._threads]
+        for ident, name in threads:
+            frame = frames.get(ident)
+            if frame is not None:
+                stacks.append([name] + _thread_stack(frame))
+
+        running = asyncio.current_task(self.loop)
+        for task in list(self.tasks):
+            if task.done():
+                continue
+            if task is running:
+                frame = frames.get(self.loop_thread_id)
+                if frame is not None:
+                    stacks.append(["event-loop"] + _thread_stack(frame))
+            else:
+                stack = _await_stack(task.get_coro())
+                if stack:
+                    stacks.append(["awaiting"] + stack)
+
+        with self._lock:
+            self.samples += 1
+            for stack in stacks:
+                self.stacks[";".join(stack)] += 1
+
+    def collapsed(self) -> str:
+        """Samples in the collapsed stack format"""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "userId": self.user_id,
+            "startedAt": self.started_at,
+            "durationMs": round(self.duration * 1000, 1),
+            "samples": self.samples
+        }
+
+
+class Profiler:
+    """
+    Runs the sampler thread while any request is profiled and stores the
+    finished profiles on disk, keeping the newest ``max_profiles``
+    """
+
+    def __init__(
+        self,
+        profiles_dir: str,
+        interval_ms: float = 5.0,
+        max_seconds: float = 60.0,
+        max_concurrent: int = 4,
+        max_profiles: int = 50
+    ):
+        self.profiles_dir = profiles_dir
+        self.interval = interval_ms / 1000.0
+        self.max_seconds = max_seconds
+        self.max_concurrent = max_concurrent
+        self.max_profiles = max_profiles
+        self._active: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        self._factory_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+    def start(self, method: str, path: str, user_id: Optional[str] = None) -> Optional[RequestProfile]:
+        """Start profiling the current task; None when too many requests are profiled already"""
+        loop = asyncio.get_running_loop()
+        self._install_task_factory(loop)
+
+        profile = RequestProfile(method, path, user_id, loop)
+        with self._lock:
+            if len(self._active) >= self.max_concurrent:
+                return None
+            self._active.append(profile)
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._run_sampler, name="profiler-sampler", daemon=True)
+                self._sampler.start()
+
+        profile.tasks.add(asyncio.current_task())
+        profile._token = _active_profile.set(profile)
+        return profile
+
+    async def stop(self, profile: RequestProfile):
+        """Stop sampling the request and save its profile (file I/O off the event loop)"""
+        # executors imports this module for current_profile
+        from app.core.executors import executors, INDEX_IO
+
+        with self._lock:
+            if profile in self._active:
+                self._active.remove(profile)
+        if profile._token is not None:
+            _active_profile.reset(profile._token)
+            profile._token = None
+        profile.duration = time.time() - profile.started_at
+        try:
+            await executors.run(INDEX_IO, self._save, profile)
+        except Exception as e:
+            print(f"Warning: Could not save profile {profile.id}: {e}")
+
+    def _install_task_factory(self, loop: asyncio.AbstractEventLoop):
+        """Tasks created by a profiled task join its profile (installed on first use)"""
+        if loop in self._factory_loops:
+            return
+        previous = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            if previous is not None:
+                task = previous(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            profile = _active_profile.get()
+            if profile is not None:
+                profile.tasks.add(task)
+            return task
+
+        loop.set_task_factory(task_factory)
+        self._factory_loops.add(loop)
+
+    def _run_sampler(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                active = [p for p in self._active if now - p.started_at < self.max_seconds]
+                if not self._active:
+                    self._sampler = None
+                    return
+            if active:
+                frames = sys._current_frames()
+                for profile in active:
+                    try:
+                        profile.sample(frames)
+                    except Exception:
+                        # Tasks and frames change under us; skip this sample
+                        pass
+                del frames
+            time.sleep(self.interval)
+
+    def _save(self, profile: RequestProfile):
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        with open(os.path.join(self.profiles_dir, profile.id + PROFILE_SUFFIX), "w") as f:
+            f.write(profile.collapsed())
+        # Metadata last: profiles are listed by their metadata files
+        with open(os.path.join(self.profiles_dir, profile.id + META_SUFFIX), "w") as f:
+            json.dump(profile.metadata(), f)
+        self._prune()
+
+    def _prune(self):
+        profiles = self.list_profiles()
+        for meta in profiles[self.max_profiles:]:
+            for suffix in (META_SUFFIX, PROFILE_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.profiles_dir, meta["id"] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Saved profiles, newest first (from every worker process)"""
+        if not os.path.isdir(self.profiles_dir):
+            return []
+        profiles = []
+        for name in os.listdir(self.profiles_dir):
+            if not name.endswith(META_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.profiles_dir, name), "r") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        profiles.sort(key=lambda meta: meta.get("startedAt", 0), reverse=True)
+        return profiles
+
+    def get_profile_path(self, profile_id: str) -> Optional[str]:
+        """Path of a saved profile, None for unknown or malformed ids"""
+        if len(profile_id) != 32 or any(c not in "0123456789abcdef" for c in profile_id):
+            return None
+        path = os.path.join(self.profiles_dir, profile_id + PROFILE_SUFFIX)
+        return path if os.path.exists(path) else None
+
+
+# Global profiler instance
+profiler = Profiler(
+    profiles_dir=getattr(settings, "PROFILER_DIR", "profiles"),
+    interval_ms=getattr(settings, "PROFILER_INTERVAL_MS", 5),
+    max_seconds=getattr(settings, "PROFILER_MAX_SECONDS", 60),
+    max_concurrent=getattr(settings, "PROFILER_MAX_CONCURRENT", 4),
+    max_profiles=getattr(settings, "PROFILER_MAX_PROFILES", 50)
+)
@@ -0,0 +1,213 @@
+"""
+Token-bucket rate limiting
+Each (rule, client) pair owns a bucket of ``burst`` tokens that refills at
+``per_minute`` tokens a minute; a request takes one token. Checking a bucket
+is O(1) and a bucket only needs its token count and last update time.
+
+Backends:
+    InMemoryRateLimitBackend  per process; the default, and the stand-in for
+                              the shared backend in tests and local runs
+    RedisRateLimitBackend     shared by every worker process (needs the
+                              optional ``redis`` package)
+"""
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Tuple
+
+from app.config.settings import settings
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Limit for requests whose path starts with ``path_prefix``"""
+    name: str
+    path_prefix: str
+    per_minute: float
+    burst: Optional[int] = None
+    methods: Optional[FrozenSet[str]] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.burst or max(1, int(self.per_minute))
+
+    @property
+    def rate(self) -> float:
+        """Tokens refilled per second"""
+        return self.per_minute / 60.0
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        prefix = self.path_prefix.rstrip("/")
+        return path == prefix or path.startswith(prefix + "/")
+
+
+class RateLimitBackend:
+    """Stores buckets and takes tokens from them"""
+
+    async def acquire(self, key: str, rate: float, capacity: int) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets in an insertion-ordered dict, least recently used first
+
+    A bucket untouched for long enough to have refilled completely is
+    indistinguishable from a new one, so such idle buckets are dropped from
+    the front as new requests come in; ``max_buckets`` bounds memory under
+    many distinct clients. Only touched from the event loop, so no lock.
+    """
+
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        # key -> [tokens, updated_at, idle_after]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, capacity: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(key)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = [tokens, now, now + (capacity - tokens) / rate]
+        self._evict(now)
+
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if len(buckets) <= self.max_buckets and oldest[2] > now:
+                break
+            buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Refill and take a token atomically. Uses the Redis clock so workers on
+# different hosts agree, and expires buckets once they would be full again.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by all workers, as Redis hashes with a TTL
+    ``client`` is any asyncio Redis client (redis.asyncio, fakeredis)
+    """
+
+    def __init__(self, client, key_prefix: str = "ratelimit:"):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimitBackend":
+        if redis_asyncio is None:
+            raise RuntimeError("The 'redis' package is required for RATE_LIMIT_BACKEND=redis")
+        return cls(redis_asyncio.from_url(url))
+
+    async def acquire(self, key: str, rate: float, capacity: int) -> Tuple[bool, float]:
+        allowed, tokens = await self.client.eval(
+            _TOKEN_BUCKET_SCRIPT, 1, self.key_prefix + key, rate, capacity
+        )
+        if int(allowed):
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate
+
+    async def close(self):
+        await self.client.close()
+
+
+class RateLimiter:
+    """Picks the first matching rule for a request and checks its bucket"""
+
+    def __init__(self, rules: List[RateLimitRule], backend: RateLimitBackend):
+        self.rules = rules
+        self.backend = backend
+
+    def match(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return None
+
+    async def check(self, rule: RateLimitRule, client_key: str) -> Tuple[bool, float]:
+        """(allowed, retry after seconds); fails open if the backend is down"""
+        try:
+            return await self.backend.acquire(f"{rule.name}:{client_key}", rule.rate, rule.capacity)
+        except Exception as e:
+            print(f"Warning: Rate limit backend error: {e}")
+            return True, 0.0
+
+
+def default_rules() -> List[RateLimitRule]:
+    """Stricter limits for expensive routes, then a default for the rest of the API"""
+    return [
+        RateLimitRule(
+            "chat", "/api/chat",
+            getattr(settings, "RATE_LIMIT_CHAT_PER_MINUTE", 20),
+            methods=frozenset({"POST"})
+        ),
+        RateLimitRule(
+            "upload", "/api/upload",
+            getattr(settings, "RATE_LIMIT_UPLOAD_PER_MINUTE", 10),
+            methods=frozenset({"POST"})
+        ),
+        RateLimitRule(
+            "auth", "/api/auth",
+            getattr(settings, "RATE_LIMIT_AUTH_PER_MINUTE", 10),
+            methods=frozenset({"POST"})
+        ),
+        RateLimitRule("api", "/api", getattr(settings, "RATE_LIMIT_DEFAULT_PER_MINUTE", 120)),
+    ]
+
+
+def create_backend() -> RateLimitBackend:
+    backend = getattr(settings, "RATE_LIMIT_BACKEND", "memory")
+    if backend == "redis":
+        return RedisRateLimitBackend.from_url(getattr(settings, "RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+    if backend != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return InMemoryRateLimitBackend(getattr(settings, "RATE_LIMIT_MAX_BUCKETS", 100_000))
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
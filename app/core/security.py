@@ -8,6 +8,7 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import HTTPException, status
 from app.config.settings import settings
+from app.core.executors import executors, ExecutorSaturated, PASSWORD
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -25,6 +26,26 @@ class SecurityManager:
         """Generate password hash"""
         return pwd_context.hash(password)
     
+    @staticmethod
+    async def _run_password_work(fn, *args):
+        """Run bcrypt on the password pool, answering 503 when its queue is full"""
+        try:
+            return await executors.run(PASSWORD, fn, *args)
+        except ExecutorSaturated:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Máy chủ đang bận, vui lòng thử lại sau",
+                headers={"Retry-After": "1"}
+            )
+    
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """verify_password off the event loop"""
+        return await self._run_password_work(self.verify_password, plain_password, hashed_password)
+    
+    async def get_password_hash_async(self, password: str) -> str:
+        """get_password_hash off the event loop"""
+        return await self._run_password_work(self.get_password_hash, password)
+    
     @staticmethod
     def create_access_token(
         data: dict, 
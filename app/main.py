@@ -13,8 +13,12 @@ import time
 
 from app.config.database import init_db, close_db
 from app.config.settings import settings
-from app.core.middleware import log_requests
-from app.api.v1 import auth, files, search, chat
+from app.core.middleware import log_requests, RateLimitMiddleware, ProfilingMiddleware
+from app.api.v1 import auth, files, search, chat, jobs, metrics, admin
+from app.services.ingestion_service import ingestion_queue
+from app.core.executors import executors, LLM
+from app.ai.reranker import reranker
+from app.ai.pdf_parser import shutdown_pdf_pool
 
 # Application lifespan management
 @asynccontextmanager
@@ -28,10 +32,20 @@ async def lifespan(app: FastAPI):
     os.makedirs("uploads", exist_ok=True)
     os.makedirs("vector_stores", exist_ok=True)
     
+    await ingestion_queue.start()
+    print("✅ Ingestion workers started")
+    
+    # Load the cross-encoder now rather than on the first chat request
+    if reranker is not None and await executors.run(LLM, reranker.warm_up):
+        print("✅ Reranker model loaded")
+    
     yield
     
     # Shutdown
     print("🔄 Shutting down Chatnary Backend...")
+    await ingestion_queue.stop()
+    executors.shutdown(wait=False)
+    shutdown_pdf_pool(wait=False)
     await close_db()
     print("✅ Cleanup completed")
 
@@ -43,6 +57,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Rate limiting (added before CORS so 429 responses still get CORS headers)
+if getattr(settings, "RATE_LIMIT_ENABLED", True):
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -59,6 +77,13 @@ app.add_middleware(
 # Custom middleware
 app.middleware("http")(log_requests)
 
+# On-demand profiling (outermost, so the whole request is sampled)
+if getattr(settings, "PROFILER_ENABLED", True):
+    app.add_middleware(
+        ProfilingMiddleware,
+        sample_rate=getattr(settings, "PROFILER_SAMPLE_RATE", 0.0)
+    )
+
 # Static file serving
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -67,6 +92,11 @@ app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(files.router, prefix="/api", tags=["files"])
 app.include_router(search.router, prefix="/api", tags=["search"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
+METRICS_ENABLED = getattr(settings, "METRICS_ENABLED", False)
+if METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["monitoring"])
 
 # Health check endpoint
 @app.get("/health")
@@ -77,7 +107,8 @@ async def health_check():
         "version": "2.0.0",
         "timestamp": time.time(),
         "backend": "Python FastAPI",
-        "ai_integrated": True
+        "ai_integrated": True,
+        "executors": executors.stats()
     }
 
 @app.get("/")
@@ -88,10 +119,11 @@ async def root():
         "version": "2.0.0",
         "docs": "/docs",
         "health": "/health",
+        **({"metrics": "/metrics"} if METRICS_ENABLED else {}),
         "features": [
             "Authentication & User Management",
             "File Upload & Management", 
-            "Full-text Search (Meilisearch)",
+            "Full-text Search (BM25)",
             "AI Chat with Documents (RAG)",
             "Multi-document Support",
             "Vector Similarity Search"
@@ -28,6 +28,11 @@ class ChatResponse(BaseModel):
     processing_time: float
     model_used: str
     query: str
+    cached: bool = Field(default=False, description="Answer served from the answer cache")
+    retrieval_timings: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Seconds spent in each retrieval leg (dense, lexical)"
+    )
 
 class ChatHistoryItem(BaseModel):
     """Chat history item"""
@@ -11,6 +11,7 @@ class FileUploadResponse(BaseModel):
     success: bool = True
     message: str
     file: "FileMetadata"
+    jobId: Optional[str] = None
 
 class FileMetadata(BaseModel):
     """File metadata model"""
@@ -23,6 +24,7 @@ class FileMetadata(BaseModel):
     userId: str
     userEmail: str
     indexed: bool = False
+    indexStatus: Optional[str] = None
     downloadUrl: Optional[str] = None
     previewUrl: Optional[str] = None
 
@@ -0,0 +1,27 @@
+"""
+Ingestion job models
+"""
+
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class IngestionJob(BaseModel):
+    """Background ingestion job status"""
+    id: str
+    fileId: str
+    status: str
+    stage: str
+    progress: float
+    attempts: int
+    maxAttempts: int
+    error: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+
+class JobResponse(BaseModel):
+    """Ingestion job response model"""
+    success: bool = True
+    job: IngestionJob
@@ -0,0 +1,193 @@
+"""
+Content-addressed blob storage for uploads
+Identical uploads share one physical file and one vector store; per-user
+file records point at the blob through their contentHash field
+"""
+
+import os
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+import aiofiles
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.config.database import get_collection
+from app.services.file_service import file_service
+from app.services.file_cache import file_metadata_cache
+from app.core.file_lock import file_locks
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+BLOB_LOCK_PREFIX_LENGTH = 2  # Blobs share 256 lock files by hash prefix
+
+
+class UploadTooLargeError(Exception):
+    """Raised while streaming an upload once it exceeds the size limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class BlobService:
+    """
+    Refcounted blobs stored in the uploads directory as <sha256><ext>
+    The same content uploaded with another extension gets its own file
+    (parsing goes by extension), so the blob record lists every filename
+    written for it and the last release removes them all. Taking and
+    releasing a reference hold a cross-process lock on the blob's hash, so
+    an upload can't re-use a blob whose last reference is being released
+    (and whose file is about to be removed)
+    """
+
+    async def write_upload(
+        self,
+        upload_file,
+        dest_path: str,
+        max_bytes: int
+    ) -> Tuple[int, str]:
+        """
+        Stream an upload to disk in fixed-size chunks, hashing as it goes
+        Peak memory is one chunk regardless of file size. Raises
+        UploadTooLargeError (and removes the partial file) as soon as
+        max_bytes is exceeded, whatever size the client claimed.
+        Returns (size, sha256 hex digest)
+        """
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            async with aiofiles.open(dest_path, 'wb') as f:
+                while True:
+                    chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLargeError(max_bytes)
+
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            raise
+
+        return size, digest.hexdigest()
+
+    def get_blob_filename(self, content_hash: str, extension: str) -> str:
+        """Filename of the blob for this content"""
+        return f"{content_hash}{extension.lower()}"
+
+    def _blob_lock(self, content_hash: str):
+        lock_name = f".blob-{content_hash[:BLOB_LOCK_PREFIX_LENGTH]}.lock"
+        return file_locks.hold(file_service.get_file_path(lock_name))
+
+    async def store_blob(
+        self,
+        content_hash: str,
+        temp_path: str,
+        extension: str,
+        size: int
+    ) -> str:
+        """
+        Take a reference on the blob and move an uploaded temp file into place
+        Returns the blob filename
+        """
+        filename = self.get_blob_filename(content_hash, extension)
+        blob_path = file_service.get_file_path(filename)
+
+        async with self._blob_lock(content_hash):
+            blobs_collection = get_collection("blobs")
+            await blobs_collection.update_one(
+                {"_id": content_hash},
+                {
+                    "$inc": {"refCount": 1},
+                    "$addToSet": {"filenames": filename},
+                    "$setOnInsert": {
+                        "filename": filename,
+                        "size": size,
+                        "createdAt": datetime.utcnow()
+                    }
+                },
+                upsert=True
+            )
+
+            # Always replace: the content is identical, and an existing file
+            # may be left over from a release that failed part way
+            try:
+                os.replace(temp_path, blob_path)
+            except OSError:
+                await blobs_collection.update_one({"_id": content_hash}, {"$inc": {"refCount": -1}})
+                raise
+
+        return filename
+
+    async def link_file(self, file_id: str, user_id: str, content_hash: str):
+        """Record which blob a user's file record points at"""
+        files_collection = get_collection("files")
+        await files_collection.update_one(
+            {"id": file_id, "userId": ObjectId(user_id)},
+            {"$set": {"contentHash": content_hash}}
+        )
+        file_metadata_cache.invalidate(user_id, file_id)
+
+    async def get_file_content_hash(self, file_id: str, user_id: str) -> Optional[str]:
+        """Get the blob hash of a user's file, None for files uploaded before dedup"""
+        file_doc = await file_metadata_cache.get_document(user_id, file_id)
+        return file_doc.get("contentHash") if file_doc else None
+
+    async def delete_file(self, file_id: str, user_id: str, content_hash: str) -> bool:
+        """
+        Delete a blob-backed file record and release its blob reference
+        The physical file and shared vector store are removed with the last reference
+        """
+        files_collection = get_collection("files")
+        result = await files_collection.delete_one(
+            {"id": file_id, "userId": ObjectId(user_id)}
+        )
+        file_metadata_cache.invalidate(user_id, file_id)
+        if result.deleted_count == 0:
+            return False
+
+        await self.release(content_hash)
+        return True
+
+    async def release(self, content_hash: str) -> bool:
+        """Drop one reference, returns True if this was the last one"""
+        async with self._blob_lock(content_hash):
+            blobs_collection = get_collection("blobs")
+            blob = await blobs_collection.find_one_and_update(
+                {"_id": content_hash},
+                {"$inc": {"refCount": -1}},
+                return_document=ReturnDocument.AFTER
+            )
+
+            if blob is None or blob["refCount"] > 0:
+                return False
+
+            # Only delete if no new reference was taken in the meantime
+            result = await blobs_collection.delete_one(
+                {"_id": content_hash, "refCount": {"$lte": 0}}
+            )
+            if result.deleted_count == 0:
+                return False
+
+            # Records from before filenames was kept only have the first one
+            for filename in {blob["filename"], *blob.get("filenames", [])}:
+                blob_path = file_service.get_file_path(filename)
+                if os.path.exists(blob_path):
+                    os.remove(blob_path)
+
+            # Still under the lock, so a new upload of this content can't
+            # start indexing into the shared store before it is removed
+            from app.ai.document_processor import document_processor
+            await document_processor.delete_shared_vector_store(content_hash)
+
+        return True
+
+
+# Global blob service instance
+blob_service = BlobService()
@@ -0,0 +1,103 @@
+"""
+Read-through cache of file metadata
+Chat sources, search indexing, file detail/download/content and document
+processing all look up the same file records. Entries are keyed per user and
+file and dropped whenever the record changes (upload, delete, index status),
+so within one process reads never see stale data; the TTL bounds how long
+other worker processes can.
+
+Two views of a record are cached (shared, so callers must not mutate them):
+    - the raw ``files`` document, fetched in batches with one ``$in`` query
+    - the FileMetadata returned by file_service.get_file_by_id. Its index
+      status is written by ingestion workers in any process, so get_file
+      overlays it from a projected read instead of serving it from the cache
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+from app.config.database import get_collection
+from app.config.settings import settings
+from app.core.cache import LRUCache
+
+DOCUMENT = "doc"
+METADATA = "metadata"
+STATUS_FIELDS = ("indexed", "indexStatus")
+
+
+class FileMetadataCache:
+    """Per-user, per-file cache of file records"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self._cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    async def get_documents(self, user_id: str, file_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Raw file documents by id, fetching every miss in one query; unknown ids are left out"""
+        documents = {}
+        missing: List[str] = []
+        for file_id in dict.fromkeys(file_ids):
+            document = self._cache.get((DOCUMENT, user_id, file_id))
+            if document is not None:
+                documents[file_id] = document
+            else:
+                missing.append(file_id)
+
+        if missing:
+            files_collection = get_collection("files")
+            cursor = files_collection.find({
+                "id": {"$in": missing},
+                "userId": ObjectId(user_id)
+            })
+            async for document in cursor:
+                documents[document["id"]] = document
+                self._cache.put((DOCUMENT, user_id, document["id"]), document)
+
+        return documents
+
+    async def get_document(self, user_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """Raw file document, None if the user has no such file"""
+        return (await self.get_documents(user_id, [file_id])).get(file_id)
+
+    async def get_file(self, file_id: str, user_id: str):
+        """file_service.get_file_by_id, cached apart from the current index status"""
+        # Imported here: this module is imported by document_processor
+        from app.services.file_service import file_service
+
+        files_collection = get_collection("files")
+        status = await files_collection.find_one(
+            {"id": file_id, "userId": ObjectId(user_id)},
+            {field: 1 for field in STATUS_FIELDS}
+        )
+        if status is None:
+            # Deleted, possibly by another worker process
+            self.invalidate(user_id, file_id)
+            return None
+
+        metadata = self._cache.get((METADATA, user_id, file_id))
+        if metadata is None:
+            metadata = await file_service.get_file_by_id(file_id, user_id)
+            if metadata is None:
+                return None
+            self._cache.put((METADATA, user_id, file_id), metadata)
+
+        return metadata.model_copy(update={
+            "indexed": status.get("indexed", False),
+            "indexStatus": status.get("indexStatus")
+        })
+
+    def invalidate(self, user_id: str, file_id: str):
+        """Drop a file's cached record after it changed"""
+        user_id, file_id = str(user_id), str(file_id)
+        self._cache.pop((DOCUMENT, user_id, file_id))
+        self._cache.pop((METADATA, user_id, file_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# Global file metadata cache instance
+file_metadata_cache = FileMetadataCache(
+    max_entries=getattr(settings, "FILE_METADATA_CACHE_MAX_ENTRIES", 10000),
+    ttl_seconds=getattr(settings, "FILE_METADATA_CACHE_TTL_SECONDS", 300)
+)
@@ -0,0 +1,346 @@
+"""
+Background ingestion job queue
+Uploads enqueue a job in the ingestion_jobs collection and return
+immediately; worker tasks parse, embed and index the document
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.config.database import get_collection
+from app.config.settings import settings
+from app.services.file_cache import file_metadata_cache
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class IngestionQueue:
+    """
+    Durable job queue with N worker tasks per process
+
+    Jobs are claimed atomically with find_one_and_update, so several worker
+    processes can share the collection, and a unique partial index allows
+    one pending (queued or running) job per file. Each claim counts as an
+    attempt. Failed attempts are retried with exponential backoff; jobs left
+    "running" by a crashed worker are treated the same way once their lease
+    expires, so a job that keeps killing its worker fails after maxAttempts
+    instead of looping. A running job's lease is renewed by a heartbeat,
+    and every later update is conditional on the job still being the
+    attempt this worker claimed, so a worker whose job was re-queued under
+    it can't overwrite the new attempt's result. The file's ``indexed``
+    flag is set from the job's terminal state.
+    """
+
+    def __init__(self):
+        self.worker_count = getattr(settings, "INGESTION_WORKERS", 2)
+        self.max_attempts = getattr(settings, "INGESTION_MAX_ATTEMPTS", 3)
+        self.retry_base_seconds = getattr(settings, "INGESTION_RETRY_BASE_SECONDS", 5)
+        self.poll_interval = getattr(settings, "INGESTION_POLL_INTERVAL", 2.0)
+        self.lease_seconds = getattr(settings, "INGESTION_JOB_LEASE_SECONDS", 900)
+        self.heartbeat_seconds = getattr(settings, "INGESTION_HEARTBEAT_SECONDS", 60)
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self):
+        """Start worker tasks (called from the application lifespan)"""
+        jobs_collection = get_collection("ingestion_jobs")
+        await jobs_collection.create_index([("status", 1), ("availableAt", 1), ("createdAt", 1)])
+        await jobs_collection.create_index([("fileId", 1), ("status", 1)])
+        try:
+            await jobs_collection.create_index(
+                [("fileId", 1), ("userId", 1)],
+                name="one_pending_job_per_file",
+                unique=True,
+                partialFilterExpression={"status": {"$in": [JOB_QUEUED, JOB_RUNNING]}}
+            )
+        except OperationFailure as e:
+            # Duplicate pending jobs from before the index, or a server older than 6.0
+            print(f"Warning: Could not create ingestion job de-dup index: {e}")
+
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker_loop(i))
+            for i in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        """Cancel worker tasks; interrupted jobs are re-queued after their lease"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enqueue(
+        self,
+        file_path: str,
+        user_id: str,
+        file_id: str,
+        content_hash: Optional[str] = None
+    ) -> str:
+        """Queue a file for ingestion, returns the job id"""
+        jobs_collection = get_collection("ingestion_jobs")
+        pending = {
+            "fileId": file_id,
+            "userId": ObjectId(user_id),
+            "status": {"$in": [JOB_QUEUED, JOB_RUNNING]}
+        }
+
+        # Don't queue the same file twice while a job for it is pending
+        existing = await jobs_collection.find_one(pending, {"_id": 1})
+        if existing:
+            return str(existing["_id"])
+
+        now = datetime.utcnow()
+        try:
+            result = await jobs_collection.insert_one({
+                "fileId": file_id,
+                "userId": ObjectId(user_id),
+                "filePath": file_path,
+                "contentHash": content_hash,
+                "status": JOB_QUEUED,
+                "stage": JOB_QUEUED,
+                "progress": 0.0,
+                "attempts": 0,
+                "maxAttempts": self.max_attempts,
+                "error": None,
+                "createdAt": now,
+                "updatedAt": now,
+                "availableAt": now,
+                "startedAt": None,
+                "finishedAt": None
+            })
+        except DuplicateKeyError:
+            # Lost the race with a concurrent enqueue of the same file
+            existing = await jobs_collection.find_one(pending, {"_id": 1})
+            if existing:
+                return str(existing["_id"])
+            raise
+        job_id = str(result.inserted_id)
+
+        await self._set_file_status(file_id, user_id, job_id, JOB_QUEUED)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+        return job_id
+
+    async def get_job(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job owned by the user"""
+        if not ObjectId.is_valid(job_id):
+            return None
+
+        jobs_collection = get_collection("ingestion_jobs")
+        return await jobs_collection.find_one({
+            "_id": ObjectId(job_id),
+            "userId": ObjectId(user_id)
+        })
+
+    async def _worker_loop(self, worker_index: int):
+        while True:
+            try:
+                job = await self._claim_next_job()
+                if job is None:
+                    await self._wait_for_work()
+                    continue
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Never let one bad job kill the worker
+                print(f"Warning: Ingestion worker {worker_index} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _wait_for_work(self):
+        self._wakeup.clear()
+        try:
+            # Poll as well, to pick up jobs enqueued by other processes
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _claim_next_job(self) -> Optional[Dict[str, Any]]:
+        jobs_collection = get_collection("ingestion_jobs")
+        now = datetime.utcnow()
+
+        await self._reap_expired_jobs(now)
+
+        return await jobs_collection.find_one_and_update(
+            {"status": JOB_QUEUED, "availableAt": {"$lte": now}},
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "stage": "starting",
+                    "progress": 0.0,
+                    "startedAt": now,
+                    "updatedAt": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("createdAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _reap_expired_jobs(self, now: datetime):
+        """Retry (or fail, once out of attempts) jobs whose worker died mid-run"""
+        jobs_collection = get_collection("ingestion_jobs")
+        expired_before = now - timedelta(seconds=self.lease_seconds)
+
+        expired = jobs_collection.find(
+            {"status": JOB_RUNNING, "updatedAt": {"$lt": expired_before}},
+            {"fileId": 1, "userId": 1, "attempts": 1, "maxAttempts": 1}
+        )
+        async for job in expired:
+            # The lost run was counted when it was claimed; the lease check
+            # skips a job whose heartbeat landed since the find
+            lease = {
+                "_id": job["_id"],
+                "attempts": job["attempts"],
+                "status": JOB_RUNNING,
+                "updatedAt": {"$lt": expired_before}
+            }
+            await self._retry_or_fail(job, lease, "Ingestion job lease expired")
+
+    async def _run_job(self, job: Dict[str, Any]):
+        from app.ai.document_processor import document_processor
+
+        jobs_collection = get_collection("ingestion_jobs")
+        job_id = job["_id"]
+        user_id = str(job["userId"])
+        file_id = job["fileId"]
+
+        # Matches only while this worker still holds the attempt it claimed
+        lease = {"_id": job_id, "attempts": job["attempts"], "status": JOB_RUNNING}
+
+        if not await self._file_exists(file_id, user_id):
+            # Deleted while queued; nothing left to index
+            await jobs_collection.delete_one(lease)
+            return
+
+        await self._set_file_status(file_id, user_id, str(job_id), JOB_RUNNING)
+
+        async def report_progress(stage: str, progress: float):
+            await jobs_collection.update_one(
+                lease,
+                {"$set": {"stage": stage, "progress": progress, "updatedAt": datetime.utcnow()}}
+            )
+
+        heartbeat = asyncio.create_task(self._heartbeat(lease))
+        try:
+            await document_processor.process_document(
+                job["filePath"],
+                user_id,
+                file_id,
+                content_hash=job.get("contentHash"),
+                progress_callback=report_progress
+            )
+        except Exception as e:
+            await self._retry_or_fail(job, lease, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+        now = datetime.utcnow()
+        result = await jobs_collection.update_one(
+            lease,
+            {"$set": {
+                "status": JOB_COMPLETED,
+                "stage": "done",
+                "progress": 1.0,
+                "error": None,
+                "finishedAt": now,
+                "updatedAt": now
+            }}
+        )
+        if not result.matched_count:
+            print(f"Warning: Ingestion job {job_id} lost its lease, result discarded")
+            return
+        await document_processor._update_file_index_status(file_id, user_id, True)
+        await self._set_file_status(file_id, user_id, str(job_id), JOB_COMPLETED)
+
+    async def _retry_or_fail(self, job: Dict[str, Any], lease: Dict[str, Any], error: str):
+        """Re-queue a failed attempt with backoff, or fail the job once it is out of attempts"""
+        from app.ai.document_processor import document_processor
+
+        jobs_collection = get_collection("ingestion_jobs")
+        job_id = str(job["_id"])
+        user_id = str(job["userId"])
+        file_id = job["fileId"]
+        now = datetime.utcnow()
+
+        if job["attempts"] < job.get("maxAttempts", self.max_attempts):
+            backoff = self.retry_base_seconds * (2 ** (job["attempts"] - 1))
+            result = await jobs_collection.update_one(
+                lease,
+                {"$set": {
+                    "status": JOB_QUEUED,
+                    "stage": JOB_QUEUED,
+                    "error": error,
+                    "availableAt": now + timedelta(seconds=backoff),
+                    "updatedAt": now
+                }}
+            )
+            if result.matched_count:
+                await self._set_file_status(file_id, user_id, job_id, JOB_QUEUED)
+            return
+
+        result = await jobs_collection.update_one(
+            lease,
+            {"$set": {
+                "status": JOB_FAILED,
+                "stage": JOB_FAILED,
+                "error": error,
+                "finishedAt": now,
+                "updatedAt": now
+            }}
+        )
+        if result.matched_count:
+            await document_processor._update_file_index_status(file_id, user_id, False)
+            await self._set_file_status(file_id, user_id, job_id, JOB_FAILED)
+
+    async def _heartbeat(self, lease: Dict[str, Any]):
+        """Keep a running job's lease fresh until cancelled (or the lease is lost)"""
+        jobs_collection = get_collection("ingestion_jobs")
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                result = await jobs_collection.update_one(
+                    lease,
+                    {"$set": {"updatedAt": datetime.utcnow()}}
+                )
+                if not result.matched_count:
+                    return
+            except Exception as e:
+                print(f"Warning: Could not renew ingestion job lease: {e}")
+
+    async def _file_exists(self, file_id: str, user_id: str) -> bool:
+        # Read from the database, not the file cache: deletes in other processes matter here
+        files_collection = get_collection("files")
+        file_doc = await files_collection.find_one(
+            {"id": file_id, "userId": ObjectId(user_id)},
+            {"_id": 1}
+        )
+        return file_doc is not None
+
+    async def _set_file_status(self, file_id: str, user_id: str, job_id: str, job_status: str):
+        """Mirror the job state on the file record for listing"""
+        try:
+            files_collection = get_collection("files")
+            await files_collection.update_one(
+                {"id": file_id, "userId": ObjectId(user_id)},
+                {"$set": {"indexStatus": job_status, "ingestionJobId": job_id}}
+            )
+            file_metadata_cache.invalidate(user_id, file_id)
+        except Exception as e:
+            print(f"Warning: Could not update file ingestion status: {e}")
+
+
+# Global ingestion queue instance
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory of heap-loaded vs memory-mapped FAISS indexes
+Starts several worker processes that each load the same index and run
+queries, like uvicorn workers serving one user's documents, and reports
+per-process private (anonymous) RSS, file-backed RSS and PSS.
+
+PSS divides shared pages between the processes mapping them, so the PSS
+total is the real memory cost of all workers together.
+
+Usage:
+    python benchmarks/bench_index_loading.py [--vectors 300000] [--dim 384] [--workers 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ai.index_factory import LOAD_MODES, read_index
+
+
+def read_memory_kb() -> dict:
+    """RssAnon / RssFile from /proc/self/status, Pss from smaps_rollup"""
+    memory = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, value = line.split()[:2]
+                memory[name.rstrip(":")] = int(value)
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["Pss"] = int(line.split()[1])
+    except FileNotFoundError:
+        memory["Pss"] = 0
+    return memory
+
+
+def worker(path, load_mode, queries, k, ready, results):
+    baseline = read_memory_kb()
+
+    start = time.perf_counter()
+    index = read_index(path, load_mode)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query[None, :], k)
+    query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    # Measure while every worker still holds its index
+    ready.wait()
+    memory = read_memory_kb()
+    results.put({
+        "load_seconds": load_seconds,
+        "query_ms": query_ms,
+        **{name: memory[name] - baseline.get(name, 0) for name in memory}
+    })
+    ready.wait()
+
+
+def run_mode(path, load_mode, workers, queries, k):
+    ctx = multiprocessing.get_context("fork")
+    ready = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(path, load_mode, queries, k, ready, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=300_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.random((args.queries, args.dim), dtype="float32")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.faiss")
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(args.dim))
+        for start in range(0, args.vectors, 50_000):
+            count = min(50_000, args.vectors - start)
+            index.add_with_ids(
+                rng.random((count, args.dim), dtype="float32"),
+                np.arange(start, start + count, dtype="int64")
+            )
+        faiss.write_index(index, path)
+        del index
+
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"Index: {args.vectors} x {args.dim} flat, {size_mb:.0f} MB on disk, {args.workers} workers")
+        print(
+            f"{'mode':<6}{'load s':>9}{'query ms':>10}{'anon MB':>10}"
+            f"{'file MB':>10}{'PSS MB':>10}{'total PSS MB':>14}"
+        )
+
+        for load_mode in LOAD_MODES:
+            rows = run_mode(path, load_mode, args.workers, queries, args.k)
+            mean = {key: sum(row[key] for row in rows) / len(rows) for key in rows[0]}
+            print(
+                f"{load_mode:<6}{mean['load_seconds']:>9.3f}{mean['query_ms']:>10.2f}"
+                f"{mean['RssAnon'] / 1024:>10.0f}{mean['RssFile'] / 1024:>10.0f}"
+                f"{mean['Pss'] / 1024:>10.0f}{sum(row['Pss'] for row in rows) / 1024:>14.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
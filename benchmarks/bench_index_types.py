@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recall@k and latency of flat, HNSW and IVF-PQ indexes
+Every index type is built over the same vectors and compared against exact
+flat search, using the knobs from IndexConfig (overridable below).
+
+Usage:
+    python benchmarks/bench_index_types.py [--vectors 200000] [--dim 384] [--k 10]
+        [--ef-search 16 32 64 128] [--nprobe 4 8 16 32]
+Vectors are synthetic, drawn around random cluster centres like real
+embeddings of a document corpus.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ai.index_factory import (
+    FLAT, HNSW, IVFPQ, IndexConfig, create_index, apply_search_params
+)
+
+
+def generate_vectors(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype("float32")
+    assignments = rng.integers(0, clusters, size=count)
+    vectors = centres[assignments] + 0.35 * rng.normal(size=(count, dim)).astype("float32")
+    return np.ascontiguousarray(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+
+def build(index_type: str, vectors: np.ndarray, config: IndexConfig):
+    start = time.perf_counter()
+    training = None
+    if index_type == IVFPQ:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(vectors), min(config.train_size, len(vectors)), replace=False)
+        training = vectors[sample]
+    index = create_index(index_type, vectors.shape[1], config, training, len(vectors))
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+    return index, time.perf_counter() - start
+
+
+def search(index, queries: np.ndarray, k: int):
+    # One query at a time, as in a chat request
+    latencies = []
+    results = np.empty((len(queries), k), dtype="int64")
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        results[i] = ids[0]
+    return results, np.array(latencies) * 1000
+
+
+def recall_at_k(results: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(results, truth))
+    return hits / truth.size
+
+
+def report(label: str, build_seconds, results, latencies, truth):
+    build_text = f"{build_seconds:>10.1f}" if build_seconds is not None else f"{'':>10}"
+    print(
+        f"{label:<24}{build_text}{recall_at_k(results, truth):>10.3f}"
+        f"{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 99):>10.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, nargs="*", default=[16, 32, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    config = IndexConfig.from_settings()
+    vectors = generate_vectors(args.vectors, args.dim, args.clusters, seed=1)
+    queries = generate_vectors(args.queries, args.dim, args.clusters, seed=2)
+    print(
+        f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}; "
+        f"selected type: {config.select_index_type(args.vectors)}"
+    )
+    print(f"{'index':<24}{'build s':>10}{'recall':>10}{'p50 ms':>10}{'p99 ms':>10}")
+
+    flat, build_seconds = build(FLAT, vectors, config)
+    truth, latencies = search(flat, queries, args.k)
+    report("flat (exact)", build_seconds, truth, latencies, truth)
+
+    hnsw, build_seconds = build(HNSW, vectors, config)
+    for ef_search in args.ef_search:
+        config.hnsw_ef_search = ef_search
+        apply_search_params(hnsw, config)
+        results, latencies = search(hnsw, queries, args.k)
+        report(f"hnsw efSearch={ef_search}", build_seconds, results, latencies, truth)
+        build_seconds = None
+
+    if args.vectors < config.min_training_vectors:
+        print(f"ivfpq skipped: needs at least {config.min_training_vectors} vectors")
+        return
+
+    ivfpq, build_seconds = build(IVFPQ, vectors, config)
+    for nprobe in args.nprobe:
+        config.ivf_nprobe = nprobe
+        apply_search_params(ivfpq, config)
+        results, latencies = search(ivfpq, queries, args.k)
+        report(f"ivfpq nprobe={nprobe}", build_seconds, results, latencies, truth)
+        build_seconds = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event-loop lag during a burst of concurrent logins
+A ticker coroutine sleeps for a fixed interval and records how late it wakes
+up, standing in for the chat streams sharing the loop, while a burst of
+bcrypt verifications runs either inline in the coroutines (the old login
+path) or on the bounded password pool (SecurityManager.verify_password_async).
+
+Usage:
+    python benchmarks/bench_login_event_loop.py [--logins 50] [--interval-ms 5]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+
+from app.core.security import security
+from app.core.executors import executors, PASSWORD
+
+
+async def measure_lag(interval: float, stop: asyncio.Event) -> list:
+    """Wake-up delays (seconds) of a coroutine sleeping interval at a time"""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+    return lags
+
+
+async def login_inline(password: str, hashed: str):
+    # Old handler body: bcrypt runs on the event loop
+    security.verify_password(password, hashed)
+
+
+async def login_pooled(password: str, hashed: str):
+    await security.verify_password_async(password, hashed)
+
+
+async def run_burst(login, logins: int, interval: float, password: str, hashed: str) -> dict:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(interval, stop))
+    await asyncio.sleep(interval * 4)
+
+    rejected = 0
+
+    async def one_login():
+        nonlocal rejected
+        try:
+            await login(password, hashed)
+        except HTTPException:
+            rejected += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lags = np.asarray(await ticker) * 1000
+    return {
+        "elapsed": elapsed,
+        "rejected": rejected,
+        "p50": float(np.percentile(lags, 50)),
+        "p99": float(np.percentile(lags, 99)),
+        "max": float(lags.max())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    hashed = security.get_password_hash(password)
+    pool = executors.get(PASSWORD).stats()
+    print(
+        f"{args.logins} concurrent logins, ticker every {args.interval_ms:g} ms, "
+        f"password pool {pool['max_workers']} workers / queue {pool.get('max_queue')}"
+    )
+    print(f"{'mode':<8}{'total s':>9}{'rejected':>10}{'lag p50 ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}")
+
+    for name, login in (("inline", login_inline), ("pooled", login_pooled)):
+        row = asyncio.run(run_burst(login, args.logins, args.interval_ms / 1000, password, hashed))
+        print(
+            f"{name:<8}{row['elapsed']:>9.2f}{row['rejected']:>10}"
+            f"{row['p50']:>12.2f}{row['p99']:>12.2f}{row['max']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: page-parallel PDF extraction throughput
+Reports pages/sec for sequential PyPDFLoader-style extraction and for
+load_pdf_parallel with an increasing number of worker processes.
+
+Usage:
+    python benchmarks/bench_pdf_parsing.py [--pdf path/to/file.pdf] [--pages 400]
+Without --pdf a synthetic text PDF is generated.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ai.pdf_parser import load_pdf_parallel, extract_page_range, count_pdf_pages
+
+LOREM = (
+    "Dieu {n}. Quy dinh ve quan ly tai lieu va ho so luu tru trong co quan. "
+    "Article {n} describes retention periods, access rights and audit duties "
+    "for every department that handles regulated documents. "
+)
+
+
+def generate_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """Write a simple multi-page text PDF without third-party dependencies"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1
+    objects.append(None)  # Pages tree, filled in below
+
+    page_ids = []
+    for page in range(pages):
+        lines = []
+        for line in range(lines_per_page):
+            text = LOREM.format(n=page * lines_per_page + line)[:95]
+            lines.append(f"BT /F1 9 Tf 40 {800 - line * 17} Td ({text}) Tj ET")
+        stream = "\n".join(lines).encode("latin-1")
+        content_id = add(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font_id, content_id)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, catalog_id, xref_offset)
+        )
+
+
+def bench_sequential(path: str, page_count: int) -> float:
+    start = time.perf_counter()
+    extract_page_range(path, 0, page_count)
+    return time.perf_counter() - start
+
+
+async def bench_parallel(path: str, workers: int) -> float:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm up worker processes so startup isn't counted
+        await asyncio.gather(*[
+            asyncio.get_event_loop().run_in_executor(executor, count_pdf_pages, path)
+            for _ in range(workers)
+        ])
+        start = time.perf_counter()
+        documents = await load_pdf_parallel(path, executor)
+        elapsed = time.perf_counter() - start
+
+    pages = [doc.metadata["page"] for doc in documents]
+    assert pages == sorted(pages), "pages out of order"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pdf", help="PDF to parse (default: generated)")
+    parser.add_argument("--pages", type=int, default=400, help="Pages in generated PDF")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp_dir, "bench.pdf")
+            generate_pdf(path, args.pages)
+
+        page_count = count_pdf_pages(path)
+        cpu_count = os.cpu_count() or 1
+        print(f"PDF: {path} ({page_count} pages), CPUs: {cpu_count}")
+        print(f"{'mode':<14}{'seconds':>10}{'pages/sec':>12}{'speedup':>10}")
+
+        baseline = bench_sequential(path, page_count)
+        print(f"{'sequential':<14}{baseline:>10.3f}{page_count / baseline:>12.1f}{1.0:>10.2f}")
+
+        workers = 1
+        while workers <= cpu_count:
+            elapsed = asyncio.run(bench_parallel(path, workers))
+            print(
+                f"{f'{workers} workers':<14}{elapsed:>10.3f}"
+                f"{page_count / elapsed:>12.1f}{baseline / elapsed:>10.2f}"
+            )
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Answer cache: keys follow each file's indexVersion, and re-indexing a file
+drops the answers that may have used it
+"""
+
+import pytest
+from bson import ObjectId
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from app.ai import answer_cache as answer_cache_module
+from app.ai.answer_cache import AnswerCache
+
+USER_ID = str(ObjectId())
+OTHER_USER_ID = str(ObjectId())
+
+
+@pytest.fixture
+def files(monkeypatch):
+    files = mongomock_motor.AsyncMongoMockClient()["chatnary_test"]["files"]
+    monkeypatch.setattr(answer_cache_module, "get_collection", lambda name: files)
+    return files
+
+
+async def add_file(files, file_id, user_id=USER_ID, indexed=True):
+    await files.insert_one({"id": file_id, "userId": ObjectId(user_id), "indexed": indexed, "indexVersion": 1})
+
+
+@pytest.mark.asyncio
+async def test_index_version_bump_misses(files):
+    cache = AnswerCache()
+    await add_file(files, "f1")
+    await add_file(files, "f2")
+
+    key = await cache.make_key(USER_ID, ["f2", "f1"], "gemini", 5, "Tài liệu nói gì?")
+    cache.put(key, "câu trả lời", [])
+    assert cache.get(await cache.make_key(USER_ID, ["f1", "f2", "f1"], "gemini", 5, "  tài liệu NÓI gì? ")) is not None
+
+    # Re-indexed by another process: this cache wasn't invalidated
+    await files.update_one({"id": "f2"}, {"$inc": {"indexVersion": 1}})
+
+    assert cache.get(await cache.make_key(USER_ID, ["f1", "f2"], "gemini", 5, "Tài liệu nói gì?")) is None
+
+
+@pytest.mark.asyncio
+async def test_all_files_scope_follows_the_indexed_set(files):
+    cache = AnswerCache()
+    await add_file(files, "f1")
+    await add_file(files, "f2", indexed=False)
+
+    key = await cache.make_key(USER_ID, None, "gemini", 5, "câu hỏi")
+    cache.put(key, "câu trả lời", [])
+    assert cache.get(await cache.make_key(USER_ID, None, "gemini", 5, "câu hỏi")) is not None
+
+    await files.update_one({"id": "f2"}, {"$set": {"indexed": True}})
+
+    assert cache.get(await cache.make_key(USER_ID, None, "gemini", 5, "câu hỏi")) is None
+
+
+@pytest.mark.asyncio
+async def test_invalidate_file(files):
+    cache = AnswerCache()
+    for file_id in ("f1", "f2"):
+        await add_file(files, file_id)
+    await add_file(files, "f9", user_id=OTHER_USER_ID)
+
+    keys = {
+        "f1": await cache.make_key(USER_ID, ["f1"], "gemini", 5, "q"),
+        "f2": await cache.make_key(USER_ID, ["f2"], "gemini", 5, "q"),
+        "all": await cache.make_key(USER_ID, None, "gemini", 5, "q"),
+        "other user": await cache.make_key(OTHER_USER_ID, None, "gemini", 5, "q")
+    }
+    for key in keys.values():
+        cache.put(key, "a", [])
+
+    assert cache.invalidate_file(USER_ID, "f1") == 2
+
+    assert [name for name, key in keys.items() if cache.get(key) is not None] == ["f2", "other user"]
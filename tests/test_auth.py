@@ -0,0 +1,83 @@
+"""
+get_current_user's user cache: served from memory until invalidated
+"""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from app.core import auth
+from app.core.auth import (
+    USER_CACHE_MAX_TTL_SECONDS, get_current_user, invalidate_cached_user, user_cache
+)
+
+USER_ID = ObjectId()
+CREDENTIALS = HTTPAuthorizationCredentials(scheme="Bearer", credentials="token")
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = mongomock_motor.AsyncMongoMockClient()["chatnary_test"]["users"]
+    monkeypatch.setattr(auth, "get_collection", lambda name: users)
+    monkeypatch.setattr(auth.security, "verify_token", lambda token: {"userId": str(USER_ID)})
+    user_cache.clear()
+    yield users
+    user_cache.clear()
+
+
+async def add_user(users):
+    await users.insert_one({
+        "_id": USER_ID,
+        "email": "an@example.com",
+        "fullName": "Nguyễn Văn An",
+        "isActive": True,
+        "createdAt": datetime(2025, 1, 1)
+    })
+
+
+@pytest.mark.asyncio
+async def test_user_is_cached_until_invalidated(users):
+    await add_user(users)
+    assert (await get_current_user(CREDENTIALS)).fullName == "Nguyễn Văn An"
+
+    await users.update_one({"_id": USER_ID}, {"$set": {"fullName": "Trần Thị Bình"}})
+    # Served from the cache
+    assert (await get_current_user(CREDENTIALS)).fullName == "Nguyễn Văn An"
+
+    # As profile updates do after writing
+    invalidate_cached_user(USER_ID)
+
+    assert (await get_current_user(CREDENTIALS)).fullName == "Trần Thị Bình"
+
+
+@pytest.mark.asyncio
+async def test_deactivated_user_is_rejected_once_invalidated(users):
+    await add_user(users)
+    await get_current_user(CREDENTIALS)
+
+    await users.update_one({"_id": USER_ID}, {"$set": {"isActive": False}})
+    invalidate_cached_user(str(USER_ID))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user(CREDENTIALS)
+    assert exc_info.value.status_code == 401
+    assert len(user_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_user_is_not_cached(users):
+    with pytest.raises(HTTPException):
+        await get_current_user(CREDENTIALS)
+
+    assert len(user_cache) == 0
+    await add_user(users)
+    assert (await get_current_user(CREDENTIALS)).email == "an@example.com"
+
+
+def test_ttl_is_capped():
+    assert user_cache.ttl_seconds <= USER_CACHE_MAX_TTL_SECONDS
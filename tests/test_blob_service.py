@@ -0,0 +1,59 @@
+"""
+Refcounted upload blobs: every file written for a hash is removed with
+the last reference
+"""
+
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from app.ai.document_processor import document_processor
+
+CONTENT_HASH = "ab" * 32
+
+
+@pytest.fixture
+def blobs(tmp_path, monkeypatch):
+    """blob_service over a temp uploads dir and an in-memory database"""
+    file_service = types.SimpleNamespace(get_file_path=lambda name: str(tmp_path / name))
+    module = types.ModuleType("app.services.file_service")
+    module.file_service = file_service
+    monkeypatch.setitem(sys.modules, "app.services.file_service", module)
+    monkeypatch.delitem(sys.modules, "app.services.blob_service", raising=False)
+    blob_service = importlib.import_module("app.services.blob_service")
+
+    db = mongomock_motor.AsyncMongoMockClient()["chatnary_test"]
+    monkeypatch.setattr(blob_service, "get_collection", lambda name: db[name])
+
+    async def delete_shared_vector_store(content_hash):
+        pass
+
+    monkeypatch.setattr(document_processor, "delete_shared_vector_store", delete_shared_vector_store)
+    return blob_service.blob_service
+
+
+def upload(tmp_path, name: str) -> str:
+    path = tmp_path / f"{name}.tmp"
+    path.write_bytes(b"same content")
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_last_release_removes_every_extension(blobs, tmp_path):
+    names = [
+        await blobs.store_blob(CONTENT_HASH, upload(tmp_path, str(i)), extension, 12)
+        for i, extension in enumerate([".pdf", ".PDF", ".txt"])
+    ]
+    assert names == [f"{CONTENT_HASH}.pdf", f"{CONTENT_HASH}.pdf", f"{CONTENT_HASH}.txt"]
+
+    assert not await blobs.release(CONTENT_HASH)
+    assert not await blobs.release(CONTENT_HASH)
+    assert os.path.exists(tmp_path / names[2])
+
+    assert await blobs.release(CONTENT_HASH)
+    assert sorted(os.listdir(tmp_path)) == [".blob-ab.lock"]
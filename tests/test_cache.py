@@ -0,0 +1,86 @@
+"""
+LRU cache: entry-count, byte-budget and TTL eviction
+"""
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget():
+    cache = LRUCache(max_bytes=100, sizeof=len)
+    cache.put("a", b"x" * 40)
+    cache.put("b", b"x" * 40)
+    cache.get("a")
+
+    cache.put("c", b"x" * 30)
+
+    assert sorted(key for key in "abc" if key in cache) == ["a", "c"]
+    assert cache.stats()["bytes"] == 70
+
+    # Replacing an entry frees its old size first
+    cache.put("a", b"x" * 60)
+    assert cache.stats()["bytes"] == 90
+    assert len(cache) == 2
+
+    # Larger than the whole budget: not cached, nothing evicted for it
+    cache.put("huge", b"x" * 101)
+    assert "huge" not in cache
+    assert cache.stats()["bytes"] == 90
+
+    assert cache.pop("a") is not None
+    assert cache.stats()["bytes"] == 30
+
+
+def test_sizeof_is_required_with_a_byte_budget():
+    with pytest.raises(ValueError):
+        LRUCache(max_bytes=100)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(max_entries=10, ttl_seconds=30)
+    cache.put("a", 1)
+    clock[0] += 20
+    cache.put("b", 2)
+
+    clock[0] += 10
+    assert cache.get("a") is None
+    assert "b" in cache
+    # Reading doesn't extend an entry's lifetime
+    assert cache.get("b") == 2
+    clock[0] += 20
+    assert cache.get("b") is None
+
+    stats = cache.stats()
+    assert (stats["expirations"], stats["entries"], stats["hits"], stats["misses"]) == (2, 0, 1, 2)
+
+
+def test_invalidate_where():
+    cache = LRUCache(max_entries=10)
+    for user_id in ("u1", "u2"):
+        for file_id in ("f1", "f2"):
+            cache.put((user_id, file_id), file_id)
+
+    assert cache.invalidate_where(lambda key: key[0] == "u1") == 2
+    assert sorted(cache._data) == [("u2", "f1"), ("u2", "f2")]
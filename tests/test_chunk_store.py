@@ -0,0 +1,70 @@
+"""
+Chunk store written for FAISS vector stores (in place of the pickled docstore)
+"""
+
+import json
+
+from langchain.schema import Document
+
+try:
+    from langchain_community.embeddings import FakeEmbeddings
+    from langchain_community.vectorstores import FAISS
+except ImportError:
+    from langchain.embeddings import FakeEmbeddings
+    from langchain.vectorstores import FAISS
+
+from app.ai.chunk_store import HEADER_FILE, ChunkStore, load_faiss_store, save_faiss_store
+from app.ai.document_processor import prepare_chunks
+
+
+def make_chunks(count: int):
+    return [
+        Document(
+            page_content=f"Đoạn văn số {i} của tài liệu, đủ dài để không bị lọc khỏi chỉ mục.",
+            metadata={"source": "/uploads/report.pdf", "page": i // 4}
+        )
+        for i in range(count)
+    ]
+
+
+def build_store(tmp_path, count: int = 200):
+    chunks = prepare_chunks(make_chunks(count), "report.pdf", {"content_hash": "abc"})
+    vector_store = FAISS.from_documents(chunks, FakeEmbeddings(size=8))
+    save_faiss_store(vector_store, str(tmp_path))
+    return chunks
+
+
+def test_document_metadata_is_stored_once_in_the_header(tmp_path):
+    build_store(tmp_path)
+
+    with open(tmp_path / HEADER_FILE) as f:
+        header = json.load(f)
+
+    assert header["json_columns"] == {}
+    assert sorted(header["int_columns"]) == ["chunk_id", "chunk_length", "page"]
+    for key in ("source", "source_file", "processed_at", "content_hash"):
+        assert key in header["common"]
+
+
+def test_round_trip(tmp_path):
+    chunks = build_store(tmp_path, count=10)
+
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == 10
+    for position, chunk in enumerate(chunks):
+        doc = store.get(position)
+        assert doc.page_content == chunk.page_content
+        assert doc.metadata == chunk.metadata
+    assert store.get(10) is None
+
+    vector_store = load_faiss_store(str(tmp_path), FakeEmbeddings(size=8))
+    doc_id = vector_store.index_to_docstore_id[3]
+    assert vector_store.docstore.search(doc_id).page_content == chunks[3].page_content
+
+
+def test_short_chunks_are_dropped():
+    chunks = [Document(page_content="quá ngắn"), *make_chunks(2)]
+
+    prepared = prepare_chunks(chunks, "report.pdf", {})
+
+    assert [chunk.metadata["chunk_id"] for chunk in prepared] == [1, 2]
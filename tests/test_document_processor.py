@@ -0,0 +1,48 @@
+"""
+Shared (content-addressed) vector stores: per-hash build locks
+"""
+
+import asyncio
+import gc
+
+import pytest
+
+from app.ai.document_processor import DocumentProcessor
+from app.core.cache import LRUCache
+
+
+async def no_progress(stage: str, progress: float):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_shared_store_locks_are_not_kept(monkeypatch):
+    processor = DocumentProcessor()
+    processor.store_cache = LRUCache(max_entries=10)
+    stores = {"abc": object()}
+    builds = []
+
+    async def load_shared(content_hash):
+        return stores.get(content_hash)
+
+    async def build(file_path, metadata, progress):
+        builds.append(metadata["content_hash"])
+        await asyncio.sleep(0.01)
+        stores[metadata["content_hash"]] = object()
+        return stores[metadata["content_hash"]]
+
+    monkeypatch.setattr(processor, "_load_shared_vector_store", load_shared)
+    monkeypatch.setattr(processor, "_build_vector_store", build)
+    monkeypatch.setattr(processor, "_save_store_atomically", lambda store, path: None)
+
+    # Already built: the early return path
+    assert await processor._get_or_build_shared_store("/uploads/a.pdf", "abc", no_progress) is stores["abc"]
+    # Concurrent uploads of new content build it once
+    results = await asyncio.gather(*[
+        processor._get_or_build_shared_store("/uploads/b.pdf", "def", no_progress) for _ in range(3)
+    ])
+
+    assert builds == ["def"]
+    assert all(result is stores["def"] for result in results)
+    gc.collect()
+    assert len(processor._shared_locks) == 0
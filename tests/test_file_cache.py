@@ -0,0 +1,169 @@
+"""
+File metadata cache: batched document lookups, invalidation, and the
+index status overlay on cached FileMetadata
+"""
+
+import sys
+import types
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.models.file import FileMetadata
+from app.services import file_cache
+from app.services.file_cache import FileMetadataCache
+
+USER_ID = str(ObjectId())
+
+
+def _matches(document, query):
+    for key, condition in query.items():
+        if isinstance(condition, dict) and "$in" in condition:
+            if document.get(key) not in condition["$in"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeFilesCollection:
+    """The files collection calls the cache makes, counted"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = {"find": 0, "find_one": 0}
+
+    def find(self, query):
+        self.calls["find"] += 1
+        return FakeCursor([dict(d) for d in self.documents if _matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        self.calls["find_one"] += 1
+        for document in self.documents:
+            if _matches(document, query):
+                if projection:
+                    return {key: document[key] for key in projection if key in document}
+                return dict(document)
+        return None
+
+
+class FakeFileService:
+    def __init__(self, files):
+        self.files = files
+        self.calls = 0
+
+    async def get_file_by_id(self, file_id, user_id):
+        self.calls += 1
+        for document in self.files.documents:
+            if document["id"] == file_id and str(document["userId"]) == user_id:
+                return FileMetadata(
+                    id=document["id"],
+                    originalName=document["originalName"],
+                    filename=f"{document['id']}.pdf",
+                    size=1,
+                    mimetype="application/pdf",
+                    uploadTime=datetime(2025, 1, 1),
+                    userId=user_id,
+                    userEmail="user@example.com",
+                    indexed=document["indexed"],
+                    indexStatus=document["indexStatus"]
+                )
+        return None
+
+
+@pytest.fixture
+def files(monkeypatch):
+    files = FakeFilesCollection([
+        {
+            "id": f"f{i}",
+            "userId": ObjectId(USER_ID),
+            "originalName": f"tài liệu {i}.pdf",
+            "indexed": False,
+            "indexStatus": "queued"
+        }
+        for i in range(3)
+    ])
+    monkeypatch.setattr(file_cache, "get_collection", lambda name: files)
+    return files
+
+
+@pytest.fixture
+def file_service(files, monkeypatch):
+    service = FakeFileService(files)
+    module = types.ModuleType("app.services.file_service")
+    module.file_service = service
+    monkeypatch.setitem(sys.modules, "app.services.file_service", module)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_documents_are_fetched_in_one_batch(files):
+    cache = FileMetadataCache()
+
+    documents = await cache.get_documents(USER_ID, ["f0", "f1", "f0", "missing"])
+    assert sorted(documents) == ["f0", "f1"]
+    assert files.calls["find"] == 1
+
+    documents = await cache.get_documents(USER_ID, ["f0", "f1", "f2"])
+    assert sorted(documents) == ["f0", "f1", "f2"]
+    # Only f2 was missing
+    assert files.calls["find"] == 2
+
+    await cache.get_documents(USER_ID, ["f0", "f1", "f2"])
+    assert files.calls["find"] == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_refetches_the_document(files):
+    cache = FileMetadataCache()
+    await cache.get_document(USER_ID, "f0")
+
+    files.documents[0]["originalName"] = "đổi tên.pdf"
+    cache.invalidate(ObjectId(USER_ID), "f0")
+
+    assert (await cache.get_document(USER_ID, "f0"))["originalName"] == "đổi tên.pdf"
+
+
+@pytest.mark.asyncio
+async def test_status_change_is_visible_on_next_read(files, file_service):
+    cache = FileMetadataCache()
+    first = await cache.get_file("f0", USER_ID)
+    assert (first.indexed, first.indexStatus) == (False, "queued")
+
+    # Written by an ingestion worker, possibly in another process, so
+    # without invalidating this cache
+    files.documents[0].update({"indexed": True, "indexStatus": "completed"})
+
+    second = await cache.get_file("f0", USER_ID)
+    assert (second.indexed, second.indexStatus) == (True, "completed")
+    assert second.originalName == "tài liệu 0.pdf"
+    # The rest of the record still came from the cache
+    assert file_service.calls == 1
+    # ...and the cached copy wasn't modified
+    assert first.indexed is False
+
+
+@pytest.mark.asyncio
+async def test_deleted_file_is_not_served(files, file_service):
+    cache = FileMetadataCache()
+    assert await cache.get_file("f1", USER_ID) is not None
+
+    del files.documents[1]
+
+    assert await cache.get_file("f1", USER_ID) is None
+    assert await cache.get_file("unknown", USER_ID) is None
@@ -0,0 +1,31 @@
+"""
+Cross-process file locks: holders serialize, and idle locks aren't kept
+"""
+
+import asyncio
+import gc
+
+import pytest
+
+from app.core.file_lock import FileLocks
+
+
+@pytest.mark.asyncio
+async def test_holders_serialize_and_locks_are_dropped(tmp_path):
+    locks = FileLocks()
+    path = str(tmp_path / "user" / "index.lock")
+    active = []
+    overlaps = []
+
+    async def writer():
+        async with locks.hold(path):
+            overlaps.append(len(active))
+            active.append(1)
+            await asyncio.sleep(0.01)
+            active.pop()
+
+    await asyncio.gather(*[writer() for _ in range(5)])
+
+    assert overlaps == [0] * 5
+    gc.collect()
+    assert len(locks._locks) == 0
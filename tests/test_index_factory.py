@@ -0,0 +1,70 @@
+"""
+Index type selection and memory estimates for the vector store cache
+"""
+
+import faiss
+import numpy as np
+
+from app.ai.index_factory import (
+    FLAT, HNSW, IVFPQ, LOAD_MMAP,
+    IndexConfig, create_index, estimate_index_bytes, get_index_type, read_index
+)
+
+DIMENSION = 32
+CONFIG = IndexConfig(hnsw_m=16, ivf_nlist=64, pq_m=8)
+
+
+def make_vectors(count: int) -> np.ndarray:
+    return np.random.default_rng(0).random((count, DIMENSION), dtype="float32")
+
+
+def build(index_type: str, vectors: np.ndarray) -> faiss.Index:
+    index = create_index(index_type, DIMENSION, CONFIG, training_vectors=vectors)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+    return index
+
+
+def test_select_index_type():
+    config = IndexConfig(hnsw_min_vectors=100, ivfpq_min_vectors=20_000, pq_bits=8)
+
+    assert config.select_index_type(99) == FLAT
+    assert config.select_index_type(100) == HNSW
+    assert config.select_index_type(20_000) == IVFPQ
+
+
+def test_estimates_follow_the_index_type():
+    vectors = make_vectors(10_000)
+    flat_vectors = len(vectors) * DIMENSION * 4
+
+    flat = build(FLAT, vectors)
+    hnsw = build(HNSW, vectors)
+    ivfpq = build(IVFPQ, vectors)
+    assert [get_index_type(index) for index in (flat, hnsw, ivfpq)] == [FLAT, HNSW, IVFPQ]
+
+    assert flat_vectors <= estimate_index_bytes(flat) < 2 * flat_vectors
+    # The graph links come on top of the vectors
+    assert estimate_index_bytes(hnsw) > estimate_index_bytes(flat)
+    # 8-byte PQ codes instead of 128-byte vectors
+    assert estimate_index_bytes(ivfpq) < flat_vectors / 4
+    # Within a factor of two of the serialized size
+    for index in (flat, hnsw, ivfpq):
+        serialized = faiss.serialize_index(index).nbytes
+        assert serialized / 2 < estimate_index_bytes(index) < serialized * 2
+
+
+def test_mapped_vectors_are_not_counted(tmp_path):
+    vectors = make_vectors(5_000)
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(build(FLAT, vectors), path)
+
+    heap = read_index(path)
+    mapped = read_index(path, LOAD_MMAP)
+
+    if not hasattr(faiss.downcast_index(mapped.index).codes, "is_owned"):
+        # faiss versions before mapped storage load into the heap either way
+        assert estimate_index_bytes(mapped) == estimate_index_bytes(heap)
+        return
+    vector_bytes = len(vectors) * DIMENSION * 4
+    assert estimate_index_bytes(heap) >= vector_bytes
+    # Only the id maps are left on the heap
+    assert estimate_index_bytes(mapped) == estimate_index_bytes(heap) - vector_bytes
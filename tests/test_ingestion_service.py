@@ -0,0 +1,114 @@
+"""
+Ingestion job queue against an in-memory Mongo: enqueue de-dup and the
+lease reaper's retry/fail accounting
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from app.ai.document_processor import document_processor
+from app.services import ingestion_service
+from app.services.ingestion_service import JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, IngestionQueue
+
+USER_ID = str(ObjectId())
+FILE_ID = "f1"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["chatnary_test"]
+    monkeypatch.setattr(ingestion_service, "get_collection", lambda name: db[name])
+    return db
+
+
+@pytest.fixture
+def index_status_updates(monkeypatch):
+    updates = []
+
+    async def update_file_index_status(file_id, user_id, indexed):
+        updates.append((file_id, indexed))
+
+    monkeypatch.setattr(document_processor, "_update_file_index_status", update_file_index_status)
+    return updates
+
+
+async def make_queue(db) -> IngestionQueue:
+    await db["files"].insert_one({"id": FILE_ID, "userId": ObjectId(USER_ID)})
+    queue = IngestionQueue()
+    queue.max_attempts = 2
+    queue.lease_seconds = 60
+    queue.worker_count = 0
+    await queue.start()
+    return queue
+
+
+async def expire_lease(db):
+    await db["ingestion_jobs"].update_many(
+        {"status": JOB_RUNNING},
+        {"$set": {"updatedAt": datetime.utcnow() - timedelta(minutes=5)}}
+    )
+
+
+@pytest.mark.asyncio
+async def test_one_pending_job_per_file(db):
+    queue = await make_queue(db)
+    jobs = db["ingestion_jobs"]
+    job_id = await queue.enqueue("/uploads/a.pdf", USER_ID, FILE_ID)
+
+    assert await queue.enqueue("/uploads/a.pdf", USER_ID, FILE_ID) == job_id
+
+    # A concurrent enqueue that got past the pending-job check
+    with pytest.raises(DuplicateKeyError):
+        await jobs.insert_one({"fileId": FILE_ID, "userId": ObjectId(USER_ID), "status": JOB_QUEUED})
+
+    # Finished jobs don't block reprocessing
+    await jobs.update_one({}, {"$set": {"status": JOB_COMPLETED}})
+    assert await queue.enqueue("/uploads/a.pdf", USER_ID, FILE_ID) != job_id
+    assert await jobs.count_documents({}) == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_job_is_retried_then_failed(db, index_status_updates):
+    queue = await make_queue(db)
+    jobs = db["ingestion_jobs"]
+    await queue.enqueue("/uploads/a.pdf", USER_ID, FILE_ID)
+
+    # First attempt's worker dies
+    assert (await queue._claim_next_job())["attempts"] == 1
+    await expire_lease(db)
+    await queue._reap_expired_jobs(datetime.utcnow())
+
+    job = await jobs.find_one({})
+    assert (job["status"], job["attempts"]) == (JOB_QUEUED, 1)
+    assert job["error"] == "Ingestion job lease expired"
+    # Retried after a backoff, like any failed attempt
+    assert job["availableAt"] > datetime.utcnow()
+    assert await queue._claim_next_job() is None
+
+    # Second (last) attempt's worker dies too
+    await jobs.update_one({}, {"$set": {"availableAt": datetime.utcnow()}})
+    assert (await queue._claim_next_job())["attempts"] == 2
+    await expire_lease(db)
+    await queue._reap_expired_jobs(datetime.utcnow())
+
+    job = await jobs.find_one({})
+    assert (job["status"], job["attempts"]) == (JOB_FAILED, 2)
+    assert index_status_updates == [(FILE_ID, False)]
+    assert (await db["files"].find_one({"id": FILE_ID}))["indexStatus"] == JOB_FAILED
+    assert await queue._claim_next_job() is None
+
+
+@pytest.mark.asyncio
+async def test_live_lease_is_not_reaped(db):
+    queue = await make_queue(db)
+    await queue.enqueue("/uploads/a.pdf", USER_ID, FILE_ID)
+    await queue._claim_next_job()
+
+    await queue._reap_expired_jobs(datetime.utcnow())
+
+    assert (await db["ingestion_jobs"].find_one({}))["status"] == JOB_RUNNING
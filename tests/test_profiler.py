@@ -0,0 +1,37 @@
+"""
+Request profiler: profiles are saved (and pruned) off the event loop
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.core.profiler import Profiler, current_profile
+
+
+@pytest.mark.asyncio
+async def test_profiles_are_saved_off_the_event_loop(tmp_path):
+    profiler = Profiler(str(tmp_path), interval_ms=1, max_profiles=2)
+    save = profiler._save
+    save_threads = []
+
+    def record_thread(profile):
+        save_threads.append(threading.get_ident())
+        save(profile)
+
+    profiler._save = record_thread
+
+    profile_ids = []
+    for _ in range(3):
+        profile = profiler.start("GET", "/api/files")
+        await asyncio.sleep(0.01)
+        await profiler.stop(profile)
+        assert current_profile() is None
+        profile_ids.append(profile.id)
+
+    assert threading.get_ident() not in save_threads
+    # Pruned to the newest max_profiles
+    assert [meta["id"] for meta in profiler.list_profiles()] == profile_ids[:0:-1]
+    assert profiler.get_profile_path(profile_ids[0]) is None
+    assert profiler.get_profile_path(profile_ids[2]) is not None
@@ -0,0 +1,92 @@
+"""
+Token-bucket rate limiter, driven through RateLimiter.check against both
+backends (Redis via fakeredis, skipped when it isn't installed)
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.rate_limit import (
+    InMemoryRateLimitBackend,
+    RateLimiter,
+    RateLimitRule,
+    RedisRateLimitBackend,
+    retry_after_header
+)
+
+# Burst of 3, then one request every 10 seconds
+SLOW_RULE = RateLimitRule("slow", "/api/slow", per_minute=6, burst=3)
+# Burst of 2, refilling 10 tokens a second
+FAST_RULE = RateLimitRule("fast", "/api/fast", per_minute=600, burst=2)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return InMemoryRateLimitBackend()
+
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis runs Lua scripts through lupa
+    return RedisRateLimitBackend(fakeredis.FakeAsyncRedis())
+
+
+@pytest.mark.asyncio
+async def test_burst_then_limited(backend):
+    limiter = RateLimiter([SLOW_RULE], backend)
+
+    results = [await limiter.check(SLOW_RULE, "user-1") for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert all(retry_after == 0.0 for _, retry_after in results[:3])
+
+
+@pytest.mark.asyncio
+async def test_retry_after(backend):
+    limiter = RateLimiter([SLOW_RULE], backend)
+    for _ in range(SLOW_RULE.capacity):
+        await limiter.check(SLOW_RULE, "user-1")
+
+    allowed, retry_after = await limiter.check(SLOW_RULE, "user-1")
+
+    assert not allowed
+    # A whole token at 0.1 tokens a second, minus the time the test took
+    assert 9.0 < retry_after <= 10.0
+    assert retry_after_header(retry_after) == "10"
+    assert retry_after_header(0.01) == "1"
+
+
+@pytest.mark.asyncio
+async def test_refill(backend):
+    limiter = RateLimiter([FAST_RULE], backend)
+    for _ in range(FAST_RULE.capacity):
+        assert (await limiter.check(FAST_RULE, "user-1"))[0]
+    allowed, retry_after = await limiter.check(FAST_RULE, "user-1")
+    assert not allowed
+
+    await asyncio.sleep(retry_after + 0.05)
+
+    assert (await limiter.check(FAST_RULE, "user-1"))[0]
+    assert not (await limiter.check(FAST_RULE, "user-1"))[0]
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_per_client_and_rule(backend):
+    limiter = RateLimiter([SLOW_RULE, FAST_RULE], backend)
+    for _ in range(SLOW_RULE.capacity):
+        await limiter.check(SLOW_RULE, "user-1")
+
+    assert not (await limiter.check(SLOW_RULE, "user-1"))[0]
+    assert (await limiter.check(SLOW_RULE, "user-2"))[0]
+    assert (await limiter.check(FAST_RULE, "user-1"))[0]
+
+
+def test_match_uses_first_matching_rule():
+    chat = RateLimitRule("chat", "/api/chat", per_minute=20, methods=frozenset({"POST"}))
+    default = RateLimitRule("api", "/api", per_minute=120)
+    limiter = RateLimiter([chat, default], InMemoryRateLimitBackend())
+
+    assert limiter.match("POST", "/api/chat/stream") is chat
+    assert limiter.match("GET", "/api/chat/history") is default
+    assert limiter.match("POST", "/api/chatter") is default
+    assert limiter.match("GET", "/health") is None
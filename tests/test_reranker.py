@@ -0,0 +1,88 @@
+"""
+Cross-encoder reranker: model load retries, fallbacks while the model
+isn't available, and the fallback counter under concurrent requests
+"""
+
+import sys
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain.schema import Document
+
+from app.ai.reranker import CrossEncoderReranker
+
+DOCS = [Document(page_content=text) for text in ["một", "hai ba", "bốn năm sáu"]]
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the length of its text; fails while ``broken``"""
+
+    broken = False
+    loads = 0
+
+    def __init__(self, model_name, max_length, device):
+        FakeCrossEncoder.loads += 1
+        if FakeCrossEncoder.broken:
+            raise OSError("model download failed")
+
+    def predict(self, pairs, batch_size):
+        return [len(text) for _, text in pairs]
+
+
+@pytest.fixture(autouse=True)
+def cross_encoder(monkeypatch):
+    module = types.ModuleType("sentence_transformers")
+    module.CrossEncoder = FakeCrossEncoder
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    FakeCrossEncoder.broken = False
+    FakeCrossEncoder.loads = 0
+    return FakeCrossEncoder
+
+
+def test_failed_load_is_retried_after_backoff(cross_encoder):
+    reranker = CrossEncoderReranker(load_retry_seconds=60)
+    cross_encoder.broken = True
+
+    assert not reranker.warm_up()
+    assert reranker.rerank("q", DOCS, top_k=2) == DOCS[:2]
+    # Within the backoff the load isn't attempted again
+    assert cross_encoder.loads == 1
+    assert reranker.fallbacks == 1
+
+    cross_encoder.broken = False
+    reranker._load_failed_at -= 60
+
+    assert reranker.rerank("q", DOCS, top_k=2) == [DOCS[2], DOCS[1]]
+    assert cross_encoder.loads == 2
+    assert reranker.get_stats()["loaded"]
+
+
+def test_requests_fall_back_while_the_model_loads():
+    reranker = CrossEncoderReranker()
+
+    with reranker._lock:
+        # warm_up() holds the lock while loading
+        assert reranker.rerank("q", DOCS, top_k=2) == DOCS[:2]
+
+    assert reranker.fallbacks == 1
+    assert reranker.rerank("q", DOCS, top_k=1) == [DOCS[2]]
+
+
+def test_fallbacks_are_counted_across_threads(cross_encoder):
+    reranker = CrossEncoderReranker()
+    cross_encoder.broken = True
+    reranker.warm_up()
+    start = threading.Barrier(8)
+
+    def requests():
+        start.wait()
+        for _ in range(2000):
+            reranker.rerank("q", DOCS, top_k=2)
+
+    with ThreadPoolExecutor(8) as pool:
+        for future in [pool.submit(requests) for _ in range(8)]:
+            future.result()
+
+    assert reranker.fallbacks == 8 * 2000
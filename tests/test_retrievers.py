@@ -0,0 +1,90 @@
+"""
+Reciprocal rank fusion of the dense and lexical retrieval legs, keyed on
+(file_id, chunk_id)
+"""
+
+from langchain.schema import Document
+
+try:
+    from langchain_community.embeddings import FakeEmbeddings
+    from langchain_community.vectorstores import FAISS
+except ImportError:
+    from langchain.embeddings import FakeEmbeddings
+    from langchain.vectorstores import FAISS
+
+from app.ai.retrievers import FederatedRetriever, HybridRetriever, reciprocal_rank_fusion
+
+
+def chunk(file_id, chunk_id, text=None):
+    metadata = {"file_id": file_id}
+    if chunk_id is not None:
+        metadata["chunk_id"] = chunk_id
+    return Document(page_content=text or f"{file_id}-{chunk_id}", metadata=metadata)
+
+
+def labels(docs):
+    return [(doc.metadata["file_id"], doc.metadata.get("chunk_id")) for doc in docs]
+
+
+def test_same_chunk_from_both_legs_is_fused():
+    dense = [chunk("f1", 0), chunk("f1", 1), chunk("f2", 0)]
+    # The lexical leg reads the chunk store, so its copy isn't the same object
+    lexical = [chunk("f2", 0), chunk("f1", 1, text="f1-1 (chunk store copy)")]
+
+    fused = reciprocal_rank_fusion([dense, lexical], rrf_k=60)
+
+    assert labels(fused) == [("f2", 0), ("f1", 1), ("f1", 0)]
+    # The first-seen (dense) copy is kept
+    assert fused[1] is dense[1]
+
+
+def test_chunk_ids_are_scoped_to_their_file():
+    # Content-addressed stores give every file chunk ids from 0
+    fused = reciprocal_rank_fusion([[chunk("f1", 0)], [chunk("f2", 0)]])
+
+    assert labels(fused) == [("f1", 0), ("f2", 0)]
+
+
+def test_chunks_without_ids_fuse_on_content():
+    dense = [chunk("f1", None, text="một"), chunk("f1", None, text="hai")]
+    lexical = [chunk("f1", None, text="hai")]
+
+    assert [doc.page_content for doc in reciprocal_rank_fusion([dense, lexical])] == ["hai", "một"]
+
+
+class FakeLexicalIndex:
+    def __init__(self, hits):
+        self.hits = hits
+
+    def search_chunks(self, query, k, file_ids=None):
+        return self.hits[:k]
+
+
+class FakeChunks:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def get(self, position):
+        return self.docs[position] if position < len(self.docs) else None
+
+
+def test_hybrid_retriever_fuses_store_and_index_hits():
+    texts = [f"Điều {i} của hợp đồng" for i in range(4)]
+    store = FAISS.from_documents(
+        [Document(page_content=text, metadata={"chunk_id": i}) for i, text in enumerate(texts)],
+        FakeEmbeddings(size=8)
+    )
+    chunks = FakeChunks([Document(page_content=text, metadata={"chunk_id": i}) for i, text in enumerate(texts)])
+
+    retriever = HybridRetriever(
+        dense=FederatedRetriever(stores=[store], file_ids=["f1"]),
+        lexical_index=FakeLexicalIndex([("f1", 3, 2.0), ("f1", 2, 1.0)]),
+        open_file_chunks=lambda file_id: chunks,
+        k=4
+    )
+    docs = retriever.invoke("Điều 3")
+
+    # Every chunk once, with the lexical hits (also in the dense leg) on top
+    assert sorted(labels(docs)) == [("f1", i) for i in range(4)]
+    assert set(labels(docs)[:2]) == {("f1", 3), ("f1", 2)}
+    assert set(retriever.timings) == {"dense", "lexical"}
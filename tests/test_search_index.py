@@ -0,0 +1,180 @@
+"""
+BM25 search index: add/remove/query round trip through SearchIndexManager,
+with Vietnamese text searched with or without diacritics, and typeahead
+suggestions from the same index
+"""
+
+import os
+import unicodedata
+
+import pytest
+from langchain.schema import Document
+
+try:
+    from langchain_community.embeddings import FakeEmbeddings
+    from langchain_community.vectorstores import FAISS
+except ImportError:
+    from langchain.embeddings import FakeEmbeddings
+    from langchain.vectorstores import FAISS
+
+from app.ai import search_index as search_index_module
+from app.ai.chunk_store import load_faiss_store, open_chunks, save_faiss_store
+from app.ai.search_index import SNIPPET_CONTEXT, SearchIndexManager, fold_token
+
+USER_ID = "user-1"
+EMBEDDINGS = FakeEmbeddings(size=8)
+FILLER = "Phần mở đầu giới thiệu bối cảnh chung của báo cáo năm nay. " * 3
+
+FILES = {
+    "f1": ("Báo cáo tài chính.pdf", [
+        "Doanh thu quý một tăng mạnh nhờ xuất khẩu.",
+        FILLER + "Đường đi của dữ liệu được mô tả trong phụ lục.",
+    ]),
+    "f2": ("Học tiếng Việt.docx", [
+        "Học tiếng Việt mỗi ngày với dữ liệu thực tế.",
+    ]),
+}
+
+
+class FakeDocProcessor:
+    """The parts of DocumentProcessor the search index uses, over a temp dir"""
+
+    def __init__(self, root: str):
+        self.vector_stores_dir = root
+        self.processed_files = []
+
+    def store_path(self, file_id: str) -> str:
+        return os.path.join(self.vector_stores_dir, f"user_{USER_ID}", file_id)
+
+    def get_file_chunks(self, user_id: str, file_id: str):
+        return open_chunks(self.store_path(file_id))
+
+    async def get_user_processed_files(self, user_id: str):
+        return [{"id": file_id, "originalName": FILES[file_id][0]} for file_id in self.processed_files]
+
+    async def load_user_vector_store(self, user_id: str, file_id: str):
+        path = self.store_path(file_id)
+        return load_faiss_store(path, EMBEDDINGS) if os.path.exists(path) else None
+
+    def write_store(self, file_id: str) -> FAISS:
+        docs = [
+            Document(page_content=text, metadata={"chunk_id": i, "page": i})
+            for i, text in enumerate(FILES[file_id][1])
+        ]
+        store = FAISS.from_documents(docs, EMBEDDINGS)
+        save_faiss_store(store, self.store_path(file_id))
+        return store
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    class NoFileMetadata:
+        async def get_document(self, user_id, file_id):
+            return None
+
+    monkeypatch.setattr(search_index_module, "file_metadata_cache", NoFileMetadata())
+    return FakeDocProcessor(str(tmp_path))
+
+
+async def add_files(processor, manager, *file_ids):
+    for file_id in file_ids:
+        store = processor.write_store(file_id)
+        processor.processed_files.append(file_id)
+        await manager.update_file(USER_ID, file_id, store, FILES[file_id][0])
+
+
+def matched_words(hit):
+    return [
+        hit["snippet"][match["start"]:match["start"] + match["length"]]
+        for match in hit["matches"]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_with_and_without_diacritics(processor):
+    manager = SearchIndexManager(processor)
+    await add_files(processor, manager, "f1", "f2")
+
+    for query in ("đường", "duong", "ĐƯỜNG", unicodedata.normalize("NFD", "đường")):
+        hits, _ = await manager.search(USER_ID, query)
+        assert (hits[0]["fileId"], hits[0]["page"], hits[0]["chunkId"]) == ("f1", 1, 1)
+
+    hits, total = await manager.search(USER_ID, "tieng viet")
+    assert total == 2
+    # The file name is a hit of its own, without a page
+    assert {(hit["field"], hit["page"]) for hit in hits} == {("content", 0), ("fileName", None)}
+
+
+@pytest.mark.asyncio
+async def test_match_offsets(processor):
+    manager = SearchIndexManager(processor)
+    await add_files(processor, manager, "f1", "f2")
+
+    hits, _ = await manager.search(USER_ID, "duong du lieu")
+
+    hit = next(hit for hit in hits if hit["fileId"] == "f1")
+    chunk_text = FILES["f1"][1][1]
+    assert hit["snippetOffset"] == chunk_text.index("Đường") - SNIPPET_CONTEXT
+    assert chunk_text[hit["snippetOffset"]:].startswith(hit["snippet"])
+    assert matched_words(hit) == ["Đường", "dữ", "liệu"]
+
+    hits, _ = await manager.search(USER_ID, "hoc tieng")
+    name_hit = next(hit for hit in hits if hit["field"] == "fileName")
+    assert name_hit["snippetOffset"] == 0
+    assert matched_words(name_hit) == ["Học", "tiếng"]
+
+
+@pytest.mark.asyncio
+async def test_suggest(processor):
+    manager = SearchIndexManager(processor)
+    await add_files(processor, manager, "f1", "f2")
+
+    # Matching file names first, then terms in their accented display
+    # form, with the rest of the query kept as typed
+    suggestions = await manager.suggest(USER_ID, "học tie")
+    assert suggestions == [
+        {"text": "Học tiếng Việt.docx", "type": "file", "fileId": "f2"},
+        {"text": "học tiếng", "type": "term", "weight": 2}
+    ]
+
+    suggestions = await manager.suggest(USER_ID, "bao")
+    assert suggestions[0] == {"text": "Báo cáo tài chính.pdf", "type": "file", "fileId": "f1"}
+    assert {s["text"] for s in suggestions[1:]} == {"báo"}
+
+    # Heaviest term first: "dữ" is in both files
+    assert [s["text"] for s in await manager.suggest(USER_ID, "du")][0] == "dữ"
+    assert await manager.suggest(USER_ID, "du ") == []
+
+    await manager.remove_file(USER_ID, "f2")
+
+    assert await manager.suggest(USER_ID, "tie") == []
+    # f1 still has "dữ", now in one document
+    assert {(s["text"], s["weight"]) for s in await manager.suggest(USER_ID, "du")} == {
+        ("dữ", 1), ("đường", 1), ("được", 1)
+    }
+
+
+@pytest.mark.asyncio
+async def test_remove_file(processor):
+    manager = SearchIndexManager(processor)
+    await add_files(processor, manager, "f1", "f2")
+
+    await manager.remove_file(USER_ID, "f2")
+
+    hits, total = await manager.search(USER_ID, "tieng viet")
+    assert (hits, total) == ([], 0)
+    hits, _ = await manager.search(USER_ID, "du lieu")
+    assert {hit["fileId"] for hit in hits} == {"f1"}
+
+
+@pytest.mark.asyncio
+async def test_saved_index_is_reloaded(processor):
+    await add_files(processor, SearchIndexManager(processor), "f1", "f2")
+
+    # A fresh manager (another worker process) reads the saved index
+    manager = SearchIndexManager(processor)
+    hits, total = await manager.search(USER_ID, "doanh thu")
+
+    assert total == 1
+    assert (hits[0]["fileId"], hits[0]["page"]) == ("f1", 0)
+    assert fold_token("Đường") == "duong"
@@ -0,0 +1,155 @@
+"""
+Per-user merged index: incremental updates, hit resolution against the
+per-file chunk stores, and the published empty index
+"""
+
+import os
+import shutil
+from types import SimpleNamespace
+
+import pytest
+from langchain.schema import Document
+
+try:
+    from langchain_community.embeddings import FakeEmbeddings
+    from langchain_community.vectorstores import FAISS
+except ImportError:
+    from langchain.embeddings import FakeEmbeddings
+    from langchain.vectorstores import FAISS
+
+from app.ai.chunk_store import load_faiss_store, open_chunks, save_faiss_store
+from app.ai.index_factory import LOAD_HEAP
+from app.ai.user_index import UserIndexManager
+from app.core.cache import LRUCache
+
+USER_ID = "user-1"
+EMBEDDINGS = FakeEmbeddings(size=16)
+
+
+class FakeDocProcessor:
+    """The parts of DocumentProcessor the user index uses, over a temp dir"""
+
+    def __init__(self, root: str):
+        self.vector_stores_dir = root
+        self.load_mode = LOAD_HEAP
+        self.store_cache = LRUCache(max_entries=100)
+        self.processed_files = []
+        self.processed_file_lookups = 0
+
+    def _get_embeddings(self):
+        return EMBEDDINGS
+
+    def store_path(self, file_id: str) -> str:
+        return os.path.join(self.vector_stores_dir, f"user_{USER_ID}", file_id)
+
+    def get_file_chunks(self, user_id: str, file_id: str):
+        return open_chunks(self.store_path(file_id))
+
+    async def get_user_processed_files(self, user_id: str):
+        self.processed_file_lookups += 1
+        return [{"id": file_id} for file_id in self.processed_files]
+
+    async def load_user_vector_store(self, user_id: str, file_id: str):
+        path = self.store_path(file_id)
+        return load_faiss_store(path, EMBEDDINGS) if os.path.exists(path) else None
+
+    def write_store(self, file_id: str, texts) -> FAISS:
+        """Build and save a file's store, as processing does"""
+        docs = [Document(page_content=text, metadata={"chunk_id": i}) for i, text in enumerate(texts)]
+        store = FAISS.from_documents(docs, EMBEDDINGS)
+        path = self.store_path(file_id)
+        shutil.rmtree(path, ignore_errors=True)
+        save_faiss_store(store, path)
+        return store
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return FakeDocProcessor(str(tmp_path))
+
+
+async def index_files(processor, manager, files):
+    for file_id, texts in files.items():
+        store = processor.write_store(file_id, texts)
+        processor.processed_files.append(file_id)
+        await manager.update_file(USER_ID, file_id, store)
+
+
+def search(store, k):
+    embedding = EMBEDDINGS.embed_query("câu hỏi")
+    return [doc for doc, _ in store.similarity_search_with_score_by_vector(embedding, k=k)]
+
+
+@pytest.mark.asyncio
+async def test_hits_resolve_to_file_chunks(processor):
+    manager = UserIndexManager(processor)
+    await index_files(processor, manager, {
+        "a": [f"a{i}" for i in range(5)],
+        "b": [f"b{i}" for i in range(3)]
+    })
+
+    store = await manager.load(USER_ID)
+    docs = search(store, k=8)
+
+    assert sorted(doc.page_content for doc in docs) == sorted([f"a{i}" for i in range(5)] + ["b0", "b1", "b2"])
+    for doc in docs:
+        assert doc.metadata["file_id"] == doc.page_content[0]
+        assert doc.metadata["chunk_id"] == int(doc.page_content[1:])
+
+
+@pytest.mark.asyncio
+async def test_deleted_store_hits_are_skipped(processor):
+    manager = UserIndexManager(processor)
+    await index_files(processor, manager, {
+        "a": [f"a{i}" for i in range(5)],
+        "b": [f"b{i}" for i in range(20)]
+    })
+    store = await manager.load(USER_ID)
+
+    # Deleted before a new version is published
+    shutil.rmtree(processor.store_path("b"))
+    docs = search(store, k=4)
+
+    assert len(docs) == 4
+    assert all(doc.page_content.startswith("a") and doc.page_content for doc in docs)
+
+
+@pytest.mark.asyncio
+async def test_rewritten_store_hits_are_skipped_until_republished(processor):
+    manager = UserIndexManager(processor)
+    await index_files(processor, manager, {
+        "a": [f"a{i}" for i in range(5)],
+        "b": [f"b{i}" for i in range(5)]
+    })
+    store = await manager.load(USER_ID)
+
+    # Reprocessing replaces the file's store before the index is updated
+    new_store = processor.write_store("b", [f"new{i}" for i in range(5)])
+    assert {doc.page_content[0] for doc in search(store, k=10)} == {"a"}
+
+    await manager.update_file(USER_ID, "b", new_store)
+    texts = {doc.page_content for doc in search(await manager.load(USER_ID), k=10)}
+    assert texts == {f"a{i}" for i in range(5)} | {f"new{i}" for i in range(5)}
+
+
+@pytest.mark.asyncio
+async def test_remove_file(processor):
+    manager = UserIndexManager(processor)
+    await index_files(processor, manager, {"a": ["a0", "a1"], "b": ["b0", "b1"]})
+
+    await manager.remove_file(USER_ID, "a")
+
+    assert {doc.page_content for doc in search(await manager.load(USER_ID), k=4)} == {"b0", "b1"}
+
+
+@pytest.mark.asyncio
+async def test_empty_index_is_published_once(processor):
+    manager = UserIndexManager(processor)
+
+    for _ in range(3):
+        assert await manager.load(USER_ID) is None
+    assert processor.processed_file_lookups == 1
+
+    await index_files(processor, manager, {"a": ["a0", "a1"]})
+
+    assert {doc.page_content for doc in search(await manager.load(USER_ID), k=2)} == {"a0", "a1"}